@@ -476,6 +476,7 @@ async function showCalculator() {
 
     updateRoleBadges();
     updateButtonStates();
+    loadHistory();
 
     // Show admin button if user is admin (and has other roles too)
     if (userRoles.includes('AdminRole')) {
@@ -638,6 +639,22 @@ async function calculate() {
     shouldResetDisplay = true;
 }
 
+// Load the user's most recent calculations
+async function loadHistory() {
+    try {
+        const response = await fetch(`${CONFIG.apiEndpoint}history?limit=10`, {
+            headers: { 'Authorization': idToken }
+        });
+        const data = await response.json();
+
+        if (response.ok) {
+            updateHistory(data.history);
+        }
+    } catch (error) {
+        console.error('Error loading history:', error);
+    }
+}
+
 function updateHistory(history) {
     const historyList = document.getElementById('historyList');
 
@@ -652,7 +669,7 @@ function updateHistory(history) {
         <div class="bg-slate-800/30 rounded-xl p-4 hover:bg-slate-800/50 transition-colors">
             <div class="flex justify-between items-center">
                 <span class="text-gray-400 text-sm">
-                    ${item.operand1} ${opSymbols[item.operation]} ${item.operand2}
+                    ${item.expression || `${item.operand1} ${opSymbols[item.operation]} ${item.operand2}`}
                 </span>
                 <span class="text-white font-medium">= ${item.result}</span>
             </div>
@@ -895,7 +912,7 @@ function showCalculatorFromAdmin() {
 }
 
 function showAdminTab(tab) {
-    const tabs = ['users', 'roles', 'history'];
+    const tabs = ['users', 'roles', 'history', 'usage'];
     tabs.forEach(t => {
         document.getElementById(`admin${t.charAt(0).toUpperCase() + t.slice(1)}Tab`).classList.remove('bg-primary', 'text-white');
         document.getElementById(`admin${t.charAt(0).toUpperCase() + t.slice(1)}Tab`).classList.add('bg-slate-800/50', 'text-gray-300');
@@ -909,6 +926,7 @@ function showAdminTab(tab) {
     if (tab === 'users') loadUsers();
     else if (tab === 'roles') loadRoles();
     else if (tab === 'history') loadAllHistory();
+    else if (tab === 'usage') loadUsageStats();
 }
 
 // ==========================================
@@ -916,8 +934,11 @@ function showAdminTab(tab) {
 // ==========================================
 
 let allRoles = []; // Cache for roles
+let allUsers = [];
+let allUsersCursor = null;
+const selectedUsers = new Set();
 
-async function loadUsers() {
+async function loadUsers(append = false) {
     try {
         // Load roles first for the dropdown
         const rolesResponse = await fetch(`${CONFIG.apiEndpoint}admin/roles`, {
@@ -928,13 +949,19 @@ async function loadUsers() {
             allRoles = rolesData.roles || [];
         }
 
-        const response = await fetch(`${CONFIG.apiEndpoint}admin/users`, {
+        const params = new URLSearchParams();
+        if (append && allUsersCursor) params.set('cursor', allUsersCursor);
+
+        const response = await fetch(`${CONFIG.apiEndpoint}admin/users?${params}`, {
             headers: { 'Authorization': idToken }
         });
         const data = await response.json();
 
         if (response.ok) {
-            renderUsersTable(data.users);
+            allUsers = append ? allUsers.concat(data.users) : data.users;
+            allUsersCursor = data.cursor;
+            if (!append) selectedUsers.clear();
+            renderUsersTable(allUsers);
         } else {
             console.error('Failed to load users:', data.error);
         }
@@ -947,7 +974,8 @@ function renderUsersTable(users) {
     const tbody = document.getElementById('usersTableBody');
 
     if (!users || users.length === 0) {
-        tbody.innerHTML = '<tr><td colspan="5" class="py-8 text-center text-gray-500">No users found</td></tr>';
+        tbody.innerHTML = '<tr><td colspan="6" class="py-8 text-center text-gray-500">No users found</td></tr>';
+        updateSelectedCount();
         return;
     }
 
@@ -957,6 +985,8 @@ function renderUsersTable(users) {
     if (!roleOptions.includes('AdminRole')) {
         roleOptions.push('AdminRole');
     }
+    document.getElementById('bulkRoleSelect').innerHTML = roleOptions
+        .map(roleName => `<option value="${roleName}">${roleName}</option>`).join('');
 
     tbody.innerHTML = users.map(user => {
         const optionsHtml = roleOptions.map(roleName => {
@@ -966,6 +996,10 @@ function renderUsersTable(users) {
 
         return `
         <tr class="border-b border-slate-700/50 hover:bg-slate-800/30">
+            <td class="py-3 px-4">
+                <input type="checkbox" ${selectedUsers.has(user.username) ? 'checked' : ''}
+                    onchange="toggleUserSelection('${user.username}', this.checked)">
+            </td>
             <td class="py-3 px-4 text-white">${user.username}</td>
             <td class="py-3 px-4 text-gray-400">${user.email || user.phone || '-'}</td>
             <td class="py-3 px-4">
@@ -992,7 +1026,101 @@ function renderUsersTable(users) {
                 </div>
             </td>
         </tr>
-    `}).join('');
+    `}).join('') + (allUsersCursor ? `
+        <tr>
+            <td colspan="6" class="py-3 px-4">
+                <button onclick="loadUsers(true)"
+                    class="w-full py-2 rounded-xl text-sm bg-primary/20 text-primary hover:bg-primary/30">
+                    Load more
+                </button>
+            </td>
+        </tr>
+    ` : '');
+    updateSelectedCount();
+}
+
+function toggleUserSelection(username, selected) {
+    if (selected) selectedUsers.add(username);
+    else selectedUsers.delete(username);
+    updateSelectedCount();
+}
+
+function toggleSelectAllUsers(selected) {
+    allUsers.forEach(user => toggleUserSelection(user.username, selected));
+    renderUsersTable(allUsers);
+}
+
+function updateSelectedCount() {
+    document.getElementById('usersSelectedCount').textContent = `${selectedUsers.size} selected`;
+    document.getElementById('selectAllUsers').checked =
+        allUsers.length > 0 && allUsers.every(user => selectedUsers.has(user.username));
+}
+
+// Sends actions to /admin/users/bulk, resubmitting whatever the server left pending
+async function runBulkActions(actions) {
+    const progress = document.getElementById('bulkProgress');
+    const failures = [];
+    let pending = actions;
+    let done = 0;
+
+    try {
+        while (pending.length > 0) {
+            progress.textContent = `Working... ${done}/${actions.length}`;
+            const response = await fetch(`${CONFIG.apiEndpoint}admin/users/bulk`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Authorization': idToken
+                },
+                body: JSON.stringify({ actions: pending.slice(0, 1000) })
+            });
+            const data = await response.json();
+            if (!response.ok) {
+                alert('Bulk update failed: ' + data.error);
+                break;
+            }
+            failures.push(...data.results.filter(result => result.status !== 200));
+            done += data.results.length;
+            pending = data.pending.concat(pending.slice(1000));
+        }
+    } catch (error) {
+        alert('Error: ' + error.message);
+    }
+
+    progress.textContent = `${done - failures.length}/${actions.length} updated`;
+    if (failures.length > 0) {
+        alert(`${failures.length} action(s) failed:\n` +
+            failures.slice(0, 10).map(f => `${f.username}: ${f.error}`).join('\n'));
+    }
+    loadUsers();
+}
+
+function selectedUsernames() {
+    if (selectedUsers.size === 0) {
+        alert('Select at least one user');
+        return null;
+    }
+    return Array.from(selectedUsers);
+}
+
+async function bulkChangeRole() {
+    const usernames = selectedUsernames();
+    if (!usernames) return;
+    const role = document.getElementById('bulkRoleSelect').value;
+    await runBulkActions(usernames.map(username => ({ action: 'role', username, role })));
+}
+
+async function bulkBlockUsers(block) {
+    const usernames = selectedUsernames();
+    if (!usernames) return;
+    await runBulkActions(usernames.map(username => ({ action: 'block', username, block })));
+}
+
+async function bulkDeleteUsers() {
+    const usernames = selectedUsernames();
+    if (!usernames) return;
+    if (!confirm(`Are you sure you want to delete ${usernames.length} user(s)?`)) return;
+    await runBulkActions(usernames.map(username => ({ action: 'delete', username })));
 }
 
 async function changeUserRole(username, newRole) {
@@ -1169,15 +1297,36 @@ async function deleteRole(roleName) {
 // History Management
 // ==========================================
 
-async function loadAllHistory() {
+let allHistoryItems = [];
+let allHistoryCursor = null;
+
+// History timestamps are UTC ISO strings without a zone suffix
+function historyFilterTime(id) {
+    const value = document.getElementById(id).value;
+    return value ? new Date(value).toISOString().replace('Z', '') : '';
+}
+
+async function loadAllHistory(append = false) {
     try {
-        const response = await fetch(`${CONFIG.apiEndpoint}admin/history`, {
+        const params = new URLSearchParams({ limit: '100' });
+        const filters = {
+            operation: document.getElementById('historyOperationFilter').value,
+            role: document.getElementById('historyRoleFilter').value.trim(),
+            from: historyFilterTime('historyFromFilter'),
+            to: historyFilterTime('historyToFilter')
+        };
+        Object.entries(filters).forEach(([name, value]) => value && params.set(name, value));
+        if (append && allHistoryCursor) params.set('cursor', allHistoryCursor);
+
+        const response = await fetch(`${CONFIG.apiEndpoint}admin/history?${params}`, {
             headers: { 'Authorization': idToken }
         });
         const data = await response.json();
 
         if (response.ok) {
-            renderAllHistory(data.history);
+            allHistoryItems = append ? allHistoryItems.concat(data.history) : data.history;
+            allHistoryCursor = data.cursor;
+            renderAllHistory(allHistoryItems);
         }
     } catch (error) {
         console.error('Error loading history:', error);
@@ -1197,7 +1346,7 @@ function renderAllHistory(history) {
         <div class="bg-slate-800/30 rounded-xl p-4 flex items-center justify-between hover:bg-slate-800/50">
             <div>
                 <div class="text-white">
-                    ${item.operand1} ${opSymbols[item.operation] || item.operation} ${item.operand2} = ${item.result}
+                    ${item.expression || `${item.operand1} ${opSymbols[item.operation] || item.operation} ${item.operand2}`} = ${item.result}
                 </div>
                 <div class="text-gray-500 text-xs mt-1">
                     User: ${item.userId} | ${new Date(item.timestamp).toLocaleString()}
@@ -1208,7 +1357,54 @@ function renderAllHistory(history) {
                 Delete
             </button>
         </div>
-    `).join('');
+    `).join('') + (allHistoryCursor ? `
+        <button onclick="loadAllHistory(true)"
+            class="w-full py-2 rounded-xl text-sm bg-primary/20 text-primary hover:bg-primary/30">
+            Load more
+        </button>
+    ` : '');
+}
+
+const EXPORT_POLL_INTERVAL_MS = 2000;
+const EXPORT_POLL_LIMIT = 450; // 15 minutes, the export function's timeout
+
+async function exportHistory(format) {
+    const buttons = ['exportCsvButton', 'exportNdjsonButton'].map(id => document.getElementById(id));
+    buttons.forEach(button => button.disabled = true);
+    try {
+        const response = await fetch(`${CONFIG.apiEndpoint}admin/history/export`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Authorization': idToken
+            },
+            body: JSON.stringify({ format })
+        });
+        let job = await response.json();
+        if (!response.ok) {
+            alert('Export failed: ' + job.error);
+            return;
+        }
+
+        // The export runs in the background; poll until it has a download URL
+        for (let attempt = 0; attempt < EXPORT_POLL_LIMIT && ['queued', 'running'].includes(job.status); attempt++) {
+            await new Promise(resolve => setTimeout(resolve, EXPORT_POLL_INTERVAL_MS));
+            const status = await fetch(`${CONFIG.apiEndpoint}admin/history/export?jobId=${job.jobId}`, {
+                headers: { 'Authorization': idToken }
+            });
+            job = await status.json();
+        }
+
+        if (job.status === 'complete') {
+            window.location.href = job.url;
+        } else {
+            alert('Export failed: ' + (job.error || `job is still ${job.status}`));
+        }
+    } catch (error) {
+        alert('Error: ' + error.message);
+    } finally {
+        buttons.forEach(button => button.disabled = false);
+    }
 }
 
 async function deleteHistoryEntry(userId, timestamp) {
@@ -1229,3 +1425,51 @@ async function deleteHistoryEntry(userId, timestamp) {
         console.error('Error deleting history:', error);
     }
 }
+
+// ==========================================
+// Usage Stats
+// ==========================================
+
+async function loadUsageStats() {
+    const container = document.getElementById('usageStatsList');
+    const dimension = document.getElementById('usageDimension').value;
+    try {
+        const params = new URLSearchParams({ dimension, granularity: 'day' });
+        const response = await fetch(`${CONFIG.apiEndpoint}admin/stats?${params}`, {
+            headers: { 'Authorization': idToken }
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            container.innerHTML = `<div class="text-red-400 text-center py-8">${data.error}</div>`;
+            return;
+        }
+
+        const rows = Object.entries(data.totals).sort((a, b) => b[1].calculations - a[1].calculations);
+        if (rows.length === 0) {
+            container.innerHTML = '<div class="text-gray-500 text-center py-8">No usage recorded</div>';
+            return;
+        }
+        const operations = ['add', 'subtract', 'multiply', 'divide', 'expression'];
+        container.innerHTML = `
+            <table class="w-full text-sm">
+                <thead>
+                    <tr class="text-gray-400 border-b border-slate-700">
+                        <th class="text-left py-2">${dimension}</th>
+                        <th class="text-right py-2">total</th>
+                        ${operations.map(op => `<th class="text-right py-2">${op}</th>`).join('')}
+                    </tr>
+                </thead>
+                <tbody>
+                    ${rows.map(([name, counts]) => `
+                        <tr class="text-gray-300 border-b border-slate-800">
+                            <td class="py-2">${name}</td>
+                            <td class="text-right py-2 text-white">${counts.calculations}</td>
+                            ${operations.map(op => `<td class="text-right py-2">${counts.operations[op] || 0}</td>`).join('')}
+                        </tr>
+                    `).join('')}
+                </tbody>
+            </table>`;
+    } catch (error) {
+        console.error('Error loading usage stats:', error);
+    }
+}
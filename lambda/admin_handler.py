@@ -4,34 +4,53 @@ Provides admin operations for user management, role management, and history acce
 """
 import json
 import os
-import boto3
-from decimal import Decimal
+import time
+from concurrent.futures import ThreadPoolExecutor
+import api_response
+from aws_clients import client, resource, stats
+from history_export import get_export_job, start_export_job
+from metrics import instrument, phase
+from pagination import (
+    InvalidCursor, decode_cursor, decode_key_cursor, encode_cursor, parse_limit, timestamp_range
+)
+from recent_history import remove_recent_entry
+from role_permissions import ROLES_VERSION_KEY, bump_roles_version
+from structured_log import get_logger
+from throttling import error_code, is_throttling_error
+from usage_stats import read_stats
+from user_directory import remove_user, scan_users, update_user
 
-cognito = boto3.client('cognito-idp')
-dynamodb = boto3.resource('dynamodb')
+cognito = client('cognito-idp')
+dynamodb = resource('dynamodb')
+logger = get_logger('admin_handler')
 
 USER_POOL_ID = os.environ.get('USER_POOL_ID')
 ROLES_TABLE = os.environ.get('ROLES_TABLE')
 HISTORY_TABLE = os.environ.get('HISTORY_TABLE')
 
-# Helper for JSON serialization of Decimal
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return super().default(obj)
+# /admin/users page sizes
+USERS_PAGE_SIZE = 60
+USERS_MAX_PAGE_SIZE = 500
+
+# /admin/users/bulk: concurrency, size and time budget (API Gateway times out at 29s)
+BULK_WORKERS = 16
+BULK_MAX_ACTIONS = 1000
+BULK_TIME_BUDGET_SECONDS = 25
+BULK_TIME_MARGIN_SECONDS = 3
+
+# /admin/history page sizes and parallel export segments
+HISTORY_PAGE_SIZE = 100
+HISTORY_MAX_PAGE_SIZE = 1000
+EXPORT_SEGMENTS = 4
+EXPORT_MAX_SEGMENTS = 16
+
+# CalculatorHistory key, and its GSIs (partition key, sort key timestamp)
+HISTORY_KEY = ('userId', 'timestamp')
+HISTORY_OPERATION_INDEX = 'ByOperation'
+HISTORY_ROLE_INDEX = 'ByRole'
 
 def response(status_code, body):
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-            'Access-Control-Allow-Methods': 'GET,POST,DELETE,OPTIONS'
-        },
-        'body': json.dumps(body, cls=DecimalEncoder)
-    }
+    return api_response.response(status_code, body, methods='GET,POST,DELETE,OPTIONS')
 
 def check_admin(event):
     """Check if the caller is an admin"""
@@ -44,8 +63,9 @@ def check_admin(event):
     except:
         return False
 
+@instrument('admin_handler')
 def handler(event, context):
-    print(f"Admin handler event: {json.dumps(event)}")
+    logger.event(event, 'Admin handler event')
     
     # Verify admin access
     if not check_admin(event):
@@ -53,11 +73,12 @@ def handler(event, context):
     
     http_method = event['httpMethod']
     path = event['path']
+    params = event.get('queryStringParameters') or {}
     
     try:
         # User Management
         if path == '/admin/users' and http_method == 'GET':
-            return list_users()
+            return list_users(params)
         elif path == '/admin/users/role' and http_method == 'POST':
             body = json.loads(event['body'])
             return update_user_role(body['username'], body['role'])
@@ -67,6 +88,9 @@ def handler(event, context):
         elif path == '/admin/users' and http_method == 'DELETE':
             body = json.loads(event['body'])
             return delete_user(body['username'])
+        elif path == '/admin/users/bulk' and http_method == 'POST':
+            body = json.loads(event['body'])
+            return bulk_user_actions(body['actions'], context)
         
         # Role Management
         elif path == '/admin/roles' and http_method == 'GET':
@@ -80,78 +104,71 @@ def handler(event, context):
         
         # History Management
         elif path == '/admin/history' and http_method == 'GET':
-            return get_all_history()
+            return get_all_history(params)
         elif path == '/admin/history' and http_method == 'DELETE':
             body = json.loads(event['body'])
             return delete_history(body['userId'], body['timestamp'])
+        elif path == '/admin/history/export' and http_method == 'POST':
+            body = json.loads(event['body'] or '{}')
+            return response(202, start_export_job(body))
+        elif path == '/admin/history/export' and http_method == 'GET':
+            return get_export(params)
+        
+        # Usage Stats
+        elif path == '/admin/stats' and http_method == 'GET':
+            return get_usage_stats(params)
         
         else:
             return response(404, {'error': 'Not found'})
     
+    except ValueError as e:
+        return response(400, {'error': str(e)})
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error('Admin request failed: %s', e, path=path, method=http_method)
+        if is_throttling_error(e):
+            return response(429, {'error': 'Too many requests, please retry shortly'})
         return response(500, {'error': str(e)})
 
 # ==========================================
 # User Management Functions
 # ==========================================
 
-def list_users():
-    """List all users in the user pool"""
-    result = cognito.list_users(UserPoolId=USER_POOL_ID, Limit=60)
-    
-    users = []
-    for user in result.get('Users', []):
-        # Get user groups
-        groups_result = cognito.admin_list_groups_for_user(
-            Username=user['Username'],
-            UserPoolId=USER_POOL_ID
-        )
-        groups = [g['GroupName'] for g in groups_result.get('Groups', [])]
-        
-        # Get user attributes
-        attrs = {attr['Name']: attr['Value'] for attr in user.get('Attributes', [])}
-        
-        users.append({
-            'username': user['Username'],
-            'email': attrs.get('email', ''),
-            'phone': attrs.get('phone_number', ''),
-            'role': attrs.get('custom:role', ''),
-            'groups': groups,
-            'enabled': user['Enabled'],
-            'status': user['UserStatus'],
-            'created': user['UserCreateDate'].isoformat()
-        })
-    
-    return response(200, {'users': users})
+def list_users(params):
+    """List one page of users from the materialized user directory"""
+    limit = parse_limit(params, USERS_PAGE_SIZE, USERS_MAX_PAGE_SIZE)
+    try:
+        start_key = decode_cursor(params.get('cursor'))
+    except InvalidCursor as e:
+        return response(400, {'error': str(e)})
+    with phase('directory_scan'):
+        users, last_key = scan_users(limit, start_key)
+    return response(200, {'users': users, 'cursor': encode_cursor(last_key)})
 
 def update_user_role(username, new_role):
     """Update a user's role (change group membership)"""
-    # Get current groups
-    groups_result = cognito.admin_list_groups_for_user(
-        Username=username,
-        UserPoolId=USER_POOL_ID
-    )
+    return response(200, {'message': change_user_role(username, new_role)})
+
+def block_user(username, block):
+    """Enable or disable a user"""
+    return response(200, {'message': set_user_blocked(username, block)})
+
+def delete_user(username):
+    """Delete a user from the user pool"""
+    return response(200, {'message': delete_cognito_user(username)})
+
+def change_user_role(username, new_role):
+    """Move a user into `new_role`, keeping AdminRole membership"""
+    groups_result = cognito.admin_list_groups_for_user(Username=username, UserPoolId=USER_POOL_ID)
     current_groups = [g['GroupName'] for g in groups_result.get('Groups', [])]
     
     # Remove from current role groups (not AdminRole)
     for group in current_groups:
-        if group != 'AdminRole':
-            try:
-                cognito.admin_remove_user_from_group(
-                    UserPoolId=USER_POOL_ID,
-                    Username=username,
-                    GroupName=group
-                )
-            except:
-                pass
+        if group not in ('AdminRole', new_role):
+            cognito.admin_remove_user_from_group(UserPoolId=USER_POOL_ID, Username=username, GroupName=group)
     
     # Add to new role group
-    cognito.admin_add_user_to_group(
-        UserPoolId=USER_POOL_ID,
-        Username=username,
-        GroupName=new_role
-    )
+    if new_role not in current_groups:
+        cognito.admin_add_user_to_group(UserPoolId=USER_POOL_ID, Username=username, GroupName=new_role)
     
     # Update custom:role attribute
     cognito.admin_update_user_attributes(
@@ -160,21 +177,80 @@ def update_user_role(username, new_role):
         UserAttributes=[{'Name': 'custom:role', 'Value': new_role}]
     )
     
-    return response(200, {'message': f'Role updated to {new_role}'})
+    groups = list(dict.fromkeys([group for group in current_groups if group == 'AdminRole'] + [new_role]))
+    update_user(username, role=new_role, groups=groups)
+    return f'Role updated to {new_role}'
 
-def block_user(username, block):
-    """Enable or disable a user"""
+def set_user_blocked(username, block):
     if block:
         cognito.admin_disable_user(UserPoolId=USER_POOL_ID, Username=username)
     else:
         cognito.admin_enable_user(UserPoolId=USER_POOL_ID, Username=username)
-    
-    return response(200, {'message': f'User {"blocked" if block else "unblocked"}'})
+    update_user(username, enabled=not block)
+    return f'User {"blocked" if block else "unblocked"}'
 
-def delete_user(username):
-    """Delete a user from the user pool"""
+def delete_cognito_user(username):
     cognito.admin_delete_user(UserPoolId=USER_POOL_ID, Username=username)
-    return response(200, {'message': 'User deleted'})
+    remove_user(username)
+    return 'User deleted'
+
+def apply_user_action(action):
+    """Run one bulk action: {'action': 'role'|'block'|'delete', 'username': ..., ...}"""
+    kind = action.get('action')
+    if kind == 'role':
+        return change_user_role(action['username'], action['role'])
+    if kind == 'block':
+        return set_user_blocked(action['username'], bool(action['block']))
+    if kind == 'delete':
+        return delete_cognito_user(action['username'])
+    raise ValueError(f'Unknown action: {kind}')
+
+def bulk_user_actions(actions, context):
+    """
+    Run many user actions concurrently (the Cognito client rate-limits each
+    API family and retries throttled calls). Actions
+    that could not start before the time budget ran out come back in `pending`
+    so the caller can resubmit them.
+    """
+    if not isinstance(actions, list) or not actions:
+        return response(400, {'error': 'actions must be a non-empty list'})
+    if len(actions) > BULK_MAX_ACTIONS:
+        return response(400, {'error': f'At most {BULK_MAX_ACTIONS} actions per request'})
+    
+    budget = BULK_TIME_BUDGET_SECONDS
+    if context is not None:
+        budget = min(budget, context.get_remaining_time_in_millis() / 1000 - BULK_TIME_MARGIN_SECONDS)
+    deadline = time.monotonic() + budget
+    throttled_before = stats().get('cognito-idp', {}).get('throttled', 0)
+    
+    def run(indexed):
+        index, action = indexed
+        username = action.get('username') if isinstance(action, dict) else None
+        result = {'index': index, 'username': username}
+        if time.monotonic() > deadline:
+            return dict(result, status='pending')
+        try:
+            if not isinstance(action, dict):
+                raise ValueError('Each action must be an object')
+            return dict(result, status=200, message=apply_user_action(action))
+        except (KeyError, ValueError) as e:
+            return dict(result, status=400, error=f'Invalid action: {e}')
+        except Exception as e:
+            code = error_code(e)
+            status = 429 if is_throttling_error(e) else 404 if code == 'UserNotFoundException' else 500
+            return dict(result, status=status, error=str(e))
+    
+    with phase('actions'), ThreadPoolExecutor(max_workers=BULK_WORKERS) as pool:
+        results = list(pool.map(run, enumerate(actions)))
+    
+    pending = [actions[r['index']] for r in results if r['status'] == 'pending']
+    return response(200, {
+        'results': [r for r in results if r['status'] != 'pending'],
+        'pending': pending,
+        'succeeded': sum(1 for r in results if r['status'] == 200),
+        'failed': sum(1 for r in results if r['status'] not in (200, 'pending')),
+        'throttled': stats().get('cognito-idp', {}).get('throttled', 0) - throttled_before
+    })
 
 # ==========================================
 # Role Management Functions
@@ -183,9 +259,10 @@ def delete_user(username):
 def list_roles():
     """List all custom roles from DynamoDB"""
     table = dynamodb.Table(ROLES_TABLE)
-    result = table.scan()
+    with phase('roles_scan'):
+        result = table.scan()
     
-    roles = result.get('Items', [])
+    roles = [item for item in result.get('Items', []) if item.get('roleName') != ROLES_VERSION_KEY]
     
     # Add default roles
     default_roles = [
@@ -200,11 +277,13 @@ def create_role(role_name, permissions):
     table = dynamodb.Table(ROLES_TABLE)
     
     # Create role in DynamoDB
-    table.put_item(Item={
-        'roleName': role_name,
-        'permissions': permissions,
-        'isDefault': False
-    })
+    with phase('roles_write'):
+        table.put_item(Item={
+            'roleName': role_name,
+            'permissions': permissions,
+            'isDefault': False
+        })
+        bump_roles_version(table)
     
     # Create corresponding Cognito group
     try:
@@ -225,7 +304,9 @@ def delete_role(role_name):
         return response(400, {'error': 'Cannot delete default roles'})
     
     table = dynamodb.Table(ROLES_TABLE)
-    table.delete_item(Key={'roleName': role_name})
+    with phase('roles_write'):
+        table.delete_item(Key={'roleName': role_name})
+        bump_roles_version(table)
     
     # Delete Cognito group
     try:
@@ -239,16 +320,170 @@ def delete_role(role_name):
 # History Management Functions
 # ==========================================
 
-def get_all_history():
-    """Get calculation history for all users"""
+def get_all_history(params):
+    """Get one page of calculation history for all users.
+
+    Pass the returned `cursor` back to fetch the next page. `operation` and
+    `role` filters (with an optional `from`/`to` timestamp range) are served
+    newest first by Query on the ByOperation / ByRole indexes; a time range
+    alone falls back to a filtered scan. With `export=true` the scan is split
+    into `segments` that are read in parallel.
+    """
+    limit = parse_limit(params, HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE)
+    if params.get('export') == 'true':
+        return export_history_page(params, limit)
+    if params.get('operation') or params.get('role'):
+        return query_history_index(params, limit)
+
+    from boto3.dynamodb.conditions import Attr
+
     table = dynamodb.Table(HISTORY_TABLE)
-    result = table.scan()
+    scan_kwargs = {'Limit': limit}
+    time_condition = timestamp_range(Attr('timestamp'), params.get('from'), params.get('to'))
+    if time_condition is not None:
+        scan_kwargs['FilterExpression'] = time_condition
+    start_key = decode_key_cursor(params.get('cursor'), HISTORY_KEY)
+    if start_key:
+        scan_kwargs['ExclusiveStartKey'] = start_key
+    with phase('history_scan'):
+        result = table.scan(**scan_kwargs)
+    
+    return response(200, {
+        'history': result.get('Items', []),
+        'cursor': encode_cursor(result.get('LastEvaluatedKey'))
+    })
+
+def query_history_index(params, limit):
+    """One page of history for an operation and/or role, newest first.
+
+    The operation index is used when `operation` is given (narrowed by a role
+    filter if `role` is given too), otherwise the role index. Expressions
+    that needed several roles are indexed under the joined role names
+    (e.g. "ASrole,DMrole").
+    """
+    from boto3.dynamodb.conditions import Attr, Key
+
+    operation, role = params.get('operation'), params.get('role')
+    if operation:
+        index_name, attribute, value = HISTORY_OPERATION_INDEX, 'operation', operation
+    else:
+        index_name, attribute, value = HISTORY_ROLE_INDEX, 'role_used', role
+
+    key_condition = Key(attribute).eq(value)
+    time_condition = timestamp_range(Key('timestamp'), params.get('from'), params.get('to'))
+    if time_condition is not None:
+        key_condition &= time_condition
+    query_kwargs = {
+        'IndexName': index_name,
+        'KeyConditionExpression': key_condition,
+        'ScanIndexForward': False,
+        'Limit': limit
+    }
+    if operation and role:
+        query_kwargs['FilterExpression'] = Attr('role_used').eq(role)
+    # An index LastEvaluatedKey holds the table key plus the index key
+    start_key = decode_key_cursor(params.get('cursor'), HISTORY_KEY + (attribute,))
+    if start_key:
+        if start_key[attribute] != value:
+            raise InvalidCursor('Invalid cursor')
+        query_kwargs['ExclusiveStartKey'] = start_key
+
+    with phase('history_query'):
+        result = dynamodb.Table(HISTORY_TABLE).query(**query_kwargs)
     
-    return response(200, {'history': result.get('Items', [])})
+    return response(200, {
+        'history': result.get('Items', []),
+        'cursor': encode_cursor(result.get('LastEvaluatedKey'))
+    })
+
+def is_segment_position(position):
+    """None, {} or a LastEvaluatedKey of the history table."""
+    if position is None or position == {}:
+        return True
+    return (isinstance(position, dict) and set(position) == set(HISTORY_KEY)
+            and all(isinstance(value, str) and value for value in position.values()))
+
+def export_history_page(params, limit):
+    """Read the next page of every parallel scan segment concurrently.
+
+    The cursor holds one position per segment: {} for a segment that has not
+    started yet, the segment's LastEvaluatedKey, or None once it is exhausted.
+    """
+    state = decode_cursor(params.get('cursor'))
+    if state is None:
+        value = params.get('segments')
+        try:
+            segments = int(value) if value else EXPORT_SEGMENTS
+        except ValueError:
+            raise ValueError(f'Invalid segments: {value}')
+        positions = [{}] * max(1, min(segments, EXPORT_MAX_SEGMENTS))
+    else:
+        positions = state.get('segments') if isinstance(state, dict) and len(state) == 1 else None
+        if (not isinstance(positions, list) or not 0 < len(positions) <= EXPORT_MAX_SEGMENTS
+                or not all(is_segment_position(position) for position in positions)):
+            raise InvalidCursor('Invalid cursor: not an export cursor')
+
+    active = [index for index, position in enumerate(positions) if position is not None]
+    per_segment = max(1, limit // max(1, len(active)))
+
+    def scan_segment(index):
+        # The low-level client is thread-safe, unlike Table resources
+        scan_kwargs = {
+            'TableName': HISTORY_TABLE,
+            'Segment': index,
+            'TotalSegments': len(positions),
+            'Limit': per_segment
+        }
+        if positions[index]:
+            scan_kwargs['ExclusiveStartKey'] = positions[index]
+        result = dynamodb.meta.client.scan(**scan_kwargs)
+        return index, result.get('Items', []), result.get('LastEvaluatedKey')
+
+    items = []
+    next_positions = list(positions)
+    if active:
+        with phase('history_scan'), ThreadPoolExecutor(max_workers=len(active)) as pool:
+            for index, segment_items, last_key in pool.map(scan_segment, active):
+                items.extend(segment_items)
+                next_positions[index] = last_key
+
+    more = any(position is not None for position in next_positions)
+    return response(200, {
+        'history': items,
+        'cursor': encode_cursor({'segments': next_positions}) if more else None
+    })
+
+def get_export(params):
+    """Status of an export job; includes a presigned `url` once it is complete"""
+    job_id = params.get('jobId')
+    if not job_id:
+        return response(400, {'error': 'jobId is required'})
+    job = get_export_job(job_id)
+    if job is None:
+        return response(404, {'error': f'Export job {job_id} not found'})
+    return response(200, job)
+
+# ==========================================
+# Usage Stats Functions
+# ==========================================
+
+def get_usage_stats(params):
+    """Pre-aggregated usage counters for a dimension and time range (see usage_stats)"""
+    with phase('stats_query'):
+        stats = read_stats(
+            granularity=params.get('granularity', 'day'),
+            start=params.get('from'),
+            end=params.get('to'),
+            dimension=params.get('dimension', 'all'),
+            key=params.get('key')
+        )
+    return response(200, stats)
 
 def delete_history(user_id, timestamp):
     """Delete a specific history entry"""
     table = dynamodb.Table(HISTORY_TABLE)
-    table.delete_item(Key={'userId': user_id, 'timestamp': timestamp})
+    with phase('history_delete'):
+        table.delete_item(Key={'userId': user_id, 'timestamp': timestamp})
+        remove_recent_entry(user_id, timestamp)
     
     return response(200, {'message': 'History entry deleted'})
@@ -0,0 +1,34 @@
+"""
+API Response
+API Gateway proxy responses shared by the REST handlers: JSON body (Decimal
+values from DynamoDB serialized as numbers) with the CORS headers the
+frontend needs.
+"""
+import json
+from decimal import Decimal
+from metrics import phase
+
+
+class DecimalEncoder(json.JSONEncoder):
+    """Helper for JSON serialization of Decimal"""
+
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super().default(obj)
+
+
+def response(status_code, body, methods='GET,POST,OPTIONS'):
+    """Helper to create API Gateway response with CORS headers."""
+    with phase('serialize'):
+        payload = json.dumps(body, cls=DecimalEncoder, separators=(',', ':'))
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+            'Access-Control-Allow-Methods': methods
+        },
+        'body': payload
+    }
@@ -0,0 +1,190 @@
+"""
+AWS Clients
+Lazily created, memoized boto3 clients, resources and DynamoDB tables shared
+by the handlers, all built with the same tuned botocore configuration.
+
+Each accessor returns a proxy that builds the real object on first attribute
+access, so a module can keep `cognito = client('cognito-idp')` at import time
+without paying for boto3 until a route actually calls AWS. boto3 itself is
+imported on first use as well.
+
+Every client uses adaptive retries (client-side rate limiting that backs off
+when the service throttles), a connection pool sized for the thread-pool
+fan-out in the handlers, and short connect/read timeouts. Cognito admin APIs
+additionally go through a token bucket per quota family (UserRead,
+UserUpdate, ...) so concurrent admin paths queue instead of tripping the
+account-wide quotas. Buckets are per execution environment, so the defaults
+sit below the Cognito defaults. Calls, retries and throttles are counted per
+service; see stats().
+"""
+import os
+import threading
+
+from throttling import THROTTLING_ERROR_CODES, TokenBucket
+
+MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', '8'))
+MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '50'))
+CONNECT_TIMEOUT_SECONDS = float(os.environ.get('AWS_CONNECT_TIMEOUT', '2'))
+READ_TIMEOUT_SECONDS = float(os.environ.get('AWS_READ_TIMEOUT', '10'))
+
+# Cognito quota family -> default client-side requests per second
+COGNITO_RATE_LIMITS = {
+    'UserRead': 100,
+    'UserUpdate': 20,
+    'UserList': 25,
+    'GroupRead': 20,
+    'GroupWrite': 10
+}
+COGNITO_API_FAMILIES = {
+    'AdminGetUser': 'UserRead',
+    'AdminListGroupsForUser': 'UserRead',
+    'AdminAddUserToGroup': 'UserUpdate',
+    'AdminRemoveUserFromGroup': 'UserUpdate',
+    'AdminUpdateUserAttributes': 'UserUpdate',
+    'AdminDisableUser': 'UserUpdate',
+    'AdminEnableUser': 'UserUpdate',
+    'AdminDeleteUser': 'UserUpdate',
+    'ListUsers': 'UserList',
+    'GetGroup': 'GroupRead',
+    'ListGroups': 'GroupRead',
+    'ListUsersInGroup': 'GroupRead',
+    'CreateGroup': 'GroupWrite',
+    'DeleteGroup': 'GroupWrite'
+}
+
+_lock = threading.RLock()
+_proxies = {}
+_buckets = {}
+_stats = {}
+
+
+class Lazy:
+    """Proxy that creates its target on first attribute access."""
+
+    __slots__ = ('_factory', '_target')
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._target = None
+
+    def __getattr__(self, name):
+        target = self._target
+        if target is None:
+            target = self._resolve()
+        return getattr(target, name)
+
+    def _resolve(self):
+        # boto3 session setup is not thread-safe; handlers fan out on thread pools
+        with _lock:
+            if self._target is None:
+                self._target = self._factory()
+            return self._target
+
+
+def _memoized(key, factory):
+    proxy = _proxies.get(key)
+    if proxy is None:
+        with _lock:
+            proxy = _proxies.setdefault(key, Lazy(factory))
+    return proxy
+
+
+def client_config():
+    """botocore Config shared by every client and resource."""
+    from botocore.config import Config
+    return Config(
+        retries={'mode': 'adaptive', 'total_max_attempts': MAX_ATTEMPTS},
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        connect_timeout=CONNECT_TIMEOUT_SECONDS,
+        read_timeout=READ_TIMEOUT_SECONDS,
+        tcp_keepalive=True
+    )
+
+
+def client(service_name):
+    """Shared low-level client for a service (thread-safe once created)."""
+    def create():
+        import boto3
+        return _instrument(boto3.client(service_name, config=client_config()))
+    return _memoized(('client', service_name), create)
+
+
+def resource(service_name):
+    """Shared resource for a service."""
+    def create():
+        import boto3
+        created = boto3.resource(service_name, config=client_config())
+        _instrument(created.meta.client)
+        return created
+    return _memoized(('resource', service_name), create)
+
+
+def table(table_name):
+    """Shared DynamoDB Table resource."""
+    return _memoized(('table', table_name), lambda: resource('dynamodb').Table(table_name))
+
+
+def cognito_bucket(family):
+    """Token bucket for a Cognito quota family (COGNITO_<FAMILY>_RPS overrides the rate)."""
+    bucket = _buckets.get(family)
+    if bucket is None:
+        with _lock:
+            if family not in _buckets:
+                rate = os.environ.get(f'COGNITO_{family.upper()}_RPS', COGNITO_RATE_LIMITS[family])
+                _buckets[family] = TokenBucket(float(rate))
+            bucket = _buckets[family]
+    return bucket
+
+
+def stats():
+    """Snapshot of call, retry and throttle counters per service."""
+    with _lock:
+        return {service: dict(counters) for service, counters in _stats.items()}
+
+
+def reset():
+    """Forget every created client (e.g. after changing endpoints in tests)."""
+    with _lock:
+        for proxy in _proxies.values():
+            proxy._target = None
+        _buckets.clear()
+        _stats.clear()
+
+
+def _count(service, name, amount=1):
+    with _lock:
+        counters = _stats.setdefault(service, {'calls': 0, 'retries': 0, 'throttled': 0, 'throttle_errors': 0})
+        counters[name] += amount
+
+
+def _instrument(service_client):
+    """Hook rate limiting and counters into a client's event system."""
+    events = service_client.meta.events
+    service_id = service_client.meta.service_model.service_id.hyphenize()
+    service = service_client.meta.service_model.service_name
+
+    if service == 'cognito-idp':
+        def limit(model, **kwargs):
+            family = COGNITO_API_FAMILIES.get(model.name)
+            if family:
+                cognito_bucket(family).acquire()
+        events.register(f'before-call.{service_id}', limit)
+
+    def on_attempt(response, **kwargs):
+        # Fires after every attempt, before botocore decides whether to retry
+        if response is not None and _error_code(response[1]) in THROTTLING_ERROR_CODES:
+            _count(service, 'throttled')
+
+    def on_result(parsed, **kwargs):
+        _count(service, 'calls')
+        _count(service, 'retries', parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0))
+        if _error_code(parsed) in THROTTLING_ERROR_CODES:
+            _count(service, 'throttle_errors')
+
+    events.register(f'needs-retry.{service_id}', on_attempt)
+    events.register(f'after-call.{service_id}', on_result)
+    return service_client
+
+
+def _error_code(parsed):
+    return (parsed or {}).get('Error', {}).get('Code')
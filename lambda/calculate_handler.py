@@ -1,52 +1,66 @@
 import json
-import boto3
 import os
-from decimal import Decimal
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from datetime import datetime, timedelta
 
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['HISTORY_TABLE'])
-roles_table = dynamodb.Table(os.environ['ROLES_TABLE'])
+from api_response import response
+from aws_clients import resource, table as aws_table
+from expression import compile_expression
+from history_store import save_history, write_behind_enabled
+from metrics import instrument, phase, set_dimension
+from pagination import InvalidCursor, decode_key_cursor, encode_cursor, parse_limit, timestamp_range
+from recent_history import RECENT_HISTORY_SIZE, history_entry, peek_recent_history, push_recent_history
+from role_permissions import PERMISSIONS_CLAIM, get_role_index, index_from_claim
+from throttling import is_throttling_error
+from vector_ops import calculate_vector, is_vector_request, summarize
 
-# Default role permissions (fallback)
-DEFAULT_ROLE_PERMISSIONS = {
-    'DMrole': ['divide', 'multiply'],
-    'ASrole': ['add', 'subtract'],
-    'AdminRole': ['add', 'subtract', 'divide', 'multiply']
-}
+dynamodb = resource('dynamodb')
+table = aws_table(os.environ['HISTORY_TABLE'])
 
-def get_role_permissions():
-    """Load role permissions from DynamoDB, merge with defaults."""
-    permissions = DEFAULT_ROLE_PERMISSIONS.copy()
-    
-    try:
-        # Scan RolesTable for custom roles
-        result = roles_table.scan()
-        for item in result.get('Items', []):
-            role_name = item.get('roleName')
-            role_perms = item.get('permissions', [])
-            if role_name and role_perms:
-                permissions[role_name] = role_perms
-    except Exception as e:
-        print(f"Could not load custom roles: {e}")
-    
-    return permissions
+# Runs the durable history write alongside the recent-list update
+executor = ThreadPoolExecutor(max_workers=4)
+
+# Operation dimension values (anything else is reported as 'invalid')
+OPERATIONS = {'add', 'subtract', 'multiply', 'divide'}
+
+# /calculate/batch limits
+MAX_BATCH_SIZE = 500
+
+# GET /history page size
+HISTORY_MAX_PAGE_SIZE = 100
+
+
+class CalculationError(ValueError):
+    """Raised for requests that cannot be calculated (reported as 400)."""
+
+
+def get_claim_index(claims):
+    """Index the permissions the pre-token-generation trigger put in the ID token."""
+    return index_from_claim(claims.get(PERMISSIONS_CLAIM))
 
 
+@instrument('calculate_handler')
 def handler(event, context):
     """
     Calculator Lambda handler with Role-Based Access Control.
-    - Loads permissions from RolesTable DynamoDB
+    - Authorizes from the permissions claim in the ID token
+    - Falls back to RolesTable DynamoDB (cached across warm invocations)
     - Supports custom roles
+    - POST /calculate with an `expression` evaluates a whole formula
+    - POST /calculate with array operands runs the operation element-wise
+    - POST /calculate/batch runs many operations in one request
+    - GET /history pages through the caller's history
     """
     try:
-        # Load role permissions (includes custom roles)
-        role_permissions = get_role_permissions()
-        
         # Get user info from Cognito authorizer
         claims = event['requestContext']['authorizer']['claims']
         user_id = claims['sub']
         
+        if event.get('path') == '/history' and event.get('httpMethod') == 'GET':
+            set_dimension('Operation', 'history')
+            return get_history(user_id, event.get('queryStringParameters') or {})
+        
         # Get user's groups (roles) from the token
         # Groups come as a string like "[DMrole]" or "[DMrole, ASrole]"
         groups_claim = claims.get('cognito:groups', '[]')
@@ -56,51 +70,49 @@ def handler(event, context):
         else:
             groups = groups_claim if groups_claim else []
         
-        # Parse request body
-        body = json.loads(event['body'])
+        # Load role permissions: resolved at sign-in when the token carries them,
+        # otherwise from RolesTable (tokens issued before the trigger existed)
+        with phase('roles'):
+            role_index = get_claim_index(claims)
+            if role_index is None:
+                role_index = get_role_index()
+        
+        # Parse request body (non-integer numbers parse straight to Decimal)
+        with phase('parse'):
+            body = json.loads(event['body'], parse_float=Decimal)
+        
+        # Callers that never show history can leave it out of the response
+        params = event.get('queryStringParameters') or {}
+        include_history = body.get('includeHistory', True) is not False and params.get('includeHistory') != 'false'
+        
+        if event.get('path') == '/calculate/batch':
+            set_dimension('Operation', 'batch')
+            return calculate_batch(user_id, groups, role_index, body)
+        
+        if 'expression' in body:
+            set_dimension('Operation', 'expression')
+            return calculate_expression(user_id, groups, role_index, body, include_history)
+        
+        if is_vector_request(body):
+            set_dimension('Operation', 'vector')
+            return calculate_vector_request(user_id, groups, role_index, body, include_history)
+        
         operand1 = Decimal(str(body['operand1']))
         operand2 = Decimal(str(body['operand2']))
         operation = body['operation']
+        set_dimension('Operation', operation if operation in OPERATIONS else 'invalid')
         
         # 🔒 Role-Based Access Control Check
-        allowed = False
-        required_role = None
-        
-        # Check all roles the user has for this operation
-        for user_role in groups:
-            if user_role in role_permissions:
-                if operation in role_permissions[user_role]:
-                    allowed = True
-                    required_role = user_role
-                    break
-        
-        # If not allowed, find what role IS needed
-        if not allowed:
-            for role, allowed_ops in role_permissions.items():
-                if operation in allowed_ops:
-                    required_role = role
-                    break
-            
-            return response(403, {
-                'error': f'Access Denied: You need a role with "{operation}" permission.',
-                'your_roles': groups,
-                'required_role': required_role or 'Unknown'
-            })
+        required_role = role_index.granting_role(groups, operation)
+        if required_role is None:
+            return response(403, access_denied(operation, groups))
         
         # Perform calculation
-        result = None
-        if operation == 'add':
-            result = operand1 + operand2
-        elif operation == 'subtract':
-            result = operand1 - operand2
-        elif operation == 'multiply':
-            result = operand1 * operand2
-        elif operation == 'divide':
-            if operand2 == 0:
-                return response(400, {'error': 'Division by zero'})
-            result = operand1 / operand2
-        else:
-            return response(400, {'error': f'Unknown operation: {operation}'})
+        try:
+            with phase('compute'):
+                result = calculate(operand1, operand2, operation)
+        except CalculationError as e:
+            return response(400, {'error': str(e)})
         
         # Store in DynamoDB
         timestamp = datetime.utcnow().isoformat()
@@ -113,48 +125,284 @@ def handler(event, context):
             'result': result,
             'role_used': required_role
         }
-        table.put_item(Item=item)
-        
-        # Get recent history for this user
-        history_response = table.query(
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('userId').eq(user_id),
-            ScanIndexForward=False,
-            Limit=10
-        )
-        
-        history = []
-        for record in history_response.get('Items', []):
-            history.append({
-                'operand1': str(record['operand1']),
-                'operand2': str(record['operand2']),
-                'operation': record['operation'],
-                'result': str(record['result']),
-                'timestamp': record['timestamp']
-            })
-        
-        return response(200, {
+        history = record_calculation(item, include_history)
+        
+        body_out = {
             'result': str(result),
-            'history': history,
             'user_roles': groups
-        })
+        }
+        if include_history:
+            body_out['history'] = history
+        
+        return response(200, body_out)
         
     except KeyError as e:
         return response(400, {'error': f'Missing field: {str(e)}'})
     except json.JSONDecodeError:
         return response(400, {'error': 'Invalid JSON body'})
+    except ValueError as e:
+        return response(400, {'error': str(e)})
     except Exception as e:
+        if is_throttling_error(e):
+            return response(429, {'error': 'Too many requests, please retry shortly'})
         return response(500, {'error': str(e)})
 
 
-def response(status_code, body):
-    """Helper to create API Gateway response with CORS headers."""
+def record_calculation(item, include_history):
+    """
+    Persist one history row and return the user's recent history
+    (None when the caller did not ask for it in write-behind mode).
+    """
+    user_id = item['userId']
+    if write_behind_enabled():
+        # Write-behind: answer once the row is enqueued; history_writer persists it
+        with phase('history_enqueue'):
+            if save_history([item]):
+                raise RuntimeError('Could not enqueue calculation history')
+        with phase('history_read'):
+            return peek_recent_history(user_id, [history_entry(item)]) if include_history else None
+    
+    # The durable row and the user's recent list are written concurrently;
+    # the recent list update returns the history for the response
+    with phase('history_write'):
+        pending_put = executor.submit(dynamodb.meta.client.put_item, TableName=table.name, Item=item)
+        history = push_recent_history(user_id, [history_entry(item)])
+        pending_put.result()
+    return history
+
+
+def get_history(user_id, params):
+    """
+    Return one page of the caller's history, newest first.
+    Optional `from`/`to` bound the timestamp sort key (inclusive, ISO-8601);
+    pass the returned `cursor` back to continue.
+    """
+    from boto3.dynamodb.conditions import Key
+    
+    limit = parse_limit(params, RECENT_HISTORY_SIZE, HISTORY_MAX_PAGE_SIZE)
+    
+    key_condition = Key('userId').eq(user_id)
+    time_condition = timestamp_range(Key('timestamp'), params.get('from'), params.get('to'))
+    if time_condition is not None:
+        key_condition &= time_condition
+    
+    query_kwargs = {
+        'KeyConditionExpression': key_condition,
+        'ScanIndexForward': False,
+        'Limit': limit
+    }
+    start_key = decode_key_cursor(params.get('cursor'), ('userId', 'timestamp'))
+    if start_key:
+        if start_key['userId'] != user_id:
+            raise InvalidCursor('Invalid cursor')
+        query_kwargs['ExclusiveStartKey'] = start_key
+    with phase('history_query'):
+        result = table.query(**query_kwargs)
+    
+    return response(200, {
+        'history': [history_entry(record) for record in result.get('Items', [])],
+        'cursor': encode_cursor(result.get('LastEvaluatedKey'))
+    })
+
+
+def access_denied(operation, groups):
+    """
+    Build the 403 body, naming the roles that WOULD allow the operation.
+    The token claim only holds the caller's own roles, so the names come from
+    the cached RolesTable index; only denials read it.
+    """
+    required_roles = get_role_index().roles_for(operation)
     return {
-        'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-            'Access-Control-Allow-Methods': 'POST,OPTIONS'
-        },
-        'body': json.dumps(body)
+        'error': f'Access Denied: You need a role with "{operation}" permission.',
+        'your_roles': groups,
+        'required_role': required_roles[0] if required_roles else 'Unknown',
+        'required_roles': required_roles
     }
+
+
+def calculate(operand1, operand2, operation):
+    """Apply a binary operation to two Decimals."""
+    if operation == 'add':
+        return operand1 + operand2
+    elif operation == 'subtract':
+        return operand1 - operand2
+    elif operation == 'multiply':
+        return operand1 * operand2
+    elif operation == 'divide':
+        if operand2 == 0:
+            raise CalculationError('Division by zero')
+        return operand1 / operand2
+    else:
+        raise CalculationError(f'Unknown operation: {operation}')
+
+
+def calculate_expression(user_id, groups, role_index, body, include_history):
+    """
+    Evaluate an arithmetic expression in one request. Access is checked once
+    per operator the expression uses; one history row is written for it.
+    """
+    text = body['expression']
+    if not isinstance(text, str):
+        return response(400, {'error': 'expression must be a string'})
+    with phase('compile'):
+        compiled = compile_expression(text)
+    
+    # 🔒 Every operator needs a granting role
+    granting_roles = {}
+    for operation in sorted(compiled.operations):
+        granting_roles[operation] = role_index.granting_role(groups, operation)
+        if granting_roles[operation] is None:
+            return response(403, access_denied(operation, groups))
+    
+    try:
+        with phase('compute'):
+            result = compiled.evaluate()
+    except ArithmeticError:
+        return response(400, {'error': 'Result out of range'})
+    
+    # Prefer one of the user's roles that covers every operator
+    role_used = (role_index.covering_role(groups, compiled.operations)
+                 or ','.join(sorted(set(granting_roles.values()))))
+    item = {
+        'userId': user_id,
+        'timestamp': datetime.utcnow().isoformat(),
+        'operation': 'expression',
+        'expression': text,
+        'result': result,
+        'role_used': role_used
+    }
+    history = record_calculation(item, include_history)
+    
+    body_out = {
+        'result': str(result),
+        'operations': sorted(compiled.operations),
+        'user_roles': groups
+    }
+    if include_history:
+        body_out['history'] = history
+    
+    return response(200, body_out)
+
+
+def calculate_vector_request(user_id, groups, role_index, body, include_history):
+    """
+    Apply one operation across arrays of operands in a single pass.
+    The history row stores a summary (count, sum, min, max), not every element.
+    """
+    operation = body['operation']
+    required_role = role_index.granting_role(groups, operation)
+    if required_role is None:
+        return response(403, access_denied(operation, groups))
+    
+    try:
+        with phase('compute'):
+            results = calculate_vector(body['operand1'], body['operand2'], operation)
+            summary = summarize(results)
+    except ArithmeticError:
+        return response(400, {'error': 'Result out of range'})
+    
+    def describe(operand):
+        return f"[{len(operand)} values]" if isinstance(operand, list) else Decimal(str(operand))
+    
+    item = {
+        'userId': user_id,
+        'timestamp': datetime.utcnow().isoformat(),
+        'operand1': describe(body['operand1']),
+        'operand2': describe(body['operand2']),
+        'operation': operation,
+        'result': f"[{summary['count']} values]",
+        'vector': summary,
+        'role_used': required_role
+    }
+    history = record_calculation(item, include_history)
+    
+    body_out = {
+        'result': [str(value) for value in results],
+        'count': summary['count'],
+        'user_roles': groups
+    }
+    if include_history:
+        body_out['history'] = history
+    
+    return response(200, body_out)
+
+
+def calculate_batch(user_id, groups, role_index, body):
+    """
+    Run a list of {operand1, operand2, operation} in one request.
+    Permissions are checked once per distinct operation and all history rows
+    are written with BatchWriteItem (or enqueued in write-behind mode).
+    Failures are reported per item.
+    """
+    operations = body['operations']
+    if not isinstance(operations, list) or not operations:
+        return response(400, {'error': 'operations must be a non-empty list'})
+    if len(operations) > MAX_BATCH_SIZE:
+        return response(400, {'error': f'At most {MAX_BATCH_SIZE} operations per batch'})
+    
+    # 🔒 One access check per distinct operation
+    granting_roles = {}
+    for entry in operations:
+        operation = entry.get('operation') if isinstance(entry, dict) else None
+        if isinstance(operation, str) and operation not in granting_roles:
+            granting_roles[operation] = role_index.granting_role(groups, operation)
+    
+    started = datetime.utcnow()
+    results = []
+    items = []
+    for index, entry in enumerate(operations):
+        try:
+            operation = entry['operation']
+            required_role = granting_roles.get(operation) if isinstance(operation, str) else None
+            if required_role is None:
+                results.append(dict(access_denied(operation, groups), index=index, status=403))
+                continue
+            operand1 = Decimal(str(entry['operand1']))
+            operand2 = Decimal(str(entry['operand2']))
+            result = calculate(operand1, operand2, operation)
+        except KeyError as e:
+            results.append({'index': index, 'status': 400, 'error': f'Missing field: {str(e)}'})
+            continue
+        except TypeError:
+            results.append({'index': index, 'status': 400, 'error': 'Invalid operation entry'})
+            continue
+        except InvalidOperation:
+            results.append({'index': index, 'status': 400, 'error': 'Invalid operand'})
+            continue
+        except CalculationError as e:
+            results.append({'index': index, 'status': 400, 'error': str(e)})
+            continue
+        
+        # Offset each row by a microsecond so sort keys stay unique within the batch
+        timestamp = (started + timedelta(microseconds=len(items))).isoformat()
+        items.append({
+            'userId': user_id,
+            'timestamp': timestamp,
+            'operand1': operand1,
+            'operand2': operand2,
+            'operation': operation,
+            'result': result,
+            'role_used': required_role
+        })
+        results.append({'index': index, 'status': 200, 'result': str(result), 'timestamp': timestamp})
+    
+    # Store in DynamoDB, flagging any rows that could not be written
+    with phase('history_write'):
+        unsaved = {item['timestamp'] for item in save_history(items)}
+    for entry in results:
+        if entry.get('timestamp') in unsaved:
+            entry['error'] = 'Result was not saved to history'
+    
+    saved = [history_entry(item) for item in items if item['timestamp'] not in unsaved]
+    newest = saved[::-1][:RECENT_HISTORY_SIZE]
+    with phase('history_read' if write_behind_enabled() else 'recent_write'):
+        if write_behind_enabled():
+            history = peek_recent_history(user_id, newest)
+        else:
+            history = push_recent_history(user_id, newest) if newest else []
+    
+    return response(200, {
+        'results': results,
+        'history': history,
+        'user_roles': groups
+    })
@@ -1,20 +1,23 @@
 """
 CreateAuthChallenge Lambda Trigger
-Generates OTP and sends it via SMS using SNS.
+Generates OTP and hands it to the OTP queue; the OTP sender Lambda sends the
+SMS, so sign-in does not wait on SNS. Resends are rate limited per phone
+number (see otp_delivery).
 """
-import json
-import os
-import random
-import boto3
+import secrets
+from metrics import instrument, phase
+from otp_delivery import OtpRateLimited, check_send_rate, dispatch_otp, get_sms_sender
+from structured_log import get_logger
 
-sns = boto3.client('sns')
+logger = get_logger('create_auth_challenge')
 
+@instrument('create_auth_challenge')
 def handler(event, context):
-    print(f"CreateAuthChallenge event: {json.dumps(event)}")
+    logger.event(event, 'CreateAuthChallenge event')
     
     if event['request']['challengeName'] == 'CUSTOM_CHALLENGE':
         # Generate 6-digit OTP
-        otp = str(random.randint(100000, 999999))
+        otp = str(100000 + secrets.randbelow(900000))
         
         # Get user's phone number
         phone_number = None
@@ -28,21 +31,28 @@ def handler(event, context):
         
         if phone_number:
             try:
-                # Send OTP via SMS
-                sns.publish(
-                    PhoneNumber=phone_number,
-                    Message=f'Your Calculator App login OTP is: {otp}. Valid for 5 minutes.',
-                    MessageAttributes={
-                        'AWS.SNS.SMS.SMSType': {
-                            'DataType': 'String',
-                            'StringValue': 'Transactional'
-                        }
-                    }
-                )
-                print(f"OTP sent to {phone_number}")
+                with phase('rate_limit'):
+                    check_send_rate(phone_number)
+            except OtpRateLimited:
+                logger.warning('OTP rate limit reached for phone ending %s', phone_number[-4:])
+                # Fails this sign-in attempt; Cognito returns the message to the client
+                raise
             except Exception as e:
-                print(f"Failed to send SMS: {e}")
-                # Continue anyway - OTP will be in logs for testing
+                # Don't block sign-in on the limiter
+                logger.error('Rate limit check failed: %s', e)
+
+            try:
+                with phase('dispatch'):
+                    outcome = dispatch_otp(phone_number, otp)
+                logger.info('OTP %s for phone ending %s', outcome, phone_number[-4:])
+            except Exception as e:
+                logger.error('Failed to queue OTP, sending directly: %s', e)
+                try:
+                    with phase('sms'):
+                        get_sms_sender().send(phone_number, otp)
+                except Exception as e:
+                    logger.error('Failed to send SMS: %s', e)
+                    # Continue anyway - the user can request a new code
         
         # Store OTP in private challenge parameters (not visible to client)
         event['response']['privateChallengeParameters'] = {
@@ -57,5 +67,5 @@ def handler(event, context):
         # Challenge metadata
         event['response']['challengeMetadata'] = 'OTP_CHALLENGE'
     
-    print(f"CreateAuthChallenge response: {json.dumps(event['response'])}")
+    logger.debug('CreateAuthChallenge response', response=event['response'])
     return event
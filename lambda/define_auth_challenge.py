@@ -2,10 +2,14 @@
 DefineAuthChallenge Lambda Trigger
 Decides what authentication challenge to present to the user.
 """
-import json
+from metrics import instrument
+from structured_log import get_logger
 
+logger = get_logger('define_auth_challenge')
+
+@instrument('define_auth_challenge')
 def handler(event, context):
-    print(f"DefineAuthChallenge event: {json.dumps(event)}")
+    logger.event(event, 'DefineAuthChallenge event')
     
     session = event['request'].get('session', [])
     
@@ -29,5 +33,5 @@ def handler(event, context):
         event['response']['issueTokens'] = False
         event['response']['failAuthentication'] = True
     
-    print(f"DefineAuthChallenge response: {json.dumps(event['response'])}")
+    logger.debug('DefineAuthChallenge response', response=event['response'])
     return event
@@ -0,0 +1,104 @@
+"""
+Expression Engine
+Parses arithmetic expressions ("(1.5 + 2) * -3 / 4") into a restricted AST and
+compiles it to Decimal closures. Only numbers, parentheses, unary +/- and the
+four calculator operations are accepted; anything else is rejected.
+
+Compiled expressions are kept in an LRU cache keyed by the expression text.
+"""
+import ast
+import os
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+EXPRESSION_CACHE_SIZE = int(os.environ.get('EXPRESSION_CACHE_SIZE', '1024'))
+MAX_EXPRESSION_LENGTH = 1000
+MAX_OPERATIONS = 200
+MAX_DEPTH = 200
+
+# AST operator -> calculator operation (the permission it needs)
+OPERATIONS = {
+    ast.Add: 'add',
+    ast.Sub: 'subtract',
+    ast.Mult: 'multiply',
+    ast.Div: 'divide'
+}
+
+
+class ExpressionError(ValueError):
+    """Raised for expressions that cannot be parsed or evaluated (reported as 400)."""
+
+
+class CompiledExpression:
+    """A parsed expression: `operations` it uses and `evaluate()` to compute it."""
+
+    def __init__(self, text, evaluate, operations):
+        self.text = text
+        self.evaluate = evaluate
+        self.operations = operations
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_expression(text):
+    """Parse and compile an expression. Results are cached by text."""
+    if len(text) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError(f'Expression longer than {MAX_EXPRESSION_LENGTH} characters')
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except (SyntaxError, ValueError, RecursionError):
+        raise ExpressionError('Invalid expression')
+
+    operations = []
+    evaluate = _compile(tree.body, text.strip(), operations, 0)
+    if not operations:
+        # Access is granted per operation, so a bare number would need no role at all
+        raise ExpressionError('Expression must use at least one operation')
+    return CompiledExpression(text, evaluate, frozenset(operations))
+
+
+def _compile(node, source, operations, depth):
+    if depth > MAX_DEPTH:
+        raise ExpressionError(f'Expression nested deeper than {MAX_DEPTH} levels')
+
+    if isinstance(node, ast.BinOp):
+        operation = OPERATIONS.get(type(node.op))
+        if operation is None:
+            raise ExpressionError(f'Unsupported operator: {type(node.op).__name__}')
+        operations.append(operation)
+        if len(operations) > MAX_OPERATIONS:
+            raise ExpressionError(f'Expression uses more than {MAX_OPERATIONS} operations')
+        left = _compile(node.left, source, operations, depth + 1)
+        right = _compile(node.right, source, operations, depth + 1)
+        return _binary(operation, left, right)
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _compile(node.operand, source, operations, depth + 1)
+        if isinstance(node.op, ast.USub):
+            return lambda: -operand()
+        return operand
+
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        # Take the literal text so 0.1 stays exactly 0.1
+        try:
+            value = Decimal(ast.get_source_segment(source, node))
+        except (InvalidOperation, TypeError):
+            raise ExpressionError('Invalid number')
+        return lambda: value
+
+    raise ExpressionError(f'Unsupported syntax: {type(node).__name__}')
+
+
+def _binary(operation, left, right):
+    if operation == 'add':
+        return lambda: left() + right()
+    if operation == 'subtract':
+        return lambda: left() - right()
+    if operation == 'multiply':
+        return lambda: left() * right()
+
+    def divide():
+        divisor = right()
+        if divisor == 0:
+            raise ExpressionError('Division by zero')
+        return left() / divisor
+    return divide
@@ -0,0 +1,236 @@
+"""
+History Export
+Asynchronous export of CalculatorHistory to S3 as NDJSON or CSV.
+
+admin_handler starts a job with start_export_job(): the job's status object
+(exports/<jobId>.json) is written and this module's handler is invoked
+asynchronously. The handler pages through the table (Query when the export
+is for one user, Scan otherwise, with an optional timestamp range) and
+streams rows into a multipart upload, sending a part whenever the buffer
+reaches EXPORT_PART_SIZE. Memory use is one part plus one page of rows,
+however big the table is. Small exports that never fill a part are written
+with a single PutObject instead.
+
+The status object moves through queued -> running -> complete (or failed);
+get_export_job() returns it with a presigned download URL once complete.
+EXPORT_FUNCTION_NAME='local' runs the job in process before returning, for
+tests and local runs.
+"""
+import csv
+import io
+import json
+import os
+import uuid
+from datetime import datetime
+from api_response import DecimalEncoder
+from aws_clients import client, table
+from pagination import timestamp_range
+from structured_log import get_logger
+
+EXPORT_BUCKET = os.environ.get('EXPORT_BUCKET')
+EXPORT_FUNCTION_NAME = os.environ.get('EXPORT_FUNCTION_NAME')
+HISTORY_TABLE = os.environ.get('HISTORY_TABLE')
+
+EXPORT_PREFIX = 'exports/'
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_PART_SIZE = int(os.environ.get('EXPORT_PART_SIZE', str(8 * 1024 * 1024)))  # S3 minimum is 5 MiB
+EXPORT_PAGE_SIZE = 1000
+EXPORT_URL_TTL_SECONDS = 3600
+EXPORT_TIME_MARGIN_MS = 30 * 1000
+CSV_COLUMNS = ['userId', 'timestamp', 'operation', 'operand1', 'operand2', 'expression', 'result', 'role_used']
+
+s3 = client('s3')
+lambda_client = client('lambda')
+logger = get_logger('history_export')
+
+
+class ExportError(ValueError):
+    pass
+
+
+def now_iso():
+    return datetime.utcnow().isoformat()
+
+
+def status_key(job_id):
+    return f'{EXPORT_PREFIX}{job_id}.json'
+
+
+def write_job(job):
+    job['updated'] = now_iso()
+    s3.put_object(Bucket=EXPORT_BUCKET, Key=status_key(job['jobId']),
+                  Body=json.dumps(job).encode('utf-8'), ContentType='application/json')
+    return job
+
+
+def read_job(job_id):
+    """The job's status object, or None if there is no such job."""
+    try:
+        result = s3.get_object(Bucket=EXPORT_BUCKET, Key=status_key(job_id))
+    except s3.exceptions.NoSuchKey:
+        return None
+    return json.loads(result['Body'].read())
+
+
+def start_export_job(params):
+    """Validate the request, record a queued job and hand it to the export function."""
+    export_format = params.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    filters = {name: params[name] for name in ('userId', 'from', 'to')
+               if params.get(name) is not None}
+    for name, value in filters.items():
+        if not isinstance(value, str) or not value:
+            raise ExportError(f'{name} must be a non-empty string')
+
+    job_id = uuid.uuid4().hex
+    job = write_job({
+        'jobId': job_id,
+        'status': 'queued',
+        'format': export_format,
+        'filters': filters,
+        'key': f'{EXPORT_PREFIX}{job_id}.{export_format}',
+        'created': now_iso()
+    })
+    if EXPORT_FUNCTION_NAME == 'local':
+        return run_export(job)
+    lambda_client.invoke(FunctionName=EXPORT_FUNCTION_NAME, InvocationType='Event',
+                         Payload=json.dumps({'jobId': job_id}).encode('utf-8'))
+    return job
+
+
+def get_export_job(job_id):
+    """The job's status, plus a presigned `url` once it is complete."""
+    job = read_job(job_id)
+    if job and job['status'] == 'complete':
+        job['url'] = s3.generate_presigned_url(
+            'get_object', Params={'Bucket': EXPORT_BUCKET, 'Key': job['key']},
+            ExpiresIn=EXPORT_URL_TTL_SECONDS
+        )
+    return job
+
+
+def history_pages(filters):
+    """Yield pages of history items matching the job's filters."""
+    from boto3.dynamodb.conditions import Attr, Key
+
+    field = Key('timestamp') if filters.get('userId') else Attr('timestamp')
+    range_condition = timestamp_range(field, filters.get('from'), filters.get('to'))
+
+    history_table = table(HISTORY_TABLE)
+    kwargs = {'Limit': EXPORT_PAGE_SIZE}
+    if filters.get('userId'):
+        key_condition = Key('userId').eq(filters['userId'])
+        kwargs['KeyConditionExpression'] = key_condition & range_condition if range_condition is not None else key_condition
+        read = history_table.query
+    else:
+        if range_condition is not None:
+            kwargs['FilterExpression'] = range_condition
+        read = history_table.scan
+
+    while True:
+        result = read(**kwargs)
+        yield result.get('Items', [])
+        if 'LastEvaluatedKey' not in result:
+            return
+        kwargs['ExclusiveStartKey'] = result['LastEvaluatedKey']
+
+
+def ndjson_rows(items):
+    return ''.join(json.dumps(item, cls=DecimalEncoder, separators=(',', ':')) + '\n' for item in items)
+
+
+def csv_rows(items, header=False):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS, extrasaction='ignore', lineterminator='\n')
+    if header:
+        writer.writeheader()
+    writer.writerows(items)
+    return out.getvalue()
+
+
+class MultipartWriter:
+    """Buffers bytes and uploads them as S3 parts of at least `part_size` bytes."""
+
+    def __init__(self, bucket, key, content_type, part_size=EXPORT_PART_SIZE):
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts = []
+        self.size = 0
+
+    def write(self, data):
+        self.buffer += data
+        self.size += len(data)
+        if len(self.buffer) >= self.part_size:
+            self._upload_part()
+
+    def _upload_part(self):
+        if self.upload_id is None:
+            self.upload_id = s3.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType=self.content_type
+            )['UploadId']
+        number = len(self.parts) + 1
+        result = s3.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                PartNumber=number, Body=bytes(self.buffer))
+        self.parts.append({'PartNumber': number, 'ETag': result['ETag']})
+        self.buffer.clear()
+
+    def close(self):
+        if self.upload_id is None:
+            # Never filled a part: one plain PUT
+            s3.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer), ContentType=self.content_type)
+            return
+        if self.buffer:
+            self._upload_part()
+        s3.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                     MultipartUpload={'Parts': self.parts})
+
+    def abort(self):
+        if self.upload_id is not None:
+            s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+
+def run_export(job, context=None):
+    """Write the export for `job` and record the outcome in its status object."""
+    job['status'] = 'running'
+    write_job(job)
+    writer = MultipartWriter(EXPORT_BUCKET, job['key'], EXPORT_FORMATS[job['format']], EXPORT_PART_SIZE)
+    rows = 0
+    try:
+        if job['format'] == 'csv':
+            writer.write(csv_rows([], header=True).encode('utf-8'))
+        for items in history_pages(job.get('filters') or {}):
+            if context is not None and context.get_remaining_time_in_millis() < EXPORT_TIME_MARGIN_MS:
+                raise ExportError('Export ran out of time; narrow it with userId or from/to')
+            text = csv_rows(items) if job['format'] == 'csv' else ndjson_rows(items)
+            writer.write(text.encode('utf-8'))
+            rows += len(items)
+        writer.close()
+    except Exception as e:
+        logger.error('Export failed: %s', e, jobId=job['jobId'], rows=rows)
+        try:
+            writer.abort()
+        except Exception as abort_error:
+            logger.error('Could not abort upload: %s', abort_error, jobId=job['jobId'])
+        job.update(status='failed', error=str(e), rows=rows)
+        return write_job(job)
+
+    job.update(status='complete', rows=rows, bytes=writer.size, parts=len(writer.parts))
+    logger.info('Export complete', jobId=job['jobId'], rows=rows, bytes=writer.size)
+    return write_job(job)
+
+
+def handler(event, context):
+    job = read_job(event['jobId'])
+    if job is None:
+        logger.warning('No such export job', jobId=event['jobId'])
+        return None
+    if job['status'] != 'queued':
+        # Async invocations can be delivered twice
+        logger.info('Export is already %s', job['status'], jobId=job['jobId'])
+        return job
+    return run_export(job, context)
@@ -0,0 +1,123 @@
+"""
+History Store
+Persists calculation rows to CalculatorHistory, either directly with
+BatchWriteItem or write-behind through a queue drained by history_writer.
+
+HISTORY_WRITE_MODE selects the path: 'sync' (default) writes before the API
+responds, 'queue' enqueues to HISTORY_QUEUE_URL and returns. A queue URL of
+'local' keeps messages in process, as a stand-in for SQS in tests and local runs.
+"""
+import json
+import os
+import random
+import time
+import uuid
+from aws_clients import client, resource
+from structured_log import get_logger
+
+HISTORY_TABLE = os.environ.get('HISTORY_TABLE')
+HISTORY_WRITE_MODE = os.environ.get('HISTORY_WRITE_MODE', 'sync')
+HISTORY_QUEUE_URL = os.environ.get('HISTORY_QUEUE_URL')
+
+BATCH_WRITE_CHUNK = 25  # BatchWriteItem maximum
+BATCH_WRITE_RETRIES = 5
+QUEUE_MESSAGE_ITEMS = 100  # history rows packed into one queue message
+QUEUE_SEND_BATCH = 10  # SendMessageBatch maximum
+
+dynamodb = resource('dynamodb')
+logger = get_logger('history_store')
+
+
+def write_behind_enabled():
+    return HISTORY_WRITE_MODE == 'queue'
+
+
+def save_history(items):
+    """Persist rows through the configured path. Returns the rows that were not accepted."""
+    if not items:
+        return []
+    if write_behind_enabled():
+        return get_history_queue().send(items)
+    return batch_put_history(items)
+
+
+def batch_put_history(items):
+    """
+    Write history rows in BatchWriteItem chunks, retrying unprocessed items
+    with jittered exponential backoff. Returns the items that were never written.
+    """
+    failed = []
+    for start in range(0, len(items), BATCH_WRITE_CHUNK):
+        requests = [{'PutRequest': {'Item': item}} for item in items[start:start + BATCH_WRITE_CHUNK]]
+        for attempt in range(BATCH_WRITE_RETRIES + 1):
+            result = dynamodb.batch_write_item(RequestItems={HISTORY_TABLE: requests})
+            requests = result.get('UnprocessedItems', {}).get(HISTORY_TABLE, [])
+            if not requests or attempt == BATCH_WRITE_RETRIES:
+                break
+            time.sleep(random.uniform(0, min(1.0, 0.05 * 2 ** attempt)))
+        failed.extend(request['PutRequest']['Item'] for request in requests)
+
+    if failed:
+        logger.error('Could not write %d history items after %d retries', len(failed), BATCH_WRITE_RETRIES)
+    return failed
+
+
+def encode_items(items):
+    """Serialize rows for a queue message, keeping Decimal values exact."""
+    from boto3.dynamodb.types import TypeSerializer
+    serializer = TypeSerializer()
+    return json.dumps([serializer.serialize(item)['M'] for item in items])
+
+
+def decode_items(body):
+    from boto3.dynamodb.types import TypeDeserializer
+    deserializer = TypeDeserializer()
+    return [deserializer.deserialize({'M': item}) for item in json.loads(body)]
+
+
+class SqsHistoryQueue:
+    """Write-behind queue backed by SQS."""
+
+    def __init__(self, queue_url):
+        self.queue_url = queue_url
+        self.sqs = client('sqs')
+
+    def send(self, items):
+        """Enqueue rows, packed several per message. Returns the rows SQS rejected."""
+        chunks = [items[i:i + QUEUE_MESSAGE_ITEMS] for i in range(0, len(items), QUEUE_MESSAGE_ITEMS)]
+        failed = []
+        for start in range(0, len(chunks), QUEUE_SEND_BATCH):
+            batch = chunks[start:start + QUEUE_SEND_BATCH]
+            result = self.sqs.send_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[{'Id': str(index), 'MessageBody': encode_items(chunk)} for index, chunk in enumerate(batch)]
+            )
+            for entry in result.get('Failed', []):
+                failed.extend(batch[int(entry['Id'])])
+        return failed
+
+
+class LocalHistoryQueue:
+    """In-process stand-in for SQS; drain() yields an SQS-shaped event for history_writer."""
+
+    def __init__(self):
+        self.messages = []
+
+    def send(self, items):
+        for start in range(0, len(items), QUEUE_MESSAGE_ITEMS):
+            self.messages.append(encode_items(items[start:start + QUEUE_MESSAGE_ITEMS]))
+        return []
+
+    def drain(self):
+        messages, self.messages = self.messages, []
+        return {'Records': [{'messageId': str(uuid.uuid4()), 'body': body} for body in messages]}
+
+
+_queue = None
+
+
+def get_history_queue():
+    global _queue
+    if _queue is None:
+        _queue = LocalHistoryQueue() if HISTORY_QUEUE_URL == 'local' else SqsHistoryQueue(HISTORY_QUEUE_URL)
+    return _queue
@@ -0,0 +1,48 @@
+"""
+History Writer Lambda
+Drains the write-behind history queue: writes each message's rows to
+CalculatorHistory with BatchWriteItem and updates the users' recent lists.
+Messages whose rows could not be written are reported back for redelivery.
+"""
+from history_store import batch_put_history, decode_items
+from recent_history import RECENT_HISTORY_SIZE, history_entry, push_recent_history
+from structured_log import get_logger
+
+logger = get_logger('history_writer')
+
+def handler(event, context):
+    failures = []
+    messages = []
+    for record in event.get('Records', []):
+        try:
+            messages.append((record['messageId'], decode_items(record['body'])))
+        except Exception as e:
+            logger.error('Could not decode message %s: %s', record.get('messageId'), e)
+            failures.append(record['messageId'])
+
+    # Redelivered messages can repeat rows; BatchWriteItem rejects duplicate keys
+    rows = {}
+    for _, items in messages:
+        for item in items:
+            rows[(item['userId'], item['timestamp'])] = item
+
+    unsaved = {(item['userId'], item['timestamp']) for item in batch_put_history(list(rows.values()))}
+    for message_id, items in messages:
+        if any((item['userId'], item['timestamp']) in unsaved for item in items):
+            failures.append(message_id)
+
+    # Newest saved rows first, per user
+    recent_by_user = {}
+    for key, item in sorted(rows.items(), key=lambda row: row[0][1], reverse=True):
+        if key not in unsaved:
+            recent_by_user.setdefault(item['userId'], []).append(history_entry(item))
+
+    for user_id, entries in recent_by_user.items():
+        try:
+            push_recent_history(user_id, entries[:RECENT_HISTORY_SIZE])
+        except Exception as e:
+            # The durable rows are saved; the recent list catches up on the next write
+            logger.warning('Could not update recent history for %s: %s', user_id, e)
+
+    logger.info('Wrote history rows', rows=len(rows) - len(unsaved), failed_messages=len(failures))
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failures]}
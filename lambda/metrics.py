@@ -0,0 +1,162 @@
+"""
+Metrics
+Per-invocation phase timings emitted as CloudWatch Embedded Metric Format
+(EMF) log lines. CloudWatch turns each line into metrics without any API calls.
+
+Handlers are wrapped with @instrument(function_name). Inside, `with phase('name'):`
+records how long a step took, and set_dimension('Operation', ...) refines the
+dimensions. Every invocation is tagged with Function, Route (HTTP method and path,
+or the trigger source) and Start (cold/warm).
+
+Set METRICS_ENABLED=true to turn it on (the stack does). When it is off,
+instrument() returns the handler unchanged and phase() returns a shared no-op
+context manager. Tests can capture records in memory with set_sink(MemorySink()).
+
+The current invocation is held in a ContextVar, so concurrent invocations in
+one process (threads in tests and local runs) each record their own phases.
+Worker threads started by a handler don't see it; their phase() is a no-op.
+"""
+import itertools
+import json
+import os
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() == 'true'
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'CalculatorApp')
+
+DIMENSION_SETS = [['Function', 'Route', 'Operation', 'Start'], ['Function', 'Route']]
+
+
+class _NoopPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopPhase()
+
+
+class _Phase:
+    __slots__ = ('invocation', 'name', 'started')
+
+    def __init__(self, invocation, name):
+        self.invocation = invocation
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = (time.perf_counter() - self.started) * 1000
+        phases = self.invocation.phases
+        phases[self.name] = phases.get(self.name, 0.0) + elapsed
+        return False
+
+
+class Invocation:
+    """Dimensions and phase durations (ms) for one handler invocation."""
+
+    def __init__(self, function, route, start):
+        self.dimensions = {'Function': function, 'Route': route, 'Operation': 'none', 'Start': start}
+        self.phases = {}
+
+    def record(self):
+        """The EMF log record for this invocation."""
+        record = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': DIMENSION_SETS,
+                    'Metrics': [{'Name': name, 'Unit': 'Milliseconds'} for name in self.phases]
+                }]
+            }
+        }
+        record.update(self.dimensions)
+        record.update({name: round(ms, 3) for name, ms in self.phases.items()})
+        return record
+
+
+class MemorySink:
+    """Keeps emitted records in a list instead of logging them."""
+
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, record):
+        self.records.append(record)
+
+
+def _stdout_sink(record):
+    print(json.dumps(record, separators=(',', ':')))
+
+
+_sink = _stdout_sink
+_current = ContextVar('metrics_invocation', default=None)
+# Only the first invocation in the execution environment is the cold start
+_invocations = itertools.count()
+
+
+def set_sink(sink):
+    """Send records to `sink(record)` instead of stdout. Returns the previous sink."""
+    global _sink
+    previous, _sink = _sink, sink
+    return previous
+
+
+def route_of(event):
+    """Route dimension for an API Gateway, Cognito trigger or SQS event."""
+    if not isinstance(event, dict):
+        return 'invoke'
+    if 'httpMethod' in event:
+        return f"{event['httpMethod']} {event.get('resource') or event.get('path')}"
+    if 'triggerSource' in event:
+        return event['triggerSource']
+    if 'Records' in event:
+        return 'sqs'
+    return 'invoke'
+
+
+def phase(name):
+    """Context manager timing a named phase of the current invocation."""
+    invocation = _current.get()
+    if invocation is None:
+        return _NOOP
+    return _Phase(invocation, name)
+
+
+def set_dimension(name, value):
+    invocation = _current.get()
+    if invocation is not None:
+        invocation.dimensions[name] = str(value)
+
+
+def instrument(function_name, enabled=None):
+    """Decorator recording a `total` phase plus any phase() calls, emitted as one EMF line."""
+    if not (METRICS_ENABLED if enabled is None else enabled):
+        return lambda handler: handler
+
+    def decorate(handler):
+        @wraps(handler)
+        def wrapper(event, context):
+            start = 'cold' if next(_invocations) == 0 else 'warm'
+            invocation = Invocation(function_name, route_of(event), start)
+            token = _current.set(invocation)
+            try:
+                with _Phase(invocation, 'total'):
+                    return handler(event, context)
+            finally:
+                _current.reset(token)
+                try:
+                    _sink(invocation.record())
+                except Exception as e:
+                    print(f"Could not emit metrics: {e}")
+        return wrapper
+    return decorate
@@ -0,0 +1,155 @@
+"""
+OTP Delivery
+Hands login codes from the CreateAuthChallenge trigger to the OTP sender
+Lambda through a queue, and limits how often one phone number can be sent
+a code.
+
+OTP_QUEUE_URL selects the queue: an SQS URL, 'local' for an in-process
+stand-in, or unset to publish directly to SNS from the trigger.
+OTP_SMS_MODE='local' likewise replaces SNS with an in-memory outbox, for
+tests and local runs.
+
+The rate limiter is a fixed-window counter per phone number in
+OTP_RATE_TABLE: one atomic conditional ADD per send, on an item keyed by a
+hash of the number and the window, expiring through TTL. Without
+OTP_RATE_TABLE there is no limit.
+"""
+import hashlib
+import json
+import os
+import time
+import uuid
+from aws_clients import client, resource
+
+OTP_QUEUE_URL = os.environ.get('OTP_QUEUE_URL')
+OTP_SMS_MODE = os.environ.get('OTP_SMS_MODE', 'sns')
+OTP_RATE_TABLE = os.environ.get('OTP_RATE_TABLE')
+OTP_RATE_LIMIT = int(os.environ.get('OTP_RATE_LIMIT', '3'))
+OTP_RATE_WINDOW_SECONDS = int(os.environ.get('OTP_RATE_WINDOW_SECONDS', '300'))
+OTP_VALIDITY_SECONDS = 300
+
+dynamodb = resource('dynamodb')
+
+
+class OtpRateLimited(Exception):
+    pass
+
+
+def otp_message(otp):
+    return f'Your Calculator App login OTP is: {otp}. Valid for {OTP_VALIDITY_SECONDS // 60} minutes.'
+
+
+def check_send_rate(phone_number, now=None):
+    """
+    Count one send for `phone_number` in the current window; raises
+    OtpRateLimited once OTP_RATE_LIMIT sends have been counted.
+    """
+    if not OTP_RATE_TABLE:
+        return
+    now = int(now if now is not None else time.time())
+    window = now - now % OTP_RATE_WINDOW_SECONDS
+    # Phone numbers are not stored in the clear
+    key = hashlib.sha256(f'{phone_number}#{window}'.encode('utf-8')).hexdigest()
+    try:
+        dynamodb.meta.client.update_item(
+            TableName=OTP_RATE_TABLE,
+            Key={'key': key},
+            UpdateExpression='ADD sends :one SET expiresAt = if_not_exists(expiresAt, :expires)',
+            ConditionExpression='attribute_not_exists(sends) OR sends < :limit',
+            ExpressionAttributeValues={
+                ':one': 1,
+                ':limit': OTP_RATE_LIMIT,
+                ':expires': window + 2 * OTP_RATE_WINDOW_SECONDS
+            }
+        )
+    except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+        raise OtpRateLimited('Too many codes requested for this phone number. Try again in a few minutes.')
+
+
+class SnsSender:
+    """Sends the OTP as a transactional SMS."""
+
+    def __init__(self):
+        self.sns = client('sns')
+
+    def send(self, phone_number, otp):
+        self.sns.publish(
+            PhoneNumber=phone_number,
+            Message=otp_message(otp),
+            MessageAttributes={
+                'AWS.SNS.SMS.SMSType': {
+                    'DataType': 'String',
+                    'StringValue': 'Transactional'
+                }
+            }
+        )
+
+
+class LocalSender:
+    """In-process stand-in for SNS; `sent` holds the messages."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, phone_number, otp):
+        self.sent.append({'phone_number': phone_number, 'message': otp_message(otp)})
+
+
+class SqsOtpQueue:
+    """OTP queue backed by SQS."""
+
+    def __init__(self, queue_url):
+        self.queue_url = queue_url
+        self.sqs = client('sqs')
+
+    def send(self, body):
+        self.sqs.send_message(QueueUrl=self.queue_url, MessageBody=body)
+
+
+class LocalOtpQueue:
+    """In-process stand-in for SQS; drain() yields an SQS-shaped event for otp_sender."""
+
+    def __init__(self):
+        self.messages = []
+
+    def send(self, body):
+        self.messages.append(body)
+
+    def drain(self):
+        messages, self.messages = self.messages, []
+        return {'Records': [{'messageId': str(uuid.uuid4()), 'body': body} for body in messages]}
+
+
+_sender = None
+_queue = None
+
+
+def get_sms_sender():
+    global _sender
+    if _sender is None:
+        _sender = LocalSender() if OTP_SMS_MODE == 'local' else SnsSender()
+    return _sender
+
+
+def get_otp_queue():
+    global _queue
+    if _queue is None:
+        _queue = LocalOtpQueue() if OTP_QUEUE_URL == 'local' else SqsOtpQueue(OTP_QUEUE_URL)
+    return _queue
+
+
+def dispatch_otp(phone_number, otp, now=None):
+    """
+    Queue the OTP for the sender Lambda ('queued'), or send it right away
+    when no queue is configured ('sent').
+    """
+    if not OTP_QUEUE_URL:
+        get_sms_sender().send(phone_number, otp)
+        return 'sent'
+    now = int(now if now is not None else time.time())
+    get_otp_queue().send(json.dumps({
+        'phone_number': phone_number,
+        'otp': otp,
+        'expires_at': now + OTP_VALIDITY_SECONDS
+    }))
+    return 'queued'
@@ -0,0 +1,39 @@
+"""
+OTP Sender Lambda
+Drains the OTP queue filled by the CreateAuthChallenge trigger and sends each
+code by SMS. A batch is published in parallel; messages whose publish failed
+are reported back for redelivery (and end up in the DLQ after repeated
+failures). Codes that expired while queued are dropped.
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from otp_delivery import get_sms_sender
+from structured_log import get_logger
+
+SEND_WORKERS = 10
+
+logger = get_logger('otp_sender')
+# Created once per container, so warm invocations reuse the SNS connection
+sender = get_sms_sender()
+
+def handler(event, context):
+    now = time.time()
+
+    def deliver(record):
+        try:
+            message = json.loads(record['body'])
+            if message['expires_at'] < now:
+                logger.info('Dropping expired OTP for phone ending %s', message['phone_number'][-4:])
+                return None
+            sender.send(message['phone_number'], message['otp'])
+            return None
+        except Exception as e:
+            logger.error('Failed to send OTP: %s', e, message_id=record.get('messageId'))
+            return record['messageId']
+
+    with ThreadPoolExecutor(max_workers=SEND_WORKERS) as pool:
+        failures = [message_id for message_id in pool.map(deliver, event.get('Records', [])) if message_id]
+
+    logger.info('Sent %d of %d OTP messages', len(event.get('Records', [])) - len(failures), len(event.get('Records', [])))
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failures]}
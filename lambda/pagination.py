@@ -0,0 +1,78 @@
+"""
+Pagination Helpers
+Opaque cursors wrapping DynamoDB LastEvaluatedKey values, page-size parsing
+and timestamp-range conditions for list endpoints.
+"""
+import base64
+import json
+from decimal import Decimal
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor that was not issued by us."""
+
+
+def _encode_default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f'Cannot encode {type(obj).__name__} in cursor')
+
+
+def encode_cursor(key):
+    """Turn a LastEvaluatedKey (or any JSON-able position) into an opaque cursor."""
+    if key is None:
+        return None
+    raw = json.dumps(key, separators=(',', ':'), default=_encode_default)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Returns None for an empty cursor."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def decode_key_cursor(cursor, key_attributes):
+    """
+    decode_cursor for a cursor wrapping a LastEvaluatedKey: it must hold
+    exactly `key_attributes`, each a non-empty string, so a cursor from
+    another endpoint or mode never reaches DynamoDB as ExclusiveStartKey.
+    """
+    key = decode_cursor(cursor)
+    if key is None:
+        return None
+    if (not isinstance(key, dict) or set(key) != set(key_attributes)
+            or not all(isinstance(value, str) and value for value in key.values())):
+        raise InvalidCursor('Invalid cursor')
+    return key
+
+
+def parse_limit(params, default, maximum):
+    """Read the `limit` query parameter, clamped to [1, maximum]."""
+    value = (params or {}).get('limit')
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid limit: {value}')
+    return max(1, min(limit, maximum))
+
+
+def timestamp_range(field, start=None, end=None):
+    """
+    Condition bounding `field` (a boto3 Key or Attr on the ISO-8601 timestamp)
+    to [start, end], either end optional. None when neither is given.
+    """
+    if start and end:
+        return field.between(start, end)
+    if start:
+        return field.gte(start)
+    if end:
+        return field.lte(end)
+    return None
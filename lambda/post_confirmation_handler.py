@@ -1,9 +1,12 @@
-import json
-import boto3
-import os
+from aws_clients import client
+from metrics import instrument, phase
+from structured_log import get_logger
+from user_directory import add_user, directory_entry, now_iso
 
-cognito = boto3.client('cognito-idp')
+cognito = client('cognito-idp')
+logger = get_logger('post_confirmation_handler')
 
+@instrument('post_confirmation_handler')
 def handler(event, context):
     """
     Post Confirmation Lambda Trigger - Adds user to their selected role group.
@@ -22,16 +25,25 @@ def handler(event, context):
             selected_role = 'ASrole'
         
         # Add user to the selected group
-        cognito.admin_add_user_to_group(
-            UserPoolId=user_pool_id,
-            Username=username,
-            GroupName=selected_role
-        )
+        with phase('cognito'):
+            cognito.admin_add_user_to_group(
+                UserPoolId=user_pool_id,
+                Username=username,
+                GroupName=selected_role
+            )
         
-        print(f"Added user {username} to group {selected_role}")
+        logger.info('Added user %s to group %s', username, selected_role)
+        
+        # Mirror the new user into the admin dashboard's directory, with the
+        # role actually assigned rather than an invalid custom:role
+        with phase('directory_write'):
+            add_user(directory_entry(
+                username, {**user_attributes, 'custom:role': selected_role}, [selected_role],
+                enabled=True, status='CONFIRMED', created=now_iso()
+            ))
         
     except Exception as e:
-        print(f"Error adding user to group: {e}")
+        logger.error('Error adding user to group: %s', e, user=event.get('userName'))
         # Don't fail the confirmation, just log the error
     
     return event
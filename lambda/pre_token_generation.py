@@ -0,0 +1,41 @@
+"""
+PreTokenGeneration Lambda Trigger
+Resolves the user's effective role permissions when tokens are issued and adds
+them to the ID token, so the calculator can authorize without reading RolesTable.
+
+The claim is only added when RolesTable could be read: without it the token
+carries no permissions and calculate_handler reads RolesTable itself. Role
+changes reach the claim when the token is refreshed, not before.
+"""
+import json
+from metrics import instrument, phase
+from role_permissions import PERMISSIONS_CLAIM, RolesUnavailable, permissions_for_groups
+from structured_log import get_logger
+
+logger = get_logger('pre_token_generation')
+
+@instrument('pre_token_generation')
+def handler(event, context):
+    group_configuration = event['request'].get('groupConfiguration') or {}
+    groups = group_configuration.get('groupsToOverride') or []
+
+    try:
+        with phase('roles'):
+            permissions = permissions_for_groups(groups)
+    except RolesUnavailable as e:
+        # No claim: calculate_handler falls back to RolesTable
+        logger.warning('Omitting permissions claim for %s: %s', event.get('userName'), e)
+        return event
+    except Exception as e:
+        # Never block sign-in; calculate_handler falls back to RolesTable
+        logger.error('Could not resolve permissions for %s: %s', event.get('userName'), e)
+        return event
+
+    event['response']['claimsOverrideDetails'] = {
+        'claimsToAddOrOverride': {
+            PERMISSIONS_CLAIM: json.dumps(permissions, separators=(',', ':'))
+        }
+    }
+
+    logger.debug('PreTokenGeneration added permissions for groups', groups=sorted(permissions))
+    return event
@@ -0,0 +1,177 @@
+"""
+Recent History
+Keeps a per-user "recent calculations" item in RecentHistoryTable so that
+/calculate can return the latest entries straight from its own write instead
+of querying CalculatorHistory.
+
+Entries are stored newest first, already shaped for API responses. The list is
+allowed to grow to twice RECENT_HISTORY_SIZE before a conditional trim, so the
+extra trim write happens at most once every RECENT_HISTORY_SIZE calculations.
+"""
+import os
+from aws_clients import resource
+
+RECENT_TABLE = os.environ.get('RECENT_TABLE')
+HISTORY_TABLE = os.environ.get('HISTORY_TABLE')
+RECENT_HISTORY_SIZE = 10
+# Read-merge-write retries when entries overlap the stored list
+MERGE_ATTEMPTS = 3
+
+dynamodb = resource('dynamodb')
+
+
+def history_entry(record):
+    """Shape a history row for API responses."""
+    entry = {
+        'operation': record['operation'],
+        'result': str(record['result']),
+        'timestamp': record['timestamp']
+    }
+    if 'expression' in record:
+        entry['expression'] = record['expression']
+    else:
+        entry['operand1'] = str(record['operand1'])
+        entry['operand2'] = str(record['operand2'])
+    return entry
+
+
+def push_recent_history(user_id, entries):
+    """
+    Prepend entries (newest first) to the user's recent list in one UpdateItem
+    and return the newest RECENT_HISTORY_SIZE entries after the update.
+
+    The write is conditional on every entry being newer than the stored list,
+    so a redelivered history message cannot append the same rows twice;
+    anything else goes through merge_recent_history.
+    """
+    recent_table = dynamodb.Table(RECENT_TABLE)
+    try:
+        result = recent_table.update_item(
+            Key={'userId': user_id},
+            UpdateExpression='SET #entries = list_append(:new, if_not_exists(#entries, :empty))',
+            ConditionExpression=(
+                'attribute_not_exists(#entries) OR size(#entries) = :zero OR #entries[0].#timestamp < :oldest'
+            ),
+            ExpressionAttributeNames={'#entries': 'entries', '#timestamp': 'timestamp'},
+            ExpressionAttributeValues={
+                ':new': entries, ':empty': [], ':zero': 0, ':oldest': entries[-1]['timestamp']
+            },
+            ReturnValues='UPDATED_OLD'
+        )
+    except recent_table.meta.client.exceptions.ConditionalCheckFailedException:
+        return merge_recent_history(user_id, entries)
+
+    previous = result.get('Attributes', {}).get('entries')
+    recent = entries + (previous or [])
+    if previous is None:
+        # First write for this user: backfill from rows written before the item existed
+        recent = seed_recent_history(user_id, recent)
+    elif len(recent) >= 2 * RECENT_HISTORY_SIZE:
+        trim_recent_history(user_id, len(recent))
+
+    return recent[:RECENT_HISTORY_SIZE]
+
+
+def merge_recent_history(user_id, entries):
+    """
+    Slow path of push_recent_history, for entries that are not all newer than
+    the stored list (a redelivery, or writers racing): drop the timestamps
+    already stored and write the merged list back if nobody changed it since.
+    """
+    recent_table = dynamodb.Table(RECENT_TABLE)
+    for _ in range(MERGE_ATTEMPTS):
+        item = recent_table.get_item(Key={'userId': user_id}, ConsistentRead=True).get('Item') or {}
+        stored = item.get('entries', [])
+        seen = {entry['timestamp'] for entry in stored}
+        new = [entry for entry in entries if entry['timestamp'] not in seen]
+        if not new:
+            return stored[:RECENT_HISTORY_SIZE]
+
+        merged = sorted(new + stored, key=lambda entry: entry['timestamp'], reverse=True)[:RECENT_HISTORY_SIZE]
+        try:
+            recent_table.update_item(
+                Key={'userId': user_id},
+                UpdateExpression='SET #entries = :merged',
+                ConditionExpression='attribute_not_exists(#entries) OR size(#entries) = :length',
+                ExpressionAttributeNames={'#entries': 'entries'},
+                ExpressionAttributeValues={':merged': merged, ':length': len(stored)}
+            )
+            return merged
+        except recent_table.meta.client.exceptions.ConditionalCheckFailedException:
+            continue
+    # Still contended: the list catches up on the next write
+    return merged
+
+
+def peek_recent_history(user_id, entries):
+    """
+    Read the user's recent list and put entries (newest first) in front of it.
+    Used in write-behind mode, where the list is updated by history_writer.
+    """
+    item = dynamodb.Table(RECENT_TABLE).get_item(Key={'userId': user_id}).get('Item') or {}
+    seen = {entry['timestamp'] for entry in entries}
+    older = [entry for entry in item.get('entries', []) if entry['timestamp'] not in seen]
+    return (entries + older)[:RECENT_HISTORY_SIZE]
+
+
+def seed_recent_history(user_id, recent):
+    """Append the user's older CalculatorHistory rows to a freshly created recent list."""
+    from boto3.dynamodb.conditions import Key
+    
+    seen = {entry['timestamp'] for entry in recent}
+    result = dynamodb.Table(HISTORY_TABLE).query(
+        KeyConditionExpression=Key('userId').eq(user_id),
+        ScanIndexForward=False,
+        Limit=RECENT_HISTORY_SIZE + len(recent)
+    )
+    older = [history_entry(record) for record in result.get('Items', []) if record['timestamp'] not in seen]
+    older = older[:max(0, RECENT_HISTORY_SIZE - len(recent))]
+    if not older:
+        return recent
+
+    dynamodb.Table(RECENT_TABLE).update_item(
+        Key={'userId': user_id},
+        UpdateExpression='SET #entries = list_append(#entries, :older)',
+        ExpressionAttributeNames={'#entries': 'entries'},
+        ExpressionAttributeValues={':older': older}
+    )
+    return recent + older
+
+
+def trim_recent_history(user_id, length):
+    """Drop entries beyond RECENT_HISTORY_SIZE unless another writer got there first."""
+    recent_table = dynamodb.Table(RECENT_TABLE)
+    removed = ', '.join(f'#entries[{index}]' for index in range(RECENT_HISTORY_SIZE, length))
+    try:
+        recent_table.update_item(
+            Key={'userId': user_id},
+            UpdateExpression=f'REMOVE {removed}',
+            ConditionExpression='size(#entries) = :length',
+            ExpressionAttributeNames={'#entries': 'entries'},
+            ExpressionAttributeValues={':length': length}
+        )
+    except recent_table.meta.client.exceptions.ConditionalCheckFailedException:
+        pass
+
+
+def remove_recent_entry(user_id, timestamp):
+    """Remove a deleted history row from the user's recent list, if present."""
+    recent_table = dynamodb.Table(RECENT_TABLE)
+    item = recent_table.get_item(Key={'userId': user_id}).get('Item')
+    if not item:
+        return
+
+    for index, entry in enumerate(item.get('entries', [])):
+        if entry.get('timestamp') == timestamp:
+            try:
+                recent_table.update_item(
+                    Key={'userId': user_id},
+                    UpdateExpression=f'REMOVE #entries[{index}]',
+                    ConditionExpression=f'#entries[{index}].#timestamp = :timestamp',
+                    ExpressionAttributeNames={'#entries': 'entries', '#timestamp': 'timestamp'},
+                    ExpressionAttributeValues={':timestamp': timestamp}
+                )
+            except recent_table.meta.client.exceptions.ConditionalCheckFailedException:
+                # The list shifted under us; the entry ages out on its own
+                pass
+            return
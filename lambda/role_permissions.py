@@ -0,0 +1,205 @@
+"""
+Role Permissions
+Loads the role -> operations map (defaults merged with RolesTable custom roles)
+and keeps it cached across warm invocations.
+
+The cache is refreshed at most once per ROLES_CACHE_TTL_SECONDS. A refresh first
+reads a single version item from RolesTable; the full scan only runs when the
+version has changed since the last load (admin_handler bumps it on every role
+create/delete).
+
+Each load is compiled once into a RoleIndex (per-role operation sets plus an
+operation -> roles map), so authorization is a set lookup instead of a walk
+over every role's permission list.
+
+The pre-token-generation trigger copies a user's permissions into the ID token
+(PERMISSIONS_CLAIM). A claim is fixed until the token is refreshed, so a role
+changed or deleted with create_role/delete_role keeps its old operations for
+tokens already issued, for up to the ID token validity (1 hour by default);
+the version bump only reaches tokens issued without the claim.
+"""
+import json
+import os
+import time
+from functools import lru_cache
+from aws_clients import resource
+from structured_log import get_logger
+
+ROLES_TABLE = os.environ.get('ROLES_TABLE')
+ROLES_CACHE_TTL_SECONDS = float(os.environ.get('ROLES_CACHE_TTL_SECONDS', '60'))
+
+# Reserved RolesTable item holding the roles version stamp
+ROLES_VERSION_KEY = '__version__'
+
+# ID token claim written by the pre-token-generation trigger: JSON object
+# mapping each of the user's groups to the operations it grants
+PERMISSIONS_CLAIM = 'role_permissions'
+
+# Default role permissions (fallback)
+DEFAULT_ROLE_PERMISSIONS = {
+    'DMrole': ['divide', 'multiply'],
+    'ASrole': ['add', 'subtract'],
+    'AdminRole': ['add', 'subtract', 'divide', 'multiply']
+}
+
+logger = get_logger('role_permissions')
+dynamodb = resource('dynamodb')
+
+_cache = {
+    'permissions': None,
+    'index': None,
+    'version': None,
+    'loaded': False,
+    'expires_at': 0.0
+}
+
+
+class RolesUnavailable(Exception):
+    pass
+
+
+def get_role_permissions():
+    """Return the merged role permissions, reloading only when stale and changed."""
+    now = time.monotonic()
+    if _cache['permissions'] is not None and now < _cache['expires_at']:
+        return _cache['permissions']
+
+    roles_table = dynamodb.Table(ROLES_TABLE)
+    try:
+        version = read_roles_version(roles_table)
+        if _cache['permissions'] is None or version != _cache['version']:
+            _cache['permissions'] = load_role_permissions(roles_table)
+            _cache['index'] = None
+            _cache['version'] = version
+        _cache['loaded'] = True
+    except Exception as e:
+        logger.warning('Could not load custom roles: %s', e)
+        if _cache['permissions'] is None:
+            _cache['permissions'] = DEFAULT_ROLE_PERMISSIONS.copy()
+            _cache['index'] = None
+
+    _cache['expires_at'] = now + ROLES_CACHE_TTL_SECONDS
+    return _cache['permissions']
+
+
+def get_role_index():
+    """Return the RoleIndex for the current role permissions, compiled once per load."""
+    permissions = get_role_permissions()
+    if _cache['index'] is None:
+        _cache['index'] = RoleIndex(permissions)
+    return _cache['index']
+
+
+@lru_cache(maxsize=256)
+def index_from_claim(claim):
+    """
+    Compile the permissions claim (JSON written by the pre-token-generation
+    trigger) into a RoleIndex. Returns None when the claim is missing or invalid.
+    """
+    if not claim:
+        return None
+    try:
+        permissions = json.loads(claim)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(permissions, dict):
+        return None
+    return RoleIndex(permissions)
+
+
+class RoleIndex:
+    """
+    Role permissions compiled for lookups: `role_operations` maps each role to a
+    frozenset of operations, `operation_roles` maps each operation to a frozenset
+    of the roles that grant it.
+    """
+
+    def __init__(self, permissions):
+        self.role_operations = {role: frozenset(ops) for role, ops in permissions.items()}
+        operation_roles = {}
+        for role, ops in self.role_operations.items():
+            for operation in ops:
+                operation_roles.setdefault(operation, []).append(role)
+        self.operation_roles = {op: frozenset(roles) for op, roles in operation_roles.items()}
+        self._ordered_roles = {op: tuple(roles) for op, roles in operation_roles.items()}
+
+    def granting_role(self, groups, operation):
+        """Return the first of the user's roles that allows the operation, or None."""
+        granting = self.operation_roles.get(operation)
+        if granting:
+            for role in groups:
+                if role in granting:
+                    return role
+        return None
+
+    def covering_role(self, groups, operations):
+        """Return the first of the user's roles that allows every operation, or None."""
+        for role in groups:
+            if operations <= self.role_operations.get(role, frozenset()):
+                return role
+        return None
+
+    def roles_for(self, operation):
+        """All roles that grant the operation, in load order (defaults first)."""
+        return list(self._ordered_roles.get(operation, ()))
+
+
+def permissions_for_groups(groups):
+    """
+    Return the subset of the permission map that applies to the given groups.
+    Raises RolesUnavailable while only the defaults are known, since a token
+    built from them would deny the user's custom roles until it expires.
+    """
+    role_permissions = get_role_permissions()
+    if not _cache['loaded']:
+        raise RolesUnavailable('Custom roles could not be loaded from RolesTable')
+    return {group: role_permissions[group] for group in groups if group in role_permissions}
+
+
+def load_role_permissions(roles_table):
+    """Scan RolesTable for custom roles and merge them with the defaults."""
+    permissions = DEFAULT_ROLE_PERMISSIONS.copy()
+
+    scan_kwargs = {}
+    while True:
+        result = roles_table.scan(**scan_kwargs)
+        for item in result.get('Items', []):
+            role_name = item.get('roleName')
+            role_perms = item.get('permissions', [])
+            if role_name and role_name != ROLES_VERSION_KEY and role_perms:
+                permissions[role_name] = list(role_perms)
+        if 'LastEvaluatedKey' not in result:
+            break
+        scan_kwargs['ExclusiveStartKey'] = result['LastEvaluatedKey']
+
+    return permissions
+
+
+def read_roles_version(roles_table):
+    """Read the current roles version stamp (0 if roles were never modified)."""
+    result = roles_table.get_item(
+        Key={'roleName': ROLES_VERSION_KEY},
+        ProjectionExpression='#version',
+        ExpressionAttributeNames={'#version': 'version'}
+    )
+    return int(result.get('Item', {}).get('version', 0))
+
+
+def bump_roles_version(roles_table):
+    """Increment the roles version so warm caches reload on their next refresh."""
+    roles_table.update_item(
+        Key={'roleName': ROLES_VERSION_KEY},
+        UpdateExpression='ADD #version :one',
+        ExpressionAttributeNames={'#version': 'version'},
+        ExpressionAttributeValues={':one': 1}
+    )
+    invalidate_cache()
+
+
+def invalidate_cache():
+    """Drop the locally cached permissions."""
+    _cache['permissions'] = None
+    _cache['index'] = None
+    _cache['version'] = None
+    _cache['loaded'] = False
+    _cache['expires_at'] = 0.0
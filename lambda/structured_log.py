@@ -0,0 +1,80 @@
+"""
+Structured Log
+Level-gated JSON log lines for the handlers, replacing bare print(json.dumps(event)).
+
+LOG_LEVEL (DEBUG, INFO, WARNING, ERROR; default INFO) is set per function by
+the stack. Messages use lazy %-formatting: nothing is formatted or serialized
+unless the level is enabled. Full event dumps are DEBUG records. Outside
+DEBUG, only a LOG_EVENT_SAMPLE_RATE fraction of invocations dump the event.
+Sensitive fields (OTP answers, tokens, passwords, contact details) are
+redacted from everything that is logged.
+"""
+import json
+import os
+import random
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+LOG_LEVEL = LEVELS.get(os.environ.get('LOG_LEVEL', 'INFO').upper(), LEVELS['INFO'])
+LOG_EVENT_SAMPLE_RATE = float(os.environ.get('LOG_EVENT_SAMPLE_RATE', '0'))
+
+# Keys whose values never reach the logs (compared case-insensitively). Error
+# 'code' fields stay visible; the OTP itself travels as 'otp' or 'answer'.
+REDACTED_KEYS = {
+    'otp', 'answer', 'challengeanswer', 'privatechallengeparameters', 'password', 'authorization',
+    'idtoken', 'accesstoken', 'refreshtoken', 'phone_number', 'phone', 'email'
+}
+REDACTED = '[REDACTED]'
+
+
+def redact(value):
+    """Copy of `value` with sensitive keys masked, at any depth."""
+    if isinstance(value, dict):
+        return {key: REDACTED if str(key).lower() in REDACTED_KEYS else redact(item)
+                for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+class Logger:
+    """JSON-lines logger for one function."""
+
+    def __init__(self, name, level=None):
+        self.name = name
+        self.level = LOG_LEVEL if level is None else level
+
+    def is_enabled(self, level):
+        return LEVELS[level] >= self.level
+
+    def debug(self, message, *args, **fields):
+        if LEVELS['DEBUG'] >= self.level:
+            self._emit('DEBUG', message, args, fields)
+
+    def info(self, message, *args, **fields):
+        if LEVELS['INFO'] >= self.level:
+            self._emit('INFO', message, args, fields)
+
+    def warning(self, message, *args, **fields):
+        if LEVELS['WARNING'] >= self.level:
+            self._emit('WARNING', message, args, fields)
+
+    def error(self, message, *args, **fields):
+        if LEVELS['ERROR'] >= self.level:
+            self._emit('ERROR', message, args, fields)
+
+    def event(self, event, message='Event'):
+        """Dump the (redacted) event: always at DEBUG, otherwise for a sample of calls."""
+        if LEVELS['DEBUG'] >= self.level or (LOG_EVENT_SAMPLE_RATE and random.random() < LOG_EVENT_SAMPLE_RATE):
+            self._emit('DEBUG', message, (), {'event': event})
+
+    def _emit(self, level, message, args, fields):
+        # Args are redacted before formatting: a dict passed for %s is masked too
+        formatted = message % tuple(redact(arg) for arg in args) if args else message
+        record = {'level': level, 'logger': self.name, 'message': formatted}
+        if fields:
+            record.update(redact(fields))
+        print(json.dumps(record, default=str, separators=(',', ':')))
+
+
+def get_logger(name):
+    return Logger(name)
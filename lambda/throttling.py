@@ -0,0 +1,54 @@
+"""
+Throttling Helpers
+Client-side rate limiting for AWS APIs with low request quotas (Cognito admin
+APIs) and recognition of throttling errors. Retries are left to botocore's
+adaptive retry mode (see aws_clients).
+"""
+import threading
+import time
+
+# Error codes AWS services use to signal request-rate throttling
+THROTTLING_ERROR_CODES = {
+    'TooManyRequestsException',
+    'ThrottlingException',
+    'Throttling',
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded'
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: at most `rate` acquisitions per second, bursting to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def error_code(error):
+    """The AWS error code of a botocore ClientError, or None for other exceptions."""
+    response = getattr(error, 'response', None)
+    if not isinstance(response, dict):
+        # e.g. requests/urllib3 errors, whose `response` is an HTTP response object
+        return None
+    return (response.get('Error') or {}).get('Code')
+
+
+def is_throttling_error(error):
+    return error_code(error) in THROTTLING_ERROR_CODES
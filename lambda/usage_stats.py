@@ -0,0 +1,207 @@
+"""
+Usage Stats
+Pre-aggregated calculation counters, maintained from the CalculatorHistory
+stream and read by GET /admin/stats.
+
+UsageStatsTable items are keyed by time bucket and scope:
+    bucket  'day#2026-10-17' or 'hour#2026-10-17T09'
+    scope   'user#<sub>', 'role#<role>', 'operation#<operation>' or 'all#'
+and hold `calculations` plus one `op_<operation>` counter per operation.
+
+The stream consumer (handler) folds a whole batch of new history rows into
+one count per (bucket, scope) and applies each with a single atomic ADD
+update, so a batch costs one write per distinct item rather than per row.
+Reading a dimension over a time range is one Query per bucket, whatever
+the size of the history table. Hourly items expire after
+HOURLY_RETENTION_DAYS (TTL); daily items are kept.
+
+Counting is at-least-once: a batch that fails part-way is retried whole and
+may count some rows twice. Rows written before the stream existed are not
+counted.
+"""
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from aws_clients import resource
+from structured_log import get_logger
+
+USAGE_STATS_TABLE = os.environ.get('USAGE_STATS_TABLE')
+
+GRANULARITIES = {'day': 10, 'hour': 13}  # bucket = timestamp prefix of this length
+DIMENSIONS = ('user', 'role', 'operation', 'all')
+HOURLY_RETENTION_DAYS = 90
+STATS_MAX_BUCKETS = 744  # a month of hours
+STATS_DEFAULT_BUCKETS = {'day': 7, 'hour': 24}
+UPDATE_WORKERS = 16
+QUERY_WORKERS = 16
+
+# Thread pools use the resource's low-level client (thread-safe, unlike Table
+# resources); it still takes and returns plain Python values
+dynamodb = resource('dynamodb')
+logger = get_logger('usage_stats')
+
+
+def bucket_key(granularity, timestamp):
+    return f'{granularity}#{timestamp[:GRANULARITIES[granularity]]}'
+
+
+def row_scopes(item):
+    """The scopes a history row counts towards."""
+    scopes = ['all#']
+    for dimension, field in (('user', 'userId'), ('role', 'role_used'), ('operation', 'operation')):
+        if item.get(field):
+            scopes.append(f'{dimension}#{item[field]}')
+    return scopes
+
+
+def aggregate(items):
+    """(bucket, scope) -> {counter: increment} for a batch of history rows."""
+    counts = defaultdict(lambda: defaultdict(int))
+    for item in items:
+        timestamp, operation = item.get('timestamp'), item.get('operation')
+        if not timestamp or not operation:
+            continue
+        for granularity in GRANULARITIES:
+            bucket = bucket_key(granularity, timestamp)
+            for scope in row_scopes(item):
+                counters = counts[(bucket, scope)]
+                counters['calculations'] += 1
+                counters[f'op_{operation}'] += 1
+    return counts
+
+
+def apply_counts(counts):
+    """One atomic ADD update per (bucket, scope)."""
+    expires_at = int(time.time()) + HOURLY_RETENTION_DAYS * 86400
+
+    def update(entry):
+        (bucket, scope), counters = entry
+        names = {f'#c{n}': name for n, name in enumerate(counters)}
+        values = {f':c{n}': amount for n, amount in enumerate(counters.values())}
+        expression = 'ADD ' + ', '.join(f'#c{n} :c{n}' for n in range(len(counters)))
+        if bucket.startswith('hour#'):
+            names['#expires'] = 'expiresAt'
+            values[':expires'] = expires_at
+            expression += ' SET #expires = if_not_exists(#expires, :expires)'
+        dynamodb.meta.client.update_item(
+            TableName=USAGE_STATS_TABLE,
+            Key={'bucket': bucket, 'scope': scope},
+            UpdateExpression=expression,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+
+    with ThreadPoolExecutor(max_workers=UPDATE_WORKERS) as pool:
+        # list() re-raises the first failed update, so the stream retries the batch
+        list(pool.map(update, counts.items()))
+
+
+def handler(event, context):
+    """DynamoDB stream consumer for CalculatorHistory (INSERT records only)."""
+    from boto3.dynamodb.types import TypeDeserializer
+
+    deserializer = TypeDeserializer()
+    items = []
+    for record in event.get('Records', []):
+        if record.get('eventName') != 'INSERT':
+            continue
+        image = record['dynamodb'].get('NewImage', {})
+        items.append({key: deserializer.deserialize(value) for key, value in image.items()})
+
+    counts = aggregate(items)
+    apply_counts(counts)
+    logger.info('Counted history rows into usage items', rows=len(items), items=len(counts))
+    return {'rows': len(items), 'items': len(counts)}
+
+
+def bucket_range(granularity, start=None, end=None):
+    """
+    Bucket keys from `start` to `end` inclusive (ISO dates or hours). `end`
+    defaults to now and `start` to STATS_DEFAULT_BUCKETS buckets before it.
+    """
+    step = timedelta(days=1) if granularity == 'day' else timedelta(hours=1)
+    fmt = '%Y-%m-%d' if granularity == 'day' else '%Y-%m-%dT%H'
+    width = GRANULARITIES[granularity]
+    try:
+        last = datetime.strptime(end[:width], fmt) if end else datetime.strptime(
+            datetime.utcnow().strftime(fmt), fmt)
+        current = datetime.strptime(start[:width], fmt) if start else (
+            last - step * (STATS_DEFAULT_BUCKETS[granularity] - 1))
+    except ValueError:
+        raise ValueError(f"from/to must be ISO timestamps ({'YYYY-MM-DD' if granularity == 'day' else 'YYYY-MM-DDTHH'})")
+    if last < current:
+        raise ValueError('from must not be after to')
+    if (last - current) / step >= STATS_MAX_BUCKETS:
+        raise ValueError(f'At most {STATS_MAX_BUCKETS} {granularity} buckets per request')
+    buckets = []
+    while current <= last:
+        buckets.append(f'{granularity}#{current.strftime(fmt)}')
+        current += step
+    return buckets
+
+
+def counters_of(item):
+    return {
+        'calculations': int(item.get('calculations', 0)),
+        'operations': {name[3:]: int(value) for name, value in item.items() if name.startswith('op_')}
+    }
+
+
+def read_stats(granularity='day', start=None, end=None, dimension='all', key=None):
+    """
+    Counters for one dimension over a time range: per bucket, and totals.
+    With `key` only that user / role / operation is read.
+    """
+    from boto3.dynamodb.conditions import Key
+
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"dimension must be one of: {', '.join(DIMENSIONS)}")
+    buckets = bucket_range(granularity, start, end)
+    prefix = f'{dimension}#'
+
+    def read_bucket(bucket):
+        if dimension == 'all' or key is not None:
+            scope = prefix if dimension == 'all' else f'{prefix}{key}'
+            item = dynamodb.meta.client.get_item(
+                TableName=USAGE_STATS_TABLE, Key={'bucket': bucket, 'scope': scope}
+            ).get('Item')
+            return bucket, [item] if item else []
+        items = []
+        query_kwargs = {
+            'TableName': USAGE_STATS_TABLE,
+            'KeyConditionExpression': Key('bucket').eq(bucket) & Key('scope').begins_with(prefix)
+        }
+        while True:
+            result = dynamodb.meta.client.query(**query_kwargs)
+            items.extend(result.get('Items', []))
+            if 'LastEvaluatedKey' not in result:
+                return bucket, items
+            query_kwargs['ExclusiveStartKey'] = result['LastEvaluatedKey']
+
+    with ThreadPoolExecutor(max_workers=QUERY_WORKERS) as pool:
+        results = list(pool.map(read_bucket, buckets))
+
+    series = []
+    totals = {}
+    for bucket, items in results:
+        entries = {}
+        for item in items:
+            name = item['scope'][len(prefix):] or 'all'
+            counters = counters_of(item)
+            entries[name] = counters
+            total = totals.setdefault(name, {'calculations': 0, 'operations': {}})
+            total['calculations'] += counters['calculations']
+            for operation, count in counters['operations'].items():
+                total['operations'][operation] = total['operations'].get(operation, 0) + count
+        series.append({'bucket': bucket.split('#', 1)[1], 'counts': entries})
+
+    return {
+        'granularity': granularity,
+        'dimension': dimension,
+        'buckets': series,
+        'totals': totals
+    }
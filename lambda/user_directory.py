@@ -0,0 +1,130 @@
+"""
+User Directory
+Materialized copy of the Cognito user pool in UsersDirectoryTable, one item
+per username, shaped the way /admin/users returns it. The admin dashboard
+reads this table instead of Cognito's low-rate admin APIs.
+
+post_confirmation_handler adds users as they sign up, admin_handler mirrors
+its role/block/delete mutations, and user_directory_reconcile periodically
+rebuilds the table from Cognito, which stays the source of truth.
+"""
+import os
+from datetime import datetime, timezone
+from aws_clients import client, table
+from structured_log import get_logger
+
+USERS_TABLE = os.environ.get('USERS_TABLE')
+
+cognito = client('cognito-idp')
+logger = get_logger('user_directory')
+
+
+def directory_table():
+    return table(USERS_TABLE)
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def directory_entry(username, attributes, groups, enabled, status, created):
+    """Build a directory item from Cognito user fields (attributes as a name -> value dict)."""
+    return {
+        'username': username,
+        'email': attributes.get('email', ''),
+        'phone': attributes.get('phone_number', ''),
+        'role': attributes.get('custom:role', ''),
+        'groups': list(groups),
+        'enabled': enabled,
+        'status': status,
+        'created': created
+    }
+
+
+def entry_from_cognito_user(user, groups):
+    """Directory item for a user as returned by Cognito ListUsers."""
+    attributes = {attr['Name']: attr['Value'] for attr in user.get('Attributes', [])}
+    return directory_entry(
+        user['Username'], attributes, groups,
+        user['Enabled'], user['UserStatus'], user['UserCreateDate'].isoformat()
+    )
+
+
+def add_user(entry):
+    """Insert a new user; an existing item (e.g. from a reconcile) is left alone."""
+    users_table = directory_table()
+    try:
+        users_table.put_item(
+            Item=entry,
+            ConditionExpression='attribute_not_exists(username)'
+        )
+    except users_table.meta.client.exceptions.ConditionalCheckFailedException:
+        pass
+
+
+def put_users(entries):
+    """Write many directory items with BatchWriteItem."""
+    with directory_table().batch_writer() as batch:
+        for entry in entries:
+            batch.put_item(Item=entry)
+
+
+def update_user(username, **fields):
+    """
+    Set fields on the user's directory item, creating it if sign-up's insert
+    is missing (the reconcile fills in the rest). Failures are logged rather
+    than raised: Cognito already changed, and the next reconcile repairs the copy.
+    """
+    names = {f'#{name}': name for name in fields}
+    values = {f':{name}': value for name, value in fields.items()}
+    try:
+        directory_table().update_item(
+            Key={'username': username},
+            UpdateExpression='SET ' + ', '.join(f'#{name} = :{name}' for name in fields),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+        return True
+    except Exception as e:
+        logger.warning('Could not update directory entry for %s: %s', username, e)
+        return False
+
+
+def remove_user(username):
+    try:
+        directory_table().delete_item(Key={'username': username})
+    except Exception as e:
+        logger.warning('Could not remove directory entry for %s: %s', username, e)
+
+
+def scan_users(limit, start_key=None):
+    """One page of directory items. Returns (items, LastEvaluatedKey or None)."""
+    scan_kwargs = {'Limit': limit}
+    if start_key:
+        scan_kwargs['ExclusiveStartKey'] = start_key
+    result = directory_table().scan(**scan_kwargs)
+    return result.get('Items', []), result.get('LastEvaluatedKey')
+
+
+def list_group_names(user_pool_id):
+    """List the names of all groups in the user pool"""
+    names = []
+    list_kwargs = {'UserPoolId': user_pool_id, 'Limit': 60}
+    while True:
+        result = cognito.list_groups(**list_kwargs)
+        names.extend(g['GroupName'] for g in result.get('Groups', []))
+        if not result.get('NextToken'):
+            return names
+        list_kwargs['NextToken'] = result['NextToken']
+
+
+def list_group_members(user_pool_id, group_name):
+    """List the usernames in a group"""
+    usernames = []
+    list_kwargs = {'UserPoolId': user_pool_id, 'GroupName': group_name, 'Limit': 60}
+    while True:
+        result = cognito.list_users_in_group(**list_kwargs)
+        usernames.extend(u['Username'] for u in result.get('Users', []))
+        if not result.get('NextToken'):
+            return usernames
+        list_kwargs['NextToken'] = result['NextToken']
@@ -0,0 +1,69 @@
+"""
+User Directory Reconcile Lambda
+Rebuilds UsersDirectoryTable from the Cognito user pool on a schedule: every
+Cognito user is written with its current groups, and directory items for
+users that no longer exist are removed. Also safe to invoke by hand, e.g.
+right after the first deploy to fill the table.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from aws_clients import client
+from structured_log import get_logger
+from user_directory import (
+    directory_table, entry_from_cognito_user, list_group_members, list_group_names, now_iso, put_users
+)
+
+USER_POOL_ID = os.environ.get('USER_POOL_ID')
+GROUP_LOOKUP_WORKERS = 8
+
+cognito = client('cognito-idp')
+logger = get_logger('user_directory_reconcile')
+
+def handler(event, context):
+    started = now_iso()
+
+    # Group membership for the whole pool: one paginated call per group
+    groups_by_user = {}
+    group_names = list_group_names(USER_POOL_ID)
+    with ThreadPoolExecutor(max_workers=GROUP_LOOKUP_WORKERS) as pool:
+        members = pool.map(lambda group: list_group_members(USER_POOL_ID, group), group_names)
+        for group, usernames in zip(group_names, members):
+            for username in usernames:
+                groups_by_user.setdefault(username, []).append(group)
+
+    seen = set()
+    list_kwargs = {'UserPoolId': USER_POOL_ID, 'Limit': 60}
+    while True:
+        result = cognito.list_users(**list_kwargs)
+        entries = [entry_from_cognito_user(user, groups_by_user.get(user['Username'], []))
+                   for user in result.get('Users', [])]
+        put_users(entries)
+        seen.update(entry['username'] for entry in entries)
+        if not result.get('PaginationToken'):
+            break
+        list_kwargs['PaginationToken'] = result['PaginationToken']
+
+    removed = remove_stale_entries(seen, started)
+    logger.info('Reconciled user directory', users=len(seen), removed=removed)
+    return {'users': len(seen), 'removed': removed}
+
+def remove_stale_entries(seen, started):
+    """
+    Delete directory items for users Cognito no longer has. Items created after
+    this run started (sign-ups during the listing) are kept.
+    """
+    users_table = directory_table()
+    stale = []
+    scan_kwargs = {'ProjectionExpression': 'username, created'}
+    while True:
+        result = users_table.scan(**scan_kwargs)
+        stale.extend(item['username'] for item in result.get('Items', [])
+                     if item['username'] not in seen and item.get('created', '') < started)
+        if 'LastEvaluatedKey' not in result:
+            break
+        scan_kwargs['ExclusiveStartKey'] = result['LastEvaluatedKey']
+
+    with users_table.batch_writer() as batch:
+        for username in stale:
+            batch.delete_item(Key={'username': username})
+    return len(stale)
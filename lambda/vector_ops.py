@@ -0,0 +1,77 @@
+"""
+Vector Operations
+Element-wise calculator operations over arrays of operands, computed in one
+pass. operand1/operand2 may both be arrays of the same length, or one may be a
+scalar that is applied to every element of the other.
+
+Arithmetic is exact Decimal, like the scalar operations.
+"""
+import operator
+from decimal import Decimal, InvalidOperation
+
+MAX_VECTOR_LENGTH = 10000
+
+DECIMAL_OPERATIONS = {
+    'add': operator.add,
+    'subtract': operator.sub,
+    'multiply': operator.mul,
+    'divide': operator.truediv
+}
+
+
+class VectorError(ValueError):
+    """Raised for vector requests that cannot be calculated (reported as 400)."""
+
+
+def is_vector_request(body):
+    return isinstance(body.get('operand1'), list) or isinstance(body.get('operand2'), list)
+
+
+def calculate_vector(operand1, operand2, operation):
+    """Apply an operation element-wise. Returns a list of Decimals."""
+    if operation not in DECIMAL_OPERATIONS:
+        raise VectorError(f'Unknown operation: {operation}')
+    length = _vector_length(operand1, operand2)
+    return _calculate_decimal(operand1, operand2, operation, length)
+
+
+def _vector_length(operand1, operand2):
+    lengths = {len(value) for value in (operand1, operand2) if isinstance(value, list)}
+    if len(lengths) != 1:
+        raise VectorError('operand1 and operand2 arrays must have the same length')
+    length = lengths.pop()
+    if not 0 < length <= MAX_VECTOR_LENGTH:
+        raise VectorError(f'Arrays must have between 1 and {MAX_VECTOR_LENGTH} elements')
+    return length
+
+
+def _to_decimal(value):
+    # bool is an int subclass, but true + 1 is not a calculation anyone meant
+    if isinstance(value, bool) or not isinstance(value, (Decimal, int, float, str)):
+        raise VectorError(f'Invalid operand: {value!r}')
+    try:
+        number = Decimal(str(value)) if isinstance(value, (float, str)) else Decimal(value)
+    except InvalidOperation:
+        raise VectorError(f'Invalid operand: {value!r}')
+    if not number.is_finite():
+        raise VectorError(f'Invalid operand: {value!r}')
+    return number
+
+
+def _decimal_values(value, length):
+    if isinstance(value, list):
+        return [_to_decimal(v) for v in value]
+    return [_to_decimal(value)] * length
+
+
+def _calculate_decimal(operand1, operand2, operation, length):
+    left = _decimal_values(operand1, length)
+    right = _decimal_values(operand2, length)
+    if operation == 'divide' and 0 in right:
+        raise VectorError(f'Division by zero at index {right.index(0)}')
+    return list(map(DECIMAL_OPERATIONS[operation], left, right))
+
+
+def summarize(results):
+    """Compact history summary: element count plus sum/min/max as Decimals."""
+    return {'count': len(results), 'sum': sum(results), 'min': min(results), 'max': max(results)}
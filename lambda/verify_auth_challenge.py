@@ -2,10 +2,15 @@
 VerifyAuthChallenge Lambda Trigger
 Verifies the OTP entered by the user matches the generated OTP.
 """
-import json
+import secrets
+from metrics import instrument
+from structured_log import get_logger
 
+logger = get_logger('verify_auth_challenge')
+
+@instrument('verify_auth_challenge')
 def handler(event, context):
-    print(f"VerifyAuthChallenge event: {json.dumps(event)}")
+    logger.event(event, 'VerifyAuthChallenge event')
     
     # Get expected answer from private challenge parameters
     expected_answer = event['request']['privateChallengeParameters'].get('answer', '')
@@ -13,12 +18,13 @@ def handler(event, context):
     # Get user's answer
     user_answer = event['request']['challengeAnswer']
     
-    # Compare
-    if expected_answer and user_answer == expected_answer:
+    # Compare in constant time, as bytes: compare_digest rejects non-ASCII str
+    answer_bytes = str(user_answer).encode('utf-8')
+    if expected_answer and secrets.compare_digest(answer_bytes, expected_answer.encode('utf-8')):
         event['response']['answerCorrect'] = True
-        print("OTP verification successful")
+        logger.info('OTP verification successful', user=event.get('userName'))
     else:
         event['response']['answerCorrect'] = False
-        print(f"OTP verification failed. Expected: {expected_answer}, Got: {user_answer}")
+        logger.info('OTP verification failed', user=event.get('userName'))
     
     return event
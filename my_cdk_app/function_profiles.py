@@ -0,0 +1,158 @@
+"""
+Per-function performance profiles.
+
+Memory, architecture and concurrency for each Lambda in MyCdkAppStack, keyed
+by construct id. DEFAULT_PROFILES holds what the stack ships with; the
+`functionProfiles` context (cdk.json or `-c functionProfiles='{...}'`)
+overrides it field by field, with "*" applying to every function:
+
+    {
+      "*": {"architecture": "arm64"},
+      "CalculateLambda": {
+        "memorySize": 1024,
+        "reservedConcurrency": 50,
+        "provisionedConcurrency": 2,
+        "autoScaling": {
+          "maxCapacity": 10,
+          "utilization": 0.7,
+          "schedules": [
+            {"name": "BusinessHours", "schedule": "cron(0 8 ? * MON-FRI *)", "minCapacity": 5},
+            {"name": "Night", "schedule": "cron(0 20 ? * MON-FRI *)", "minCapacity": 2}
+          ]
+        }
+      }
+    }
+
+A function with provisioned concurrency gets a `live` alias holding it, and
+its API integration or Cognito trigger invokes the alias (see
+invoke_target()); without it callers invoke the function directly, as
+before. autoScaling scales the alias between minCapacity (default: the
+provisioned concurrency) and maxCapacity on utilization and/or schedules.
+
+tools/power_tuning.py estimates memory sizes for these profiles from the
+local benchmark events.
+"""
+import json
+
+from aws_cdk import (
+    aws_applicationautoscaling as appscaling,
+    aws_lambda as _lambda,
+)
+
+ARCHITECTURES = {"arm64": _lambda.Architecture.ARM_64, "x86_64": _lambda.Architecture.X86_64}
+PROFILE_FIELDS = {"memorySize", "architecture", "reservedConcurrency", "provisionedConcurrency", "autoScaling"}
+AUTO_SCALING_FIELDS = {"minCapacity", "maxCapacity", "utilization", "schedules"}
+LIVE_ALIAS = "live"
+
+# The handlers bundle only pure-Python code (boto3 comes from the runtime), so
+# everything runs on arm64. Memory also sets the CPU share: the API handlers
+# and CreateAuthChallenge do the most work per call; the other Cognito triggers
+# are small lookups that must still answer within Cognito's 5 second limit.
+DEFAULT_PROFILES = {
+    "*": {"architecture": "arm64"},
+    "CalculateLambda": {"memorySize": 1024},
+    "AdminLambda": {"memorySize": 1024},
+    "CreateAuthChallengeLambda": {"memorySize": 512},
+    "DefineAuthChallengeLambda": {"memorySize": 256},
+    "VerifyAuthChallengeLambda": {"memorySize": 256},
+    "PreTokenGenerationLambda": {"memorySize": 256},
+    "PostConfirmationLambda": {"memorySize": 256},
+    # Holds one 8 MiB upload part plus a page of rows
+    "HistoryExportLambda": {"memorySize": 512},
+}
+
+
+def _check_profile(construct_id, profile):
+    unknown = set(profile) - PROFILE_FIELDS
+    if unknown:
+        raise ValueError(f"{construct_id}: unknown profile fields {sorted(unknown)}")
+    memory = profile.get("memorySize")
+    if memory is not None and not (isinstance(memory, int) and 128 <= memory <= 10240):
+        raise ValueError(f"{construct_id}: memorySize must be an integer from 128 to 10240")
+    if profile.get("architecture", "x86_64") not in ARCHITECTURES:
+        raise ValueError(f"{construct_id}: architecture must be one of {', '.join(ARCHITECTURES)}")
+    for field in ("reservedConcurrency", "provisionedConcurrency"):
+        value = profile.get(field)
+        if value is not None and not (isinstance(value, int) and value >= 0):
+            raise ValueError(f"{construct_id}: {field} must be a non-negative integer")
+
+    provisioned = profile.get("provisionedConcurrency") or 0
+    reserved = profile.get("reservedConcurrency")
+    if reserved is not None and provisioned > reserved:
+        raise ValueError(f"{construct_id}: provisionedConcurrency cannot exceed reservedConcurrency")
+    scaling = profile.get("autoScaling")
+    if scaling is not None:
+        if not provisioned:
+            raise ValueError(f"{construct_id}: autoScaling needs provisionedConcurrency")
+        unknown = set(scaling) - AUTO_SCALING_FIELDS
+        if unknown:
+            raise ValueError(f"{construct_id}: unknown autoScaling fields {sorted(unknown)}")
+        if "maxCapacity" not in scaling:
+            raise ValueError(f"{construct_id}: autoScaling needs maxCapacity")
+        if scaling.get("minCapacity", provisioned) > scaling["maxCapacity"]:
+            raise ValueError(f"{construct_id}: autoScaling minCapacity exceeds maxCapacity")
+        for schedule in scaling.get("schedules", []):
+            if not schedule.get("name") or not schedule.get("schedule"):
+                raise ValueError(f"{construct_id}: each autoScaling schedule needs a name and a schedule expression")
+            if "minCapacity" not in schedule and "maxCapacity" not in schedule:
+                raise ValueError(f"{construct_id}: autoScaling schedule {schedule['name']} sets neither minCapacity nor maxCapacity")
+
+
+def resolve_profiles(overrides=None):
+    """DEFAULT_PROFILES with `overrides` (dict or JSON string) applied, per construct id."""
+    if isinstance(overrides, str):
+        overrides = json.loads(overrides)
+    profiles = {construct_id: dict(profile) for construct_id, profile in DEFAULT_PROFILES.items()}
+    for construct_id, profile in (overrides or {}).items():
+        profiles.setdefault(construct_id, {}).update(profile)
+    for construct_id in profiles:
+        _check_profile(construct_id, profile_of(profiles, construct_id))
+    return profiles
+
+
+def profile_of(profiles, construct_id):
+    """The effective profile of one function: "*" overlaid with its own entry."""
+    return {**profiles.get("*", {}), **profiles.get(construct_id, {})}
+
+
+def function_props(profiles, construct_id):
+    """Keyword arguments for `_lambda.Function(...)` from the function's profile."""
+    profile = profile_of(profiles, construct_id)
+    props = {}
+    if "memorySize" in profile:
+        props["memory_size"] = profile["memorySize"]
+    if "architecture" in profile:
+        props["architecture"] = ARCHITECTURES[profile["architecture"]]
+    if profile.get("reservedConcurrency") is not None:
+        props["reserved_concurrent_executions"] = profile["reservedConcurrency"]
+    return props
+
+
+def invoke_target(profiles, function):
+    """
+    What API integrations and triggers should invoke: the `live` alias with
+    provisioned concurrency (and auto-scaling) when the profile asks for it,
+    otherwise the function itself.
+    """
+    profile = profile_of(profiles, function.node.id)
+    provisioned = profile.get("provisionedConcurrency") or 0
+    if not provisioned:
+        return function
+
+    alias = function.add_alias(LIVE_ALIAS, provisioned_concurrent_executions=provisioned)
+    scaling = profile.get("autoScaling")
+    if scaling:
+        capacity = alias.add_auto_scaling(
+            min_capacity=scaling.get("minCapacity", provisioned),
+            max_capacity=scaling["maxCapacity"],
+        )
+        if "utilization" in scaling:
+            capacity.scale_on_utilization(utilization_target=scaling["utilization"])
+        for schedule in scaling.get("schedules", []):
+            capacity.scale_on_schedule(
+                schedule["name"],
+                schedule=appscaling.Schedule.expression(schedule["schedule"]),
+                min_capacity=schedule.get("minCapacity"),
+                max_capacity=schedule.get("maxCapacity"),
+            )
+    return alias
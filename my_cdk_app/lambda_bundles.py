@@ -0,0 +1,56 @@
+"""
+Per-function Lambda code bundles.
+
+Every handler lives in lambda/ next to the shared modules. Rather than ship
+the whole directory to every function, handler_code() builds an asset with the
+handler module plus the local modules it imports (transitively). Imports of
+anything that is not a module in lambda/ (boto3, the standard library) are
+left to the runtime.
+"""
+import ast
+from pathlib import Path
+
+from aws_cdk import aws_lambda as _lambda
+
+LAMBDA_DIR = "lambda"
+
+
+def _local_modules(source_dir):
+    return {path.stem: path for path in Path(source_dir).glob("*.py")}
+
+
+def _imported_names(path):
+    tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                yield alias.name.split(".")[0]
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            yield node.module.split(".")[0]
+
+
+def module_closure(handler_module, source_dir=LAMBDA_DIR):
+    """Names of the local modules a handler needs, including itself."""
+    modules = _local_modules(source_dir)
+    if handler_module not in modules:
+        raise ValueError(f"No module {handler_module}.py in {source_dir}")
+
+    needed = set()
+    pending = [handler_module]
+    while pending:
+        name = pending.pop()
+        if name in needed:
+            continue
+        needed.add(name)
+        pending.extend(imported for imported in _imported_names(modules[name])
+                       if imported in modules and imported not in needed)
+    return needed
+
+
+def handler_code(handler_module, source_dir=LAMBDA_DIR):
+    """Asset holding only `handler_module` and the local modules it imports."""
+    keep = sorted(module_closure(handler_module, source_dir))
+    return _lambda.Code.from_asset(
+        source_dir,
+        exclude=["*"] + [f"!{name}.py" for name in keep],
+    )
@@ -1,3 +1,5 @@
+import json
+
 from aws_cdk import (
     Stack,
     RemovalPolicy,
@@ -8,9 +10,18 @@ from aws_cdk import (
     aws_apigateway as apigw,
     aws_dynamodb as dynamodb,
     aws_iam as iam,
+    aws_s3 as s3,
+    aws_sqs as sqs,
+    aws_lambda_event_sources as lambda_event_sources,
+    aws_events as events,
+    aws_events_targets as targets,
 )
 from constructs import Construct
 
+from my_cdk_app.function_profiles import function_props, invoke_target, resolve_profiles
+from my_cdk_app.lambda_bundles import handler_code
+from my_cdk_app.routes import API_ROUTES
+
 
 class MyCdkAppStack(Stack):
 
@@ -20,15 +31,35 @@ class MyCdkAppStack(Stack):
                 "region": "ap-south-1",
             }, **kwargs)
 
+        # ⚙️ Memory, architecture and concurrency per function (see function_profiles)
+        profiles = resolve_profiles(self.node.try_get_context("functionProfiles"))
+
+        # 📇 Users Directory Table (admin dashboard's copy of the user pool)
+        users_directory_table = dynamodb.Table(
+            self,
+            "UsersDirectoryTable",
+            partition_key=dynamodb.Attribute(
+                name="username",
+                type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
         # ⚡ Post Confirmation Lambda (for auto-adding users to groups)
         post_confirmation_lambda = _lambda.Function(
             self,
             "PostConfirmationLambda",
             runtime=_lambda.Runtime.PYTHON_3_12,
             handler="post_confirmation_handler.handler",
-            code=_lambda.Code.from_asset("lambda"),
+            code=handler_code("post_confirmation_handler"),
             timeout=Duration.seconds(10),
+            environment={
+                "USERS_TABLE": users_directory_table.table_name
+            },
+            **function_props(profiles, "PostConfirmationLambda"),
         )
+        users_directory_table.grant_write_data(post_confirmation_lambda)
 
         # 🔐 Custom Auth Lambdas for Passwordless OTP Login
         define_auth_lambda = _lambda.Function(
@@ -36,8 +67,9 @@ class MyCdkAppStack(Stack):
             "DefineAuthChallengeLambda",
             runtime=_lambda.Runtime.PYTHON_3_12,
             handler="define_auth_challenge.handler",
-            code=_lambda.Code.from_asset("lambda"),
+            code=handler_code("define_auth_challenge"),
             timeout=Duration.seconds(10),
+            **function_props(profiles, "DefineAuthChallengeLambda"),
         )
 
         create_auth_lambda = _lambda.Function(
@@ -45,8 +77,9 @@ class MyCdkAppStack(Stack):
             "CreateAuthChallengeLambda",
             runtime=_lambda.Runtime.PYTHON_3_12,
             handler="create_auth_challenge.handler",
-            code=_lambda.Code.from_asset("lambda"),
+            code=handler_code("create_auth_challenge"),
             timeout=Duration.seconds(30),
+            **function_props(profiles, "CreateAuthChallengeLambda"),
         )
 
         verify_auth_lambda = _lambda.Function(
@@ -54,18 +87,100 @@ class MyCdkAppStack(Stack):
             "VerifyAuthChallengeLambda",
             runtime=_lambda.Runtime.PYTHON_3_12,
             handler="verify_auth_challenge.handler",
-            code=_lambda.Code.from_asset("lambda"),
+            code=handler_code("verify_auth_challenge"),
             timeout=Duration.seconds(10),
+            **function_props(profiles, "VerifyAuthChallengeLambda"),
         )
 
-        # Grant SNS permissions to CreateAuthChallenge Lambda (for sending SMS)
-        create_auth_lambda.add_to_role_policy(
-            iam.PolicyStatement(
-                actions=["sns:Publish"],
-                resources=["*"]
+        # 🎭 Roles Table for custom roles
+        roles_table = dynamodb.Table(
+            self,
+            "RolesTable",
+            partition_key=dynamodb.Attribute(
+                name="roleName",
+                type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
+        # 🎫 Pre Token Generation Lambda (adds resolved role permissions to the ID token)
+        pre_token_lambda = _lambda.Function(
+            self,
+            "PreTokenGenerationLambda",
+            runtime=_lambda.Runtime.PYTHON_3_12,
+            handler="pre_token_generation.handler",
+            code=handler_code("pre_token_generation"),
+            timeout=Duration.seconds(5),
+            environment={
+                "ROLES_TABLE": roles_table.table_name,
+                "ROLES_CACHE_TTL_SECONDS": "60"
+            },
+            **function_props(profiles, "PreTokenGenerationLambda"),
+        )
+        roles_table.grant_read_data(pre_token_lambda)
+
+        # 📨 OTP delivery: CreateAuthChallenge queues the code and OtpSenderLambda
+        # sends the SMS, so sign-in doesn't wait on SNS
+        otp_rate_limit_table = dynamodb.Table(
+            self,
+            "OtpRateLimitTable",
+            partition_key=dynamodb.Attribute(
+                name="key",
+                type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            removal_policy=RemovalPolicy.DESTROY,
+            time_to_live_attribute="expiresAt",
+        )
+        otp_dlq = sqs.Queue(
+            self,
+            "OtpDLQ",
+            encryption=sqs.QueueEncryption.SQS_MANAGED,
+            retention_period=Duration.days(1),
+        )
+        otp_queue = sqs.Queue(
+            self,
+            "OtpQueue",
+            encryption=sqs.QueueEncryption.SQS_MANAGED,
+            # Codes are valid for 5 minutes; older messages are useless
+            retention_period=Duration.minutes(10),
+            visibility_timeout=Duration.seconds(60),
+            dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=3, queue=otp_dlq),
+        )
+        otp_sender_lambda = _lambda.Function(
+            self,
+            "OtpSenderLambda",
+            runtime=_lambda.Runtime.PYTHON_3_12,
+            handler="otp_sender.handler",
+            code=handler_code("otp_sender"),
+            timeout=Duration.seconds(10),
+            **function_props(profiles, "OtpSenderLambda"),
+        )
+        otp_sender_lambda.add_event_source(
+            lambda_event_sources.SqsEventSource(
+                otp_queue,
+                batch_size=10,
+                # No batching window: the user is waiting for the code
+                report_batch_item_failures=True,
             )
         )
 
+        create_auth_lambda.add_environment("OTP_QUEUE_URL", otp_queue.queue_url)
+        create_auth_lambda.add_environment("OTP_RATE_TABLE", otp_rate_limit_table.table_name)
+        otp_queue.grant_send_messages(create_auth_lambda)
+        otp_rate_limit_table.grant_read_write_data(create_auth_lambda)
+
+        # Grant SNS permissions for sending SMS (CreateAuthChallenge sends directly
+        # if the queue is unavailable)
+        for sms_lambda in (otp_sender_lambda, create_auth_lambda):
+            sms_lambda.add_to_role_policy(
+                iam.PolicyStatement(
+                    actions=["sns:Publish"],
+                    resources=["*"]
+                )
+            )
+
         # 🔐 Cognito User Pool with MFA, Phone/Email Login and Custom Auth
         user_pool = cognito.UserPool(
             self,
@@ -100,10 +215,11 @@ class MyCdkAppStack(Stack):
             removal_policy=RemovalPolicy.DESTROY,
             # 🎯 Lambda Triggers for Auth
             lambda_triggers=cognito.UserPoolTriggers(
-                post_confirmation=post_confirmation_lambda,
-                define_auth_challenge=define_auth_lambda,
-                create_auth_challenge=create_auth_lambda,
-                verify_auth_challenge_response=verify_auth_lambda
+                post_confirmation=invoke_target(profiles, post_confirmation_lambda),
+                define_auth_challenge=invoke_target(profiles, define_auth_lambda),
+                create_auth_challenge=invoke_target(profiles, create_auth_lambda),
+                verify_auth_challenge_response=invoke_target(profiles, verify_auth_lambda),
+                pre_token_generation=invoke_target(profiles, pre_token_lambda)
             )
         )
 
@@ -177,14 +293,42 @@ class MyCdkAppStack(Stack):
             ),
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
             removal_policy=RemovalPolicy.DESTROY,
+            # New rows feed the usage stats consumer
+            stream=dynamodb.StreamViewType.NEW_IMAGE,
         )
+        # Admin history filters: newest-first Query by operation or by role.
+        # CloudFormation adds one GSI per table update, so an existing stack
+        # takes two deploys: first with `-c historyRoleIndex=false`, then without.
+        history_table.add_global_secondary_index(
+            index_name="ByOperation",
+            partition_key=dynamodb.Attribute(
+                name="operation",
+                type=dynamodb.AttributeType.STRING
+            ),
+            sort_key=dynamodb.Attribute(
+                name="timestamp",
+                type=dynamodb.AttributeType.STRING
+            ),
+        )
+        if self.node.try_get_context("historyRoleIndex") not in (False, "false"):
+            history_table.add_global_secondary_index(
+                index_name="ByRole",
+                partition_key=dynamodb.Attribute(
+                    name="role_used",
+                    type=dynamodb.AttributeType.STRING
+                ),
+                sort_key=dynamodb.Attribute(
+                    name="timestamp",
+                    type=dynamodb.AttributeType.STRING
+                ),
+            )
 
-        # 🎭 Roles Table for custom roles
-        roles_table = dynamodb.Table(
+        # 🕘 Recent History Table (per-user list of the latest calculations)
+        recent_history_table = dynamodb.Table(
             self,
-            "RolesTable",
+            "RecentHistoryTable",
             partition_key=dynamodb.Attribute(
-                name="roleName",
+                name="userId",
                 type=dynamodb.AttributeType.STRING
             ),
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
@@ -197,17 +341,65 @@ class MyCdkAppStack(Stack):
             "CalculateLambda",
             runtime=_lambda.Runtime.PYTHON_3_12,
             handler="calculate_handler.handler",
-            code=_lambda.Code.from_asset("lambda"),
+            code=handler_code("calculate_handler"),
             timeout=Duration.seconds(30),
             environment={
                 "HISTORY_TABLE": history_table.table_name,
-                "ROLES_TABLE": roles_table.table_name
-            }
+                "ROLES_TABLE": roles_table.table_name,
+                "RECENT_TABLE": recent_history_table.table_name,
+                # Warm containers re-check the roles version at most this often
+                "ROLES_CACHE_TTL_SECONDS": "60"
+            },
+            **function_props(profiles, "CalculateLambda"),
         )
 
         # Grant Lambda permissions to DynamoDB
         history_table.grant_read_write_data(calculate_lambda)
         roles_table.grant_read_data(calculate_lambda)
+        recent_history_table.grant_read_write_data(calculate_lambda)
+
+        # 📬 Optional write-behind history: `cdk deploy -c historyWriteMode=queue`
+        if self.node.try_get_context("historyWriteMode") == "queue":
+            history_dlq = sqs.Queue(
+                self,
+                "HistoryWriteDLQ",
+                retention_period=Duration.days(14),
+            )
+            history_queue = sqs.Queue(
+                self,
+                "HistoryWriteQueue",
+                # At least 6x the consumer timeout, per the SQS event source guidance
+                visibility_timeout=Duration.seconds(180),
+                dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=5, queue=history_dlq),
+            )
+
+            history_writer_lambda = _lambda.Function(
+                self,
+                "HistoryWriterLambda",
+                runtime=_lambda.Runtime.PYTHON_3_12,
+                handler="history_writer.handler",
+                code=handler_code("history_writer"),
+                timeout=Duration.seconds(30),
+                environment={
+                    "HISTORY_TABLE": history_table.table_name,
+                    "RECENT_TABLE": recent_history_table.table_name
+                },
+                **function_props(profiles, "HistoryWriterLambda"),
+            )
+            history_writer_lambda.add_event_source(
+                lambda_event_sources.SqsEventSource(
+                    history_queue,
+                    batch_size=10,
+                    max_batching_window=Duration.seconds(1),
+                    report_batch_item_failures=True,
+                )
+            )
+            history_table.grant_read_write_data(history_writer_lambda)
+            recent_history_table.grant_read_write_data(history_writer_lambda)
+
+            calculate_lambda.add_environment("HISTORY_WRITE_MODE", "queue")
+            calculate_lambda.add_environment("HISTORY_QUEUE_URL", history_queue.queue_url)
+            history_queue.grant_send_messages(calculate_lambda)
 
         # 👑 Admin Lambda Function
         admin_lambda = _lambda.Function(
@@ -215,18 +407,23 @@ class MyCdkAppStack(Stack):
             "AdminLambda",
             runtime=_lambda.Runtime.PYTHON_3_12,
             handler="admin_handler.handler",
-            code=_lambda.Code.from_asset("lambda"),
+            code=handler_code("admin_handler"),
             timeout=Duration.seconds(30),
             environment={
                 "USER_POOL_ID": user_pool.user_pool_id,
                 "HISTORY_TABLE": history_table.table_name,
-                "ROLES_TABLE": roles_table.table_name
-            }
+                "ROLES_TABLE": roles_table.table_name,
+                "RECENT_TABLE": recent_history_table.table_name,
+                "USERS_TABLE": users_directory_table.table_name
+            },
+            **function_props(profiles, "AdminLambda"),
         )
 
         # Grant Admin Lambda permissions
         history_table.grant_read_write_data(admin_lambda)
         roles_table.grant_read_write_data(admin_lambda)
+        recent_history_table.grant_read_write_data(admin_lambda)
+        users_directory_table.grant_read_write_data(admin_lambda)
         
         # Grant Cognito admin permissions to Admin Lambda
         admin_lambda.add_to_role_policy(
@@ -247,6 +444,158 @@ class MyCdkAppStack(Stack):
             )
         )
 
+        # 📦 History export: jobs started by the admin API stream to S3
+        export_bucket = s3.Bucket(
+            self,
+            "HistoryExportBucket",
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            encryption=s3.BucketEncryption.S3_MANAGED,
+            enforce_ssl=True,
+            lifecycle_rules=[
+                s3.LifecycleRule(prefix="exports/", expiration=Duration.days(7)),
+                s3.LifecycleRule(abort_incomplete_multipart_upload_after=Duration.days(1)),
+            ],
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+        export_lambda = _lambda.Function(
+            self,
+            "HistoryExportLambda",
+            runtime=_lambda.Runtime.PYTHON_3_12,
+            handler="history_export.handler",
+            code=handler_code("history_export"),
+            timeout=Duration.minutes(15),
+            environment={
+                "HISTORY_TABLE": history_table.table_name,
+                "EXPORT_BUCKET": export_bucket.bucket_name
+            },
+            **function_props(profiles, "HistoryExportLambda"),
+        )
+        history_table.grant_read_data(export_lambda)
+        export_bucket.grant_read_write(export_lambda)
+
+        admin_lambda.add_environment("EXPORT_BUCKET", export_bucket.bucket_name)
+        admin_lambda.add_environment("EXPORT_FUNCTION_NAME", export_lambda.function_name)
+        export_bucket.grant_read_write(admin_lambda)
+        export_lambda.grant_invoke(admin_lambda)
+
+        # 📊 Usage stats: hourly/daily counters kept up to date from the history stream
+        usage_stats_table = dynamodb.Table(
+            self,
+            "UsageStatsTable",
+            partition_key=dynamodb.Attribute(
+                name="bucket",
+                type=dynamodb.AttributeType.STRING
+            ),
+            sort_key=dynamodb.Attribute(
+                name="scope",
+                type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="expiresAt",
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+        usage_stats_dlq = sqs.Queue(
+            self,
+            "UsageStatsDLQ",
+            retention_period=Duration.days(14),
+        )
+        usage_stats_lambda = _lambda.Function(
+            self,
+            "UsageStatsLambda",
+            runtime=_lambda.Runtime.PYTHON_3_12,
+            handler="usage_stats.handler",
+            code=handler_code("usage_stats"),
+            timeout=Duration.seconds(60),
+            environment={
+                "USAGE_STATS_TABLE": usage_stats_table.table_name
+            },
+            **function_props(profiles, "UsageStatsLambda"),
+        )
+        usage_stats_lambda.add_event_source(
+            lambda_event_sources.DynamoEventSource(
+                history_table,
+                starting_position=_lambda.StartingPosition.TRIM_HORIZON,
+                # Larger batches fold more rows into each counter update
+                batch_size=500,
+                max_batching_window=Duration.seconds(10),
+                retry_attempts=5,
+                on_failure=lambda_event_sources.SqsDlq(usage_stats_dlq),
+                filters=[_lambda.FilterCriteria.filter({"eventName": _lambda.FilterRule.is_equal("INSERT")})],
+            )
+        )
+        usage_stats_table.grant_read_write_data(usage_stats_lambda)
+
+        admin_lambda.add_environment("USAGE_STATS_TABLE", usage_stats_table.table_name)
+        usage_stats_table.grant_read_data(admin_lambda)
+
+        # ⏱️ Cognito gives a trigger 5 seconds: fail a slow AWS call fast and retry
+        #    once rather than spend the budget on the default adaptive retries
+        for trigger_lambda in [
+            post_confirmation_lambda, define_auth_lambda, create_auth_lambda, verify_auth_lambda,
+            pre_token_lambda
+        ]:
+            trigger_lambda.add_environment("AWS_MAX_ATTEMPTS", "2")
+            trigger_lambda.add_environment("AWS_CONNECT_TIMEOUT", "0.5")
+            trigger_lambda.add_environment("AWS_READ_TIMEOUT", "1.5")
+
+        # ⏱️ API Gateway answers 504 after 29 seconds: cap each AWS call at 3 attempts
+        #    of 1s connect + 5s read, so even with backoff a call fails inside that window
+        for api_lambda in [calculate_lambda, admin_lambda]:
+            api_lambda.add_environment("AWS_MAX_ATTEMPTS", "3")
+            api_lambda.add_environment("AWS_CONNECT_TIMEOUT", "1")
+            api_lambda.add_environment("AWS_READ_TIMEOUT", "5")
+
+        # 📈 Per-phase latency metrics (CloudWatch Embedded Metric Format log lines)
+        # 📝 Log levels: `-c logLevel=DEBUG` for all, or per function with
+        #    `-c logLevels='{"AdminLambda": "DEBUG"}'` (keys are construct ids)
+        log_level = self.node.try_get_context("logLevel") or "INFO"
+        log_levels = self.node.try_get_context("logLevels") or {}
+        if isinstance(log_levels, str):
+            log_levels = json.loads(log_levels)
+        for instrumented_lambda in [
+            post_confirmation_lambda, define_auth_lambda, create_auth_lambda, verify_auth_lambda,
+            pre_token_lambda, calculate_lambda, admin_lambda
+        ]:
+            instrumented_lambda.add_environment("METRICS_ENABLED", "true")
+            instrumented_lambda.add_environment("METRICS_NAMESPACE", "CalculatorApp")
+            instrumented_lambda.add_environment(
+                "LOG_LEVEL", log_levels.get(instrumented_lambda.node.id, log_level)
+            )
+            # Share of invocations that dump the (redacted) event when not at DEBUG
+            instrumented_lambda.add_environment("LOG_EVENT_SAMPLE_RATE", "0.01")
+
+        # 🔄 Users Directory Reconcile Lambda (rebuilds the directory from Cognito)
+        reconcile_users_lambda = _lambda.Function(
+            self,
+            "UsersDirectoryReconcileLambda",
+            runtime=_lambda.Runtime.PYTHON_3_12,
+            handler="user_directory_reconcile.handler",
+            code=handler_code("user_directory_reconcile"),
+            timeout=Duration.minutes(5),
+            environment={
+                "USER_POOL_ID": user_pool.user_pool_id,
+                "USERS_TABLE": users_directory_table.table_name
+            },
+            **function_props(profiles, "UsersDirectoryReconcileLambda"),
+        )
+        users_directory_table.grant_read_write_data(reconcile_users_lambda)
+        reconcile_users_lambda.add_to_role_policy(
+            iam.PolicyStatement(
+                actions=[
+                    "cognito-idp:ListUsers",
+                    "cognito-idp:ListGroups",
+                    "cognito-idp:ListUsersInGroup"
+                ],
+                resources=[user_pool.user_pool_arn]
+            )
+        )
+        events.Rule(
+            self,
+            "UsersDirectoryReconcileSchedule",
+            schedule=events.Schedule.rate(Duration.hours(6)),
+            targets=[targets.LambdaFunction(reconcile_users_lambda)],
+        )
+
         # 🌐 API Gateway
         api = apigw.RestApi(
             self,
@@ -267,50 +616,18 @@ class MyCdkAppStack(Stack):
             cognito_user_pools=[user_pool]
         )
 
-        # /calculate endpoint
-        calculate_resource = api.root.add_resource("calculate")
-        calculate_resource.add_method(
-            "POST",
-            apigw.LambdaIntegration(calculate_lambda),
-            authorizer=authorizer,
-            authorization_type=apigw.AuthorizationType.COGNITO,
-        )
-
-        # /roles endpoint (public for registration dropdown)
-        roles_resource = api.root.add_resource("roles")
-        roles_resource.add_method(
-            "GET",
-            apigw.LambdaIntegration(admin_lambda),
-            authorizer=authorizer,
-            authorization_type=apigw.AuthorizationType.COGNITO,
-        )
-
-        # 👑 Admin endpoints
-        admin_resource = api.root.add_resource("admin")
-        
-        # /admin/users
-        users_resource = admin_resource.add_resource("users")
-        users_resource.add_method("GET", apigw.LambdaIntegration(admin_lambda), authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
-        users_resource.add_method("DELETE", apigw.LambdaIntegration(admin_lambda), authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
-        
-        # /admin/users/role
-        user_role_resource = users_resource.add_resource("role")
-        user_role_resource.add_method("POST", apigw.LambdaIntegration(admin_lambda), authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
-        
-        # /admin/users/block
-        user_block_resource = users_resource.add_resource("block")
-        user_block_resource.add_method("POST", apigw.LambdaIntegration(admin_lambda), authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
-        
-        # /admin/roles
-        admin_roles_resource = admin_resource.add_resource("roles")
-        admin_roles_resource.add_method("GET", apigw.LambdaIntegration(admin_lambda), authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
-        admin_roles_resource.add_method("POST", apigw.LambdaIntegration(admin_lambda), authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
-        admin_roles_resource.add_method("DELETE", apigw.LambdaIntegration(admin_lambda), authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
-        
-        # /admin/history
-        admin_history_resource = admin_resource.add_resource("history")
-        admin_history_resource.add_method("GET", apigw.LambdaIntegration(admin_lambda), authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
-        admin_history_resource.add_method("DELETE", apigw.LambdaIntegration(admin_lambda), authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
+        # Routes from the shared route table (also served by the local gateway)
+        integrations = {
+            "calculate_handler": apigw.LambdaIntegration(invoke_target(profiles, calculate_lambda)),
+            "admin_handler": apigw.LambdaIntegration(invoke_target(profiles, admin_lambda)),
+        }
+        for path, method, handler in API_ROUTES:
+            api.root.resource_for_path(path).add_method(
+                method,
+                integrations[handler],
+                authorizer=authorizer,
+                authorization_type=apigw.AuthorizationType.COGNITO,
+            )
 
         # 📤 Outputs
         CfnOutput(self, "UserPoolId", value=user_pool.user_pool_id)
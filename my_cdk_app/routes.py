@@ -0,0 +1,42 @@
+"""
+REST API route table.
+
+MyCdkAppStack builds the API Gateway resources and methods from API_ROUTES,
+and the local gateway (tools/local_gateway.py) dispatches requests with the
+same table, so a route added here exists in both places. Every route is
+behind the Cognito authorizer.
+"""
+
+# (path, HTTP method, handler module in lambda/)
+API_ROUTES = [
+    ("/calculate", "POST", "calculate_handler"),
+    ("/calculate/batch", "POST", "calculate_handler"),
+    # Caller's own history, paginated
+    ("/history", "GET", "calculate_handler"),
+    # Roles for the registration dropdown
+    ("/roles", "GET", "admin_handler"),
+    # 👑 Admin endpoints
+    ("/admin/users", "GET", "admin_handler"),
+    ("/admin/users", "DELETE", "admin_handler"),
+    ("/admin/users/role", "POST", "admin_handler"),
+    ("/admin/users/block", "POST", "admin_handler"),
+    ("/admin/users/bulk", "POST", "admin_handler"),
+    ("/admin/roles", "GET", "admin_handler"),
+    ("/admin/roles", "POST", "admin_handler"),
+    ("/admin/roles", "DELETE", "admin_handler"),
+    ("/admin/history", "GET", "admin_handler"),
+    ("/admin/history", "DELETE", "admin_handler"),
+    # Asynchronous NDJSON/CSV export to S3: start a job, then poll it for the URL
+    ("/admin/history/export", "POST", "admin_handler"),
+    ("/admin/history/export", "GET", "admin_handler"),
+    # Pre-aggregated usage counters
+    ("/admin/stats", "GET", "admin_handler"),
+]
+
+
+def route_methods():
+    """Path -> {method: handler module}."""
+    methods = {}
+    for path, method, handler in API_ROUTES:
+        methods.setdefault(path, {})[method] = handler
+    return methods
@@ -0,0 +1,68 @@
+"""
+AWS resources the benchmarks create on moto: the stack's DynamoDB tables
+(named after their construct ids), its S3 buckets and a user pool with the
+default groups.
+"""
+
+# Handler env var -> (table name, key schema)
+TABLES = {
+    'HISTORY_TABLE': ('CalculatorHistory', [('userId', 'HASH'), ('timestamp', 'RANGE')]),
+    'ROLES_TABLE': ('RolesTable', [('roleName', 'HASH')]),
+    'RECENT_TABLE': ('RecentHistory', [('userId', 'HASH')]),
+    'USERS_TABLE': ('UsersDirectoryTable', [('username', 'HASH')]),
+    'USAGE_STATS_TABLE': ('UsageStatsTable', [('bucket', 'HASH'), ('scope', 'RANGE')])
+}
+
+# Table name -> {index name: key schema}
+INDEXES = {
+    'CalculatorHistory': {
+        'ByOperation': [('operation', 'HASH'), ('timestamp', 'RANGE')],
+        'ByRole': [('role_used', 'HASH'), ('timestamp', 'RANGE')]
+    }
+}
+
+# Handler env var -> bucket name
+BUCKETS = {
+    'EXPORT_BUCKET': 'history-export'
+}
+
+DEFAULT_GROUPS = ('ASrole', 'DMrole', 'AdminRole')
+
+
+def create_tables(dynamodb, env):
+    """Create every table with a low-level DynamoDB client and record its name in `env`."""
+    for variable, (name, keys) in TABLES.items():
+        indexes = INDEXES.get(name, {})
+        attributes = {key for key, _ in keys}
+        attributes.update(key for index_keys in indexes.values() for key, _ in index_keys)
+        kwargs = {}
+        if indexes:
+            kwargs['GlobalSecondaryIndexes'] = [{
+                'IndexName': index_name,
+                'KeySchema': [{'AttributeName': key, 'KeyType': kind} for key, kind in index_keys],
+                'Projection': {'ProjectionType': 'ALL'}
+            } for index_name, index_keys in indexes.items()]
+        dynamodb.create_table(
+            TableName=name,
+            KeySchema=[{'AttributeName': key, 'KeyType': kind} for key, kind in keys],
+            AttributeDefinitions=[{'AttributeName': key, 'AttributeType': 'S'} for key in sorted(attributes)],
+            BillingMode='PAY_PER_REQUEST',
+            **kwargs
+        )
+        env[variable] = name
+
+
+def create_buckets(s3, env):
+    """Create every bucket and record its name in `env`."""
+    for variable, name in BUCKETS.items():
+        s3.create_bucket(Bucket=name)
+        env[variable] = name
+
+
+def create_user_pool(cognito, env, groups=DEFAULT_GROUPS):
+    """Create the user pool and its groups; records USER_POOL_ID in `env`."""
+    user_pool_id = cognito.create_user_pool(PoolName='CalculatorUserPool')['UserPool']['Id']
+    for group in groups:
+        cognito.create_group(UserPoolId=user_pool_id, GroupName=group)
+    env['USER_POOL_ID'] = user_pool_id
+    return user_pool_id
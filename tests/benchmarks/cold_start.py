@@ -0,0 +1,209 @@
+"""
+Cold-start benchmark for the Lambda entry points.
+
+Each handler is imported and invoked once in a fresh interpreter, the way a
+new Lambda execution environment sees it, against a local moto server seeded
+with the tables, user pool and groups the stack creates. Import time and
+first-invocation time are reported per handler (median of --runs) and
+compared with tests/benchmarks/cold_start_baseline.json.
+
+    python -m tests.benchmarks.cold_start                    # compare, exit 1 on regression
+    python -m tests.benchmarks.cold_start --update-baseline  # record a new baseline
+
+Requires `moto[server]` (see requirements-dev.txt). Absolute timings depend on
+the machine, so record the baseline on the machine that runs the comparison.
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from tests.benchmarks.aws_fixtures import create_tables, create_user_pool
+
+ROOT = Path(__file__).resolve().parents[2]
+LAMBDA_DIR = ROOT / 'lambda'
+BASELINE_FILE = Path(__file__).with_name('cold_start_baseline.json')
+
+# A handler regresses when its total is this much slower than the baseline
+# (medians of fresh processes still carry a few tens of ms of machine noise)
+REGRESSION_RATIO = 1.3
+REGRESSION_SLACK_MS = 25.0
+
+USERNAME = 'bench-user'
+
+
+def api_event(path, method, groups, body=None):
+    return {
+        'httpMethod': method,
+        'path': path,
+        'resource': path,
+        'queryStringParameters': None,
+        'body': json.dumps(body) if body is not None else None,
+        'requestContext': {'authorizer': {'claims': {'sub': 'bench-sub', 'cognito:groups': groups}}}
+    }
+
+
+def trigger_event(user_pool_id, request, response=None):
+    return {
+        'userPoolId': user_pool_id,
+        'userName': USERNAME,
+        'request': request,
+        'response': response or {}
+    }
+
+
+def handler_events(user_pool_id):
+    """First invocation for each entry point: the route or trigger call it serves most."""
+    attributes = {'sub': 'bench-sub', 'phone_number': '+15555550100', 'custom:role': 'ASrole'}
+    return {
+        'calculate_handler': api_event('/calculate', 'POST', '[ASrole]',
+                                       {'operand1': 6, 'operand2': 7, 'operation': 'add'}),
+        'admin_handler': api_event('/admin/roles', 'GET', 'AdminRole'),
+        'define_auth_challenge': trigger_event(user_pool_id, {'session': []}),
+        'create_auth_challenge': trigger_event(user_pool_id, {
+            'challengeName': 'CUSTOM_CHALLENGE', 'userAttributes': attributes, 'session': []
+        }),
+        'verify_auth_challenge': trigger_event(user_pool_id, {
+            'privateChallengeParameters': {'answer': '123456'}, 'challengeAnswer': '123456',
+            'userAttributes': attributes
+        }),
+        'post_confirmation_handler': trigger_event(user_pool_id, {'userAttributes': attributes}),
+        'pre_token_generation': trigger_event(user_pool_id, {
+            'userAttributes': attributes,
+            'groupConfiguration': {'groupsToOverride': ['ASrole'], 'iamRolesToOverride': []}
+        })
+    }
+
+
+# Runs in the fresh interpreter: time the import, then the first call
+CHILD = r'''
+import contextlib, importlib, io, json, sys, time
+name, event = sys.argv[1], json.loads(sys.argv[2])
+with contextlib.redirect_stdout(io.StringIO()):
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    imported = time.perf_counter()
+    module.handler(event, None)
+    invoked = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000, 'invoke_ms': (invoked - imported) * 1000}))
+'''
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def base_env(endpoint):
+    env = dict(os.environ)
+    env.update(
+        AWS_ENDPOINT_URL=endpoint,
+        AWS_DEFAULT_REGION='us-east-1',
+        AWS_ACCESS_KEY_ID='testing',
+        AWS_SECRET_ACCESS_KEY='testing',
+        PYTHONPATH=str(LAMBDA_DIR),
+    )
+    env.pop('AWS_PROFILE', None)
+    return env
+
+
+def seed(env):
+    """Create the resources the handlers touch on the moto server."""
+    import boto3
+
+    session = boto3.Session(region_name=env['AWS_DEFAULT_REGION'],
+                            aws_access_key_id='testing', aws_secret_access_key='testing')
+    dynamodb = session.client('dynamodb', endpoint_url=env['AWS_ENDPOINT_URL'])
+    create_tables(dynamodb, env)
+    for role, permissions in (('ASrole', ['add', 'subtract']), ('DMrole', ['multiply', 'divide'])):
+        dynamodb.put_item(TableName=env['ROLES_TABLE'], Item={
+            'roleName': {'S': role}, 'permissions': {'L': [{'S': p} for p in permissions]}
+        })
+
+    cognito = session.client('cognito-idp', endpoint_url=env['AWS_ENDPOINT_URL'])
+    user_pool_id = create_user_pool(cognito, env)
+    cognito.admin_create_user(UserPoolId=user_pool_id, Username=USERNAME)
+    return user_pool_id
+
+
+def measure(name, event, env):
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD, name, json.dumps(event)],
+        env=env, cwd=str(LAMBDA_DIR), capture_output=True, text=True, check=False
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'{name} failed:\n{result.stderr}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(runs):
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    port = free_port()
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=port)
+    server.start()
+    try:
+        env = base_env(f'http://127.0.0.1:{port}')
+        events = handler_events(seed(env))
+        results = {}
+        for name, event in events.items():
+            samples = [measure(name, event, env) for _ in range(runs)]
+            import_ms = statistics.median(s['import_ms'] for s in samples)
+            invoke_ms = statistics.median(s['invoke_ms'] for s in samples)
+            results[name] = {
+                'import_ms': round(import_ms, 1),
+                'invoke_ms': round(invoke_ms, 1),
+                'total_ms': round(import_ms + invoke_ms, 1)
+            }
+        return results
+    finally:
+        server.stop()
+
+
+def compare(results, baseline):
+    """Return (name, baseline_total, total) for every handler that regressed."""
+    regressions = []
+    for name, timing in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        limit = previous['total_ms'] * REGRESSION_RATIO + REGRESSION_SLACK_MS
+        if timing['total_ms'] > limit:
+            regressions.append((name, previous['total_ms'], timing['total_ms']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=7, help='fresh interpreters per handler')
+    parser.add_argument('--update-baseline', action='store_true', help='write the results as the new baseline')
+    args = parser.parse_args(argv)
+
+    results = run(args.runs)
+    baseline = json.loads(BASELINE_FILE.read_text()) if BASELINE_FILE.exists() else {}
+
+    print(f"{'handler':<28}{'import ms':>11}{'invoke ms':>11}{'total ms':>10}{'baseline':>10}")
+    for name, timing in results.items():
+        previous = baseline.get(name, {}).get('total_ms', '-')
+        print(f"{name:<28}{timing['import_ms']:>11}{timing['invoke_ms']:>11}{timing['total_ms']:>10}{previous:>10}")
+
+    if args.update_baseline:
+        BASELINE_FILE.write_text(json.dumps(results, indent=2) + '\n')
+        print(f'Baseline written to {BASELINE_FILE.relative_to(ROOT)}')
+        return 0
+
+    regressions = compare(results, baseline)
+    for name, before, after in regressions:
+        print(f'REGRESSION {name}: {before} ms -> {after} ms')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+Load benchmark for the API handlers, run in-process against moto.
+
+calculate_handler.handler and admin_handler.handler are driven with
+synthetic API Gateway proxy events (Cognito authorizer claims included)
+against mocked DynamoDB and Cognito seeded with --users users, --roles
+custom roles and --history history rows. Each route gets --requests
+invocations spread over --concurrency threads; throughput and p50/p95/p99
+latency are reported per route and compared with
+tests/benchmarks/load_baseline.json.
+
+    python -m tests.benchmarks.load                    # compare, exit 1 on regression
+    python -m tests.benchmarks.load --update-baseline  # record a new baseline
+
+Needs only `moto` (see requirements-dev.txt): nothing leaves the process.
+Absolute numbers depend on the machine and on moto's own overhead, so use
+it to compare changes on one machine, and record the baseline there.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from tests.benchmarks.aws_fixtures import create_tables, create_user_pool
+
+ROOT = Path(__file__).resolve().parents[2]
+LAMBDA_DIR = ROOT / 'lambda'
+BASELINE_FILE = Path(__file__).with_name('load_baseline.json')
+
+# A route regresses when its p95 is this much slower than the baseline
+REGRESSION_RATIO = 1.5
+REGRESSION_SLACK_MS = 2.0
+
+OPERATIONS = ['add', 'subtract', 'multiply', 'divide']
+DEFAULT_GROUPS = ['ASrole', 'DMrole']
+
+
+class Dataset:
+    """Synthetic users, roles and history rows, reproducible from `seed`."""
+
+    def __init__(self, users, roles, history, seed=0):
+        rng = random.Random(seed)
+        self.roles = {
+            f'custom-{n}': sorted(rng.sample(OPERATIONS, rng.randint(1, len(OPERATIONS))))
+            for n in range(roles)
+        }
+        role_names = DEFAULT_GROUPS + list(self.roles)
+        self.users = [
+            {'username': f'user-{n:05d}', 'sub': f'sub-{n:05d}', 'groups': rng.sample(role_names, rng.randint(1, 2))}
+            for n in range(users)
+        ]
+        now = datetime.utcnow()
+        self.history = []
+        for n in range(history):
+            user = self.users[n % users]
+            operation = rng.choice(OPERATIONS)
+            operand1, operand2 = Decimal(rng.randint(0, 10000)), Decimal(rng.randint(1, 10000))
+            self.history.append({
+                'userId': user['sub'],
+                'timestamp': (now - timedelta(seconds=rng.randint(0, 30 * 86400), microseconds=n)).isoformat(),
+                'operand1': operand1,
+                'operand2': operand2,
+                'operation': operation,
+                'result': operand1 + operand2,
+                'role_used': user['groups'][0]
+            })
+        self.rng = rng
+
+
+def seed(dataset, env):
+    """Create and fill the tables and user pool; runs inside mock_aws()."""
+    import boto3
+
+    create_tables(boto3.client('dynamodb'), env)
+    dynamodb = boto3.resource('dynamodb')
+
+    with dynamodb.Table(env['ROLES_TABLE']).batch_writer() as batch:
+        for role, permissions in dataset.roles.items():
+            batch.put_item(Item={'roleName': role, 'permissions': permissions, 'isDefault': False})
+    with dynamodb.Table(env['HISTORY_TABLE']).batch_writer() as batch:
+        for item in dataset.history:
+            batch.put_item(Item=item)
+
+    cognito = boto3.client('cognito-idp')
+    user_pool_id = create_user_pool(cognito, env, DEFAULT_GROUPS + ['AdminRole'] + list(dataset.roles))
+    created = datetime.utcnow().isoformat()
+    with dynamodb.Table(env['USERS_TABLE']).batch_writer() as batch:
+        for user in dataset.users:
+            cognito.admin_create_user(UserPoolId=user_pool_id, Username=user['username'], UserAttributes=[
+                {'Name': 'email', 'Value': f"{user['username']}@example.com"}
+            ])
+            for group in user['groups']:
+                cognito.admin_add_user_to_group(UserPoolId=user_pool_id, Username=user['username'], GroupName=group)
+            batch.put_item(Item={
+                'username': user['username'],
+                'email': f"{user['username']}@example.com",
+                'groups': user['groups'],
+                'enabled': True,
+                'status': 'CONFIRMED',
+                'created': created,
+                'updated': created
+            })
+
+
+def api_event(path, method, claims, body=None, params=None):
+    return {
+        'httpMethod': method,
+        'path': path,
+        'resource': path,
+        'queryStringParameters': params,
+        'body': json.dumps(body) if body is not None else None,
+        'requestContext': {'authorizer': {'claims': claims}}
+    }
+
+
+def user_claims(dataset, user):
+    """Claims as the authorizer passes them, with the sign-in permissions claim."""
+    permissions = {'ASrole': ['add', 'subtract'], 'DMrole': ['divide', 'multiply'], **dataset.roles}
+    return {
+        'sub': user['sub'],
+        'cognito:username': user['username'],
+        'cognito:groups': ','.join(user['groups']),
+        'role_permissions': json.dumps({group: permissions[group] for group in user['groups']})
+    }
+
+
+def route_generators(dataset):
+    """Route name -> (handler module, function building one random event)."""
+    rng = dataset.rng
+    admin = {'sub': 'admin-sub', 'cognito:username': 'admin', 'cognito:groups': 'AdminRole'}
+
+    def any_user():
+        return user_claims(dataset, rng.choice(dataset.users))
+
+    def operation():
+        return {'operand1': rng.randint(0, 1000), 'operand2': rng.randint(1, 1000),
+                'operation': rng.choice(OPERATIONS)}
+
+    return {
+        'POST /calculate': ('calculate_handler', lambda: api_event(
+            '/calculate', 'POST', any_user(), operation())),
+        'POST /calculate expression': ('calculate_handler', lambda: api_event(
+            '/calculate', 'POST', any_user(),
+            {'expression': f'({rng.randint(1, 99)} + {rng.randint(1, 99)}) * {rng.randint(1, 99)} - 7'})),
+        'POST /calculate/batch': ('calculate_handler', lambda: api_event(
+            '/calculate/batch', 'POST', any_user(), {'operations': [operation() for _ in range(25)]})),
+        'GET /history': ('calculate_handler', lambda: api_event(
+            '/history', 'GET', any_user(), params={'limit': '20'})),
+        'GET /admin/users': ('admin_handler', lambda: api_event('/admin/users', 'GET', admin)),
+        'GET /admin/roles': ('admin_handler', lambda: api_event('/admin/roles', 'GET', admin)),
+        'GET /admin/history': ('admin_handler', lambda: api_event('/admin/history', 'GET', admin))
+    }
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[max(1, math.ceil(fraction * len(sorted_values))) - 1]
+
+
+def drive(handler, events, concurrency):
+    """Invoke `handler` once per event on `concurrency` threads; returns (latencies ms, status codes, seconds)."""
+    def invoke(event):
+        started = time.perf_counter()
+        result = handler(event, None)
+        return (time.perf_counter() - started) * 1000, result['statusCode']
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(invoke, events))
+    elapsed = time.perf_counter() - started
+    return sorted(latency for latency, _ in outcomes), [status for _, status in outcomes], elapsed
+
+
+def run(args):
+    from moto import mock_aws
+
+    env = {
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing'
+    }
+    os.environ.update(env)
+    for variable in ('AWS_PROFILE', 'AWS_ENDPOINT_URL'):
+        os.environ.pop(variable, None)
+    sys.path.insert(0, str(LAMBDA_DIR))
+
+    dataset = Dataset(args.users, args.roles, args.history, args.seed)
+    with mock_aws():
+        seed(dataset, env)
+        os.environ.update(env)
+        handlers = {}
+        results = {}
+        for route, (module_name, make_event) in route_generators(dataset).items():
+            if module_name not in handlers:
+                handlers[module_name] = importlib.import_module(module_name).handler
+            handler = handlers[module_name]
+            with contextlib.redirect_stdout(io.StringIO()):
+                drive(handler, [make_event() for _ in range(args.warmup)], args.concurrency)
+                latencies, statuses, elapsed = drive(
+                    handler, [make_event() for _ in range(args.requests)], args.concurrency)
+            results[route] = {
+                'throughput_rps': round(len(latencies) / elapsed, 1),
+                'p50_ms': round(percentile(latencies, 0.50), 2),
+                'p95_ms': round(percentile(latencies, 0.95), 2),
+                'p99_ms': round(percentile(latencies, 0.99), 2),
+                'mean_ms': round(statistics.fmean(latencies), 2),
+                # Random operations include ones the user's roles deny: those are 403s
+                'rejected': sum(1 for status in statuses if 400 <= status < 500),
+                'errors': sum(1 for status in statuses if status >= 500)
+            }
+        return results
+
+
+def compare(results, baseline):
+    """Return (route, baseline_p95, p95) for every route that regressed."""
+    regressions = []
+    for route, timing in results.items():
+        previous = baseline.get(route)
+        if previous is None:
+            continue
+        limit = previous['p95_ms'] * REGRESSION_RATIO + REGRESSION_SLACK_MS
+        if timing['p95_ms'] > limit:
+            regressions.append((route, previous['p95_ms'], timing['p95_ms']))
+    return regressions
+
+
+def config_of(args):
+    """Settings that change the numbers; a baseline only compares against the same ones."""
+    return {key: getattr(args, key) for key in ('users', 'roles', 'history', 'requests', 'concurrency', 'seed')}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200, help='Cognito users (and directory entries)')
+    parser.add_argument('--roles', type=int, default=20, help='custom roles in RolesTable')
+    parser.add_argument('--history', type=int, default=5000, help='rows in CalculatorHistory')
+    parser.add_argument('--requests', type=int, default=100, help='measured invocations per route')
+    parser.add_argument('--warmup', type=int, default=20, help='unmeasured invocations per route')
+    parser.add_argument('--concurrency', type=int, default=8, help='threads invoking the handler')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for the synthetic data')
+    parser.add_argument('--update-baseline', action='store_true', help='write the results as the new baseline')
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    baseline_file = json.loads(BASELINE_FILE.read_text()) if BASELINE_FILE.exists() else {}
+    baseline = baseline_file.get('routes', {})
+    if baseline and baseline_file.get('config') != config_of(args):
+        print('Baseline was recorded with different settings; comparison skipped')
+        baseline = {}
+
+    print(f"{'route':<30}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'4xx':>6}{'5xx':>6}{'base p95':>10}")
+    for route, timing in results.items():
+        previous = baseline.get(route, {}).get('p95_ms', '-')
+        print(f"{route:<30}{timing['throughput_rps']:>9}{timing['p50_ms']:>9}{timing['p95_ms']:>9}"
+              f"{timing['p99_ms']:>9}{timing['rejected']:>6}{timing['errors']:>6}{previous:>10}")
+
+    if args.update_baseline:
+        BASELINE_FILE.write_text(json.dumps({'config': config_of(args), 'routes': results}, indent=2) + '\n')
+        print(f'Baseline written to {BASELINE_FILE.relative_to(ROOT)}')
+        return 0
+
+    regressions = compare(results, baseline)
+    for route, before, after in regressions:
+        print(f'REGRESSION {route}: p95 {before} ms -> {after} ms')
+    return 1 if regressions else 0
+
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Authorization microbenchmark: RoleIndex vs. walking the permission map.
+
+Times one /calculate authorization (granting role for the user's groups, plus
+the 403 lookup of a role that grants the operation) at 10, 100 and 1000
+custom roles, against the per-request loops the handler used before the
+index. Index compilation is timed separately since it runs once per load.
+
+    python -m tests.benchmarks.role_index
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'lambda'))
+
+from role_permissions import DEFAULT_ROLE_PERMISSIONS, RoleIndex  # noqa: E402
+
+OPERATIONS = ['add', 'subtract', 'multiply', 'divide']
+
+
+def make_permissions(role_count):
+    """Defaults plus custom roles; only the last custom role grants 'divide'."""
+    permissions = dict(DEFAULT_ROLE_PERMISSIONS)
+    permissions.pop('DMrole')
+    permissions.pop('AdminRole')
+    for n in range(role_count):
+        permissions[f'custom-{n}'] = ['add', 'subtract', 'multiply'] + (['divide'] if n == role_count - 1 else [])
+    return permissions
+
+
+def loop_authorize(groups, permissions, operation):
+    for user_role in groups:
+        if user_role in permissions:
+            if operation in permissions[user_role]:
+                return user_role
+    for role, allowed_ops in permissions.items():
+        if operation in allowed_ops:
+            return role
+    return None
+
+
+def index_authorize(groups, index, operation):
+    return index.granting_role(groups, operation) or index.roles_for(operation)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=2000, help='calls per timing')
+    args = parser.parse_args(argv)
+
+    print(f"{'roles':>6}{'loop us':>10}{'index us':>10}{'speedup':>9}{'compile us':>12}")
+    for role_count in (10, 100, 1000):
+        permissions = make_permissions(role_count)
+        # A user holding a few roles, none of which grants the operation (403 path)
+        groups = [f'custom-{n}' for n in range(0, role_count - 1, max(1, role_count // 5))][:5]
+        index = RoleIndex(permissions)
+        assert loop_authorize(groups, permissions, 'divide') == index_authorize(groups, index, 'divide')[0]
+
+        loop = min(timeit.repeat(lambda: loop_authorize(groups, permissions, 'divide'),
+                                 number=args.number, repeat=5)) / args.number
+        indexed = min(timeit.repeat(lambda: index_authorize(groups, index, 'divide'),
+                                    number=args.number, repeat=5)) / args.number
+        compile_time = min(timeit.repeat(lambda: RoleIndex(permissions), number=20, repeat=3)) / 20
+        print(f"{role_count:>6}{loop * 1e6:>10.2f}{indexed * 1e6:>10.2f}{loop / indexed:>8.1f}x"
+              f"{compile_time * 1e6:>12.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Fixtures for the Lambda handler tests.
+
+lambda/ is put on sys.path the way the Lambda runtime sees it, and the `aws`
+fixture runs each test inside moto with the stack's tables, export bucket and
+user pool (tests/benchmarks/aws_fixtures.py). Handlers read table names from
+the environment at import time, so those are set before any test imports them.
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from tests.benchmarks.aws_fixtures import BUCKETS, TABLES, create_buckets, create_tables, create_user_pool
+
+LAMBDA_DIR = Path(__file__).resolve().parents[2] / 'lambda'
+
+os.environ.update(
+    AWS_DEFAULT_REGION='us-east-1',
+    AWS_ACCESS_KEY_ID='testing',
+    AWS_SECRET_ACCESS_KEY='testing',
+)
+for variable in ('AWS_PROFILE', 'AWS_ENDPOINT_URL'):
+    os.environ.pop(variable, None)
+for variable, (name, _) in TABLES.items():
+    os.environ.setdefault(variable, name)
+for variable, name in BUCKETS.items():
+    os.environ.setdefault(variable, name)
+if str(LAMBDA_DIR) not in sys.path:
+    sys.path.insert(0, str(LAMBDA_DIR))
+
+
+class AwsEnv:
+    """What the `aws` fixture created: resource names by env var, and the user pool."""
+
+    def __init__(self, env, user_pool_id):
+        self.env = env
+        self.user_pool_id = user_pool_id
+
+    def table(self, variable):
+        import boto3
+        return boto3.resource('dynamodb').Table(self.env[variable])
+
+
+@pytest.fixture
+def aws():
+    from moto import mock_aws
+    import boto3
+    import aws_clients
+    import role_permissions
+
+    with mock_aws():
+        # Clients and caches must not outlive the mock they were created in
+        aws_clients.reset()
+        role_permissions.invalidate_cache()
+        role_permissions.index_from_claim.cache_clear()
+        env = {}
+        create_tables(boto3.client('dynamodb'), env)
+        create_buckets(boto3.client('s3'), env)
+        user_pool_id = create_user_pool(boto3.client('cognito-idp'), env)
+        yield AwsEnv(env, user_pool_id)
+        aws_clients.reset()
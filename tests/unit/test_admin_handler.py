@@ -0,0 +1,179 @@
+import json
+
+import pytest
+
+import admin_handler
+from pagination import encode_cursor
+from tests.benchmarks.load import api_event
+
+ADMIN = {'sub': 'admin-sub', 'cognito:username': 'admin', 'cognito:groups': 'AdminRole'}
+
+
+@pytest.fixture
+def admin(aws, monkeypatch):
+    monkeypatch.setattr(admin_handler, 'USER_POOL_ID', aws.user_pool_id)
+    return aws
+
+
+def call(path, method='GET', body=None, params=None, context=None):
+    result = admin_handler.handler(api_event(path, method, ADMIN, body, params), context)
+    return result['statusCode'], json.loads(result['body'])
+
+
+def seed_history(aws, count=6):
+    rows = [{
+        'userId': f'user-{index % 2}',
+        'timestamp': f'2024-01-01T00:00:{index:02d}',
+        'operation': 'add' if index % 3 else 'multiply',
+        'role_used': 'ASrole' if index % 3 else 'DMrole',
+        'result': str(index)
+    } for index in range(count)]
+    with aws.table('HISTORY_TABLE').batch_writer() as batch:
+        for row in rows:
+            batch.put_item(Item=row)
+    return rows
+
+
+def read_all(params):
+    """Follow cursors until the last page; returns every row and the page count."""
+    rows, pages, cursor = [], 0, None
+    while True:
+        status, body = call('/admin/history', params=dict(params, **({'cursor': cursor} if cursor else {})))
+        assert status == 200, body
+        rows.extend(body['history'])
+        pages += 1
+        cursor = body['cursor']
+        if not cursor:
+            return rows, pages
+
+
+def test_history_pages_cover_every_row(admin):
+    rows = seed_history(admin)
+
+    scanned, pages = read_all({'limit': '2'})
+    exported, _ = read_all({'export': 'true', 'segments': '3', 'limit': '2'})
+
+    assert pages > 1
+    key = lambda row: (row['userId'], row['timestamp'])
+    assert sorted(map(key, scanned)) == sorted(map(key, rows))
+    assert sorted(map(key, exported)) == sorted(map(key, rows))
+
+
+@pytest.mark.parametrize('params', [
+    # An export cursor outside export mode
+    {'cursor': encode_cursor({'segments': [{}, None]})},
+    # A scan cursor with extra or missing key attributes
+    {'cursor': encode_cursor({'userId': 'user-0', 'timestamp': 't', 'operation': 'add'})},
+    {'cursor': encode_cursor({'userId': 'user-0'})},
+    {'cursor': encode_cursor({'userId': 'user-0', 'timestamp': 5})},
+    # A scan cursor in export mode, and malformed segment positions
+    {'export': 'true', 'cursor': encode_cursor({'userId': 'user-0', 'timestamp': 't'})},
+    {'export': 'true', 'cursor': encode_cursor({'segments': [{'userId': 'user-0'}]})},
+    # An index cursor for another index or value
+    {'operation': 'add', 'cursor': encode_cursor({'userId': 'user-0', 'timestamp': 't', 'role_used': 'ASrole'})},
+    {'operation': 'add', 'cursor': encode_cursor({'userId': 'user-0', 'timestamp': 't', 'operation': 'divide'})},
+    {'cursor': 'not a cursor'},
+])
+def test_mismatched_history_cursors_are_rejected(admin, params):
+    seed_history(admin)
+
+    status, body = call('/admin/history', params=params)
+
+    assert status == 400
+    assert body['error'].startswith('Invalid cursor')
+
+
+def test_bad_segments_reads_like_a_bad_limit(admin):
+    assert call('/admin/history', params={'export': 'true', 'segments': 'four'}) == \
+        (400, {'error': 'Invalid segments: four'})
+    assert call('/admin/history', params={'limit': 'ten'}) == (400, {'error': 'Invalid limit: ten'})
+
+
+def create_user(aws, username, groups):
+    import boto3
+
+    cognito = boto3.client('cognito-idp')
+    cognito.admin_create_user(UserPoolId=aws.user_pool_id, Username=username)
+    for group in groups:
+        cognito.admin_add_user_to_group(UserPoolId=aws.user_pool_id, Username=username, GroupName=group)
+    return cognito
+
+
+def directory_item(aws, username):
+    return aws.table('USERS_TABLE').get_item(Key={'username': username}).get('Item')
+
+
+def test_role_change_keeps_admin_membership_once(admin):
+    cognito = create_user(admin, 'alice', ['AdminRole', 'ASrole'])
+
+    assert call('/admin/users/role', 'POST', {'username': 'alice', 'role': 'AdminRole'})[0] == 200
+
+    groups = cognito.admin_list_groups_for_user(UserPoolId=admin.user_pool_id, Username='alice')['Groups']
+    assert [group['GroupName'] for group in groups] == ['AdminRole']
+    # The directory had no item for alice yet: the update creates it
+    assert directory_item(admin, 'alice') == {'username': 'alice', 'role': 'AdminRole', 'groups': ['AdminRole']}
+
+    call('/admin/users/role', 'POST', {'username': 'alice', 'role': 'DMrole'})
+    assert directory_item(admin, 'alice')['groups'] == ['AdminRole', 'DMrole']
+
+
+def test_bulk_actions_past_the_time_budget_come_back_pending(admin, monkeypatch):
+    create_user(admin, 'alice', ['ASrole'])
+    monkeypatch.setattr(admin_handler, 'BULK_TIME_BUDGET_SECONDS', -1)
+    actions = [{'action': 'block', 'username': 'alice', 'block': True},
+               {'action': 'role', 'username': 'alice', 'role': 'DMrole'}]
+
+    status, body = call('/admin/users/bulk', 'POST', {'actions': actions})
+
+    assert status == 200
+    assert (body['results'], body['pending'], body['succeeded']) == ([], actions, 0)
+
+
+def test_operation_and_role_filters_query_the_indexes_newest_first(admin):
+    rows = seed_history(admin, count=9)
+
+    def timestamps(params):
+        return [row['timestamp'] for row in read_all(params)[0]]
+
+    def expected(keep):
+        return sorted((row['timestamp'] for row in rows if keep(row)), reverse=True)
+
+    assert timestamps({'operation': 'add', 'limit': '2'}) == expected(lambda row: row['operation'] == 'add')
+    assert timestamps({'role': 'DMrole'}) == expected(lambda row: row['role_used'] == 'DMrole')
+    assert timestamps({'operation': 'add', 'role': 'DMrole'}) == []
+    assert timestamps({'operation': 'multiply', 'from': '2024-01-01T00:00:03', 'to': '2024-01-01T00:00:06'}) == \
+        ['2024-01-01T00:00:06', '2024-01-01T00:00:03']
+
+
+def test_users_are_listed_in_pages_from_the_directory(admin):
+    with admin.table('USERS_TABLE').batch_writer() as batch:
+        for index in range(5):
+            batch.put_item(Item={'username': f'user-{index}', 'role': 'ASrole', 'groups': ['ASrole']})
+
+    usernames, cursor, pages = [], None, 0
+    while True:
+        status, body = call('/admin/users', params=dict({'limit': '2'}, **({'cursor': cursor} if cursor else {})))
+        assert status == 200, body
+        assert len(body['users']) <= 2
+        usernames.extend(user['username'] for user in body['users'])
+        pages += 1
+        cursor = body['cursor']
+        if not cursor:
+            break
+
+    assert pages > 2
+    assert sorted(usernames) == [f'user-{index}' for index in range(5)]
+    assert call('/admin/users', params={'cursor': 'not a cursor'})[0] == 400
+
+
+def test_block_and_delete_update_the_directory(admin):
+    create_user(admin, 'alice', ['ASrole'])
+    admin.table('USERS_TABLE').put_item(Item={'username': 'alice', 'role': 'ASrole', 'enabled': True})
+
+    assert call('/admin/users/block', 'POST', {'username': 'alice', 'block': True})[0] == 200
+    assert directory_item(admin, 'alice')['enabled'] is False
+    assert call('/admin/users/block', 'POST', {'username': 'alice', 'block': False})[0] == 200
+    assert directory_item(admin, 'alice')['enabled'] is True
+
+    assert call('/admin/users', 'DELETE', {'username': 'alice'})[0] == 200
+    assert directory_item(admin, 'alice') is None
@@ -0,0 +1,133 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import boto3
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError
+
+import aws_clients
+from aws_clients import Lazy
+
+
+@pytest.fixture
+def created(aws, monkeypatch):
+    """Records the service of every boto3 client aws_clients builds."""
+    services = []
+    build = boto3.client
+
+    def counting(service_name, **kwargs):
+        services.append(service_name)
+        return build(service_name, **kwargs)
+    monkeypatch.setattr(boto3, 'client', counting)
+    return services
+
+
+def test_client_is_created_on_first_attribute_access_and_reused(created):
+    sqs = aws_clients.client('sqs')
+    assert created == []
+
+    first = sqs.meta
+    assert created == ['sqs']
+    assert sqs.meta is first
+    assert aws_clients.client('sqs') is sqs
+    assert created == ['sqs']
+
+
+def test_reset_forgets_created_clients(created):
+    sqs = aws_clients.client('sqs')
+    sqs.meta
+
+    aws_clients.reset()
+
+    assert created == ['sqs']
+    # The same proxy builds a fresh client on its next use
+    sqs.meta
+    assert created == ['sqs', 'sqs']
+
+
+def test_concurrent_first_use_creates_the_target_once():
+    targets = []
+    barrier = threading.Barrier(8)
+
+    def factory():
+        targets.append(SimpleNamespace(name='target'))
+        return targets[-1]
+    proxy = Lazy(factory)
+
+    def use():
+        barrier.wait()
+        assert proxy.name == 'target'
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(targets) == 1
+
+
+class Raw:
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+def stub_responses(service_client, responses):
+    """Answer the client's requests with (status, JSON body) pairs instead of sending them."""
+    pending = list(responses)
+
+    def send(request, **kwargs):
+        status, body = pending.pop(0)
+        return AWSResponse(request.url, status, {}, Raw(json.dumps(body).encode('utf-8')))
+    service_client.meta.events.register_first('before-send', send)
+    return pending
+
+
+THROTTLED = (400, {'__type': 'ThrottlingException', 'message': 'Rate exceeded'})
+
+
+def test_calls_retries_and_throttles_are_counted(aws, monkeypatch):
+    monkeypatch.setattr(aws_clients, 'MAX_ATTEMPTS', 2)
+    dynamodb = aws_clients.client('dynamodb')
+    pending = stub_responses(dynamodb, [THROTTLED, (200, {'TableNames': []}), THROTTLED, THROTTLED])
+
+    assert dynamodb.list_tables()['TableNames'] == []
+    with pytest.raises(ClientError):
+        dynamodb.list_tables()
+    # AWS_MAX_ATTEMPTS counts the first attempt
+    assert pending == []
+
+    # Every throttled attempt, the retries they caused, and the call that gave up
+    assert aws_clients.stats() == {
+        'dynamodb': {'calls': 2, 'retries': 2, 'throttled': 3, 'throttle_errors': 1}
+    }
+    aws_clients.reset()
+    assert aws_clients.stats() == {}
+
+
+def test_cognito_admin_calls_take_a_token_from_their_family_bucket(aws, monkeypatch):
+    acquired = []
+
+    class Bucket:
+        def __init__(self, rate):
+            self.rate = rate
+
+        def acquire(self):
+            acquired.append(self.rate)
+    monkeypatch.setattr(aws_clients, 'TokenBucket', Bucket)
+    monkeypatch.setenv('COGNITO_USERUPDATE_RPS', '5')
+    cognito = aws_clients.client('cognito-idp')
+    stub_responses(cognito, [(200, {})] * 3)
+
+    cognito.admin_disable_user(UserPoolId='pool', Username='alice')
+    cognito.list_users(UserPoolId='pool')
+    # Not in a rate-limited family
+    cognito.describe_user_pool(UserPoolId='pool')
+
+    assert acquired == [5.0, float(aws_clients.COGNITO_RATE_LIMITS['UserList'])]
+    assert aws_clients.stats()['cognito-idp']['calls'] == 3
@@ -0,0 +1,243 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+import calculate_handler
+from pagination import encode_cursor
+from tests.benchmarks.load import api_event
+
+PERMISSIONS = {'ASrole': ['add', 'subtract'], 'DMrole': ['divide', 'multiply']}
+
+
+def claims(groups, permissions=None, sub='user-1'):
+    """Authorizer claims; `permissions` becomes the pre-token-generation claim."""
+    result = {'sub': sub, 'cognito:groups': ','.join(groups)}
+    if permissions is not None:
+        result['role_permissions'] = json.dumps(permissions)
+    return result
+
+
+def call(path, body=None, groups=('ASrole',), permissions=None, method='POST', params=None, sub='user-1'):
+    result = calculate_handler.handler(
+        api_event(path, method, claims(groups, permissions, sub), body, params), None)
+    return result['statusCode'], json.loads(result['body'])
+
+
+@pytest.fixture
+def no_roles_table(monkeypatch):
+    """Fail the test if authorization reads RolesTable."""
+    def unexpected():
+        raise AssertionError('RolesTable was read')
+    monkeypatch.setattr(calculate_handler, 'get_role_index', unexpected)
+
+
+def test_claim_permissions_authorize_without_roles_table(aws, no_roles_table):
+    status, body = call('/calculate', {'operand1': 2, 'operand2': 3, 'operation': 'add'},
+                        groups=['Adder'], permissions={'Adder': ['add']})
+
+    assert status == 200
+    assert body['result'] == '5'
+    assert body['history'][0]['operation'] == 'add'
+
+
+def test_claim_denial_names_every_granting_role(aws):
+    status, body = call('/calculate', {'operand1': 2, 'operand2': 3, 'operation': 'multiply'},
+                        groups=['ASrole'], permissions={'ASrole': PERMISSIONS['ASrole']})
+
+    assert status == 403
+    assert body['your_roles'] == ['ASrole']
+    assert (body['required_role'], body['required_roles']) == ('DMrole', ['DMrole', 'AdminRole'])
+
+
+def test_tokens_without_the_claim_fall_back_to_roles_table(aws):
+    aws.table('ROLES_TABLE').put_item(Item={'roleName': 'Adder', 'permissions': ['add'], 'isDefault': False})
+
+    status, _ = call('/calculate', {'operand1': 2, 'operand2': 3, 'operation': 'add'}, groups=['Adder'])
+    assert status == 200
+
+    status, body = call('/calculate', {'operand1': 2, 'operand2': 3, 'operation': 'divide'}, groups=['Adder'])
+    assert status == 403
+    assert body['required_roles'] == ['DMrole', 'AdminRole']
+
+
+def test_pre_token_generation_adds_the_permissions_claim(aws):
+    import pre_token_generation
+
+    aws.table('ROLES_TABLE').put_item(Item={'roleName': 'Adder', 'permissions': ['add'], 'isDefault': False})
+    event = {
+        'userName': 'alice',
+        'request': {'groupConfiguration': {'groupsToOverride': ['ASrole', 'Adder', 'Unknown']}},
+        'response': {}
+    }
+
+    result = pre_token_generation.handler(event, None)
+
+    claim = result['response']['claimsOverrideDetails']['claimsToAddOrOverride']['role_permissions']
+    assert json.loads(claim) == {'ASrole': PERMISSIONS['ASrole'], 'Adder': ['add']}
+
+
+def test_claim_is_omitted_when_custom_roles_cannot_be_read(aws, monkeypatch):
+    import pre_token_generation
+    import role_permissions
+
+    aws.table('ROLES_TABLE').put_item(Item={'roleName': 'Adder', 'permissions': ['add'], 'isDefault': False})
+    event = {'userName': 'alice', 'request': {'groupConfiguration': {'groupsToOverride': ['Adder']}}, 'response': {}}
+
+    with monkeypatch.context() as patch:
+        patch.setattr(role_permissions, 'ROLES_TABLE', 'MissingTable')
+        result = pre_token_generation.handler(event, None)
+
+    # Only the defaults were known: a claim would deny Adder until the token expires
+    assert 'claimsOverrideDetails' not in result['response']
+
+    # Without the claim the handler reads RolesTable once the cache refreshes
+    role_permissions._cache['expires_at'] = 0.0
+    status, body = call('/calculate', {'operand1': 2, 'operand2': 3, 'operation': 'add'}, groups=['Adder'])
+    assert (status, body['result']) == (200, '5')
+
+
+def test_batch_reports_a_status_per_item(aws):
+    status, body = call('/calculate/batch', {'operations': [
+        {'operand1': 2, 'operand2': 3, 'operation': 'add'},
+        {'operand1': 2, 'operand2': 3, 'operation': 'modulo'},
+        {'operand1': 2, 'operation': 'subtract'},
+        {'operand1': 'two', 'operand2': 3, 'operation': 'add'},
+        {'operand1': 1, 'operand2': 0, 'operation': 'divide'},
+        'add',
+        {'operand1': 6, 'operand2': 3, 'operation': 'divide'},
+    ]}, groups=['ASrole', 'DMrole'], permissions=PERMISSIONS)
+
+    assert status == 200
+    results = body['results']
+    assert [entry['status'] for entry in results] == [200, 403, 400, 400, 400, 400, 200]
+    assert [entry['index'] for entry in results] == list(range(7))
+    assert results[0]['result'] == '5'
+    assert results[2]['error'] == "Missing field: 'operand2'"
+    assert results[3]['error'] == 'Invalid operand'
+    assert results[4]['error'] == 'Division by zero'
+    assert results[5]['error'] == 'Invalid operation entry'
+
+    rows = aws.table('HISTORY_TABLE').scan()['Items']
+    assert sorted(row['operation'] for row in rows) == ['add', 'divide']
+    # Newest first, as /history serves them
+    assert [entry['operation'] for entry in body['history']] == ['divide', 'add']
+
+
+def test_batch_flags_rows_that_were_not_saved(aws, monkeypatch):
+    monkeypatch.setattr(calculate_handler, 'save_history', lambda items: items[:1])
+
+    status, body = call('/calculate/batch', {'operations': [
+        {'operand1': 1, 'operand2': 1, 'operation': 'add'},
+        {'operand1': 2, 'operand2': 1, 'operation': 'subtract'},
+    ]}, permissions=PERMISSIONS)
+
+    assert status == 200
+    first, second = body['results']
+    assert first['status'] == 200 and first['error'] == 'Result was not saved to history'
+    assert 'error' not in second
+    assert [entry['operation'] for entry in body['history']] == ['subtract']
+
+
+def seed_own_history(aws, user_id, count):
+    with aws.table('HISTORY_TABLE').batch_writer() as batch:
+        for index in range(count):
+            batch.put_item(Item={
+                'userId': user_id,
+                'timestamp': f'2024-01-01T00:00:{index:02d}',
+                'operand1': 1, 'operand2': index, 'operation': 'add', 'result': 1 + index, 'role_used': 'ASrole'
+            })
+
+
+def test_history_cursor_pages_newest_first(aws):
+    seed_own_history(aws, 'user-1', 5)
+
+    timestamps, cursor = [], None
+    while True:
+        status, body = call('/history', method='GET', params={'limit': '2', **({'cursor': cursor} if cursor else {})})
+        assert status == 200
+        timestamps.extend(entry['timestamp'] for entry in body['history'])
+        cursor = body['cursor']
+        if not cursor:
+            break
+
+    assert timestamps == sorted(timestamps, reverse=True)
+    assert len(timestamps) == 5
+
+    status, body = call('/history', method='GET', params={'from': '2024-01-01T00:00:03'})
+    assert [entry['timestamp'] for entry in body['history']] == ['2024-01-01T00:00:04', '2024-01-01T00:00:03']
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor',
+    encode_cursor({'userId': 'user-2', 'timestamp': '2024-01-01T00:00:01'}),
+    encode_cursor({'userId': 'user-1', 'timestamp': '2024-01-01T00:00:01', 'operation': 'add'}),
+    encode_cursor({'segments': [{}]}),
+])
+def test_history_rejects_foreign_or_malformed_cursors(aws, cursor):
+    seed_own_history(aws, 'user-2', 3)
+
+    status, body = call('/history', method='GET', params={'cursor': cursor})
+
+    assert (status, body) == (400, {'error': 'Invalid cursor'})
+
+
+def test_expression_checks_every_operator_and_records_the_granting_roles(aws):
+    status, body = call('/calculate', {'expression': '(1.5 + 2) * -4 / 2'},
+                        groups=['ASrole', 'DMrole'], permissions=PERMISSIONS)
+
+    assert status == 200
+    assert body['result'] == '-7.0'
+    assert body['operations'] == ['add', 'divide', 'multiply']
+    row, = aws.table('HISTORY_TABLE').scan()['Items']
+    assert (row['operation'], row['role_used']) == ('expression', 'ASrole,DMrole')
+
+    status, body = call('/calculate', {'expression': '2 * 3 + 1'}, permissions={'ASrole': PERMISSIONS['ASrole']})
+    assert status == 403
+    assert body['error'] == 'Access Denied: You need a role with "multiply" permission.'
+
+
+@pytest.mark.parametrize('groups', [['ASrole'], []])
+def test_expressions_without_an_operator_are_rejected(aws, groups):
+    permissions = {group: PERMISSIONS[group] for group in groups}
+
+    for expression in ('5', '-(5)'):
+        status, body = call('/calculate', {'expression': expression}, groups=groups, permissions=permissions)
+        assert (status, body) == (400, {'error': 'Expression must use at least one operation'})
+
+    assert aws.table('HISTORY_TABLE').scan()['Items'] == []
+
+
+def test_expression_overflow_is_a_client_error(aws):
+    status, body = call('/calculate', {'expression': '1e999999 * 1e999999'},
+                        groups=['DMrole'], permissions=PERMISSIONS)
+
+    assert (status, body) == (400, {'error': 'Result out of range'})
+
+
+def test_vector_applies_the_operation_element_wise(aws):
+    status, body = call('/calculate', {'operand1': [1, 2.5, '3'], 'operand2': 2, 'operation': 'multiply'},
+                        groups=['DMrole'], permissions=PERMISSIONS)
+
+    assert status == 200
+    assert (body['result'], body['count']) == (['2', '5.0', '6'], 3)
+    row, = aws.table('HISTORY_TABLE').scan()['Items']
+    assert row['vector'] == {'count': 3, 'sum': Decimal('13.0'), 'min': Decimal('2'), 'max': Decimal('6')}
+    assert (row['operand1'], row['operand2'], row['role_used']) == ('[3 values]', Decimal('2'), 'DMrole')
+
+
+@pytest.mark.parametrize('body, error', [
+    ({'operand1': [1, True], 'operand2': [1, 2]}, 'Invalid operand: True'),
+    ({'operand1': [1, 2], 'operand2': False}, 'Invalid operand: False'),
+    ({'operand1': [1, 'NaN'], 'operand2': 1}, "Invalid operand: 'NaN'"),
+    ({'operand1': [1, 2], 'operand2': [1]}, 'operand1 and operand2 arrays must have the same length'),
+    ({'operand1': [1, 2], 'operand2': [1, 0], 'operation': 'divide'}, 'Division by zero at index 1'),
+    ({'operand1': ['1e999999'], 'operand2': ['1e999999']}, 'Result out of range'),
+])
+def test_vector_errors_are_client_errors(aws, body, error):
+    body = {'operation': 'multiply', **body}
+
+    status, result = call('/calculate', body, groups=['DMrole'], permissions=PERMISSIONS)
+
+    assert (status, result) == (400, {'error': error})
+    assert aws.table('HISTORY_TABLE').scan()['Items'] == []
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+from aws_cdk import aws_lambda as _lambda
+
+from my_cdk_app.function_profiles import (
+    DEFAULT_PROFILES, function_props, invoke_target, profile_of, resolve_profiles
+)
+
+
+def test_overrides_apply_field_by_field_over_the_wildcard():
+    profiles = resolve_profiles(json.dumps({
+        "*": {"architecture": "x86_64"},
+        "CalculateLambda": {"reservedConcurrency": 10},
+        "NewLambda": {"memorySize": 128}
+    }))
+
+    assert profile_of(profiles, "CalculateLambda") == \
+        {"architecture": "x86_64", "memorySize": 1024, "reservedConcurrency": 10}
+    assert profile_of(profiles, "NewLambda") == {"architecture": "x86_64", "memorySize": 128}
+    assert profile_of(profiles, "Unprofiled") == {"architecture": "x86_64"}
+    # The defaults are copied, not changed
+    assert DEFAULT_PROFILES["CalculateLambda"] == {"memorySize": 1024}
+
+
+def test_function_props_map_profile_fields():
+    profiles = resolve_profiles({"AdminLambda": {"reservedConcurrency": 0}})
+
+    props = function_props(profiles, "AdminLambda")
+
+    assert props.pop("architecture").name == _lambda.Architecture.ARM_64.name
+    assert props == {"memory_size": 1024, "reserved_concurrent_executions": 0}
+    assert function_props({}, "AdminLambda") == {}
+
+
+@pytest.mark.parametrize("overrides", [
+    {"CalculateLambda": {"memorySize": 64}},
+    {"CalculateLambda": {"memory": 1024}},
+    {"*": {"architecture": "riscv"}},
+    {"CalculateLambda": {"provisionedConcurrency": -1}},
+    {"CalculateLambda": {"autoScaling": {"maxCapacity": 5}}},
+    {"CalculateLambda": {"provisionedConcurrency": 2, "autoScaling": {"minCapacity": 6, "maxCapacity": 5}}},
+    {"CalculateLambda": {"provisionedConcurrency": 2, "autoScaling": {
+        "maxCapacity": 5, "schedules": [{"name": "Night", "schedule": "cron(0 20 * * ? *)"}]}}},
+])
+def test_invalid_profiles_are_rejected(overrides):
+    with pytest.raises(ValueError):
+        resolve_profiles(overrides)
+
+
+def lambda_function(scope, construct_id):
+    return _lambda.Function(
+        scope, construct_id,
+        runtime=_lambda.Runtime.PYTHON_3_12,
+        handler="index.handler",
+        code=_lambda.Code.from_inline("def handler(event, context): pass")
+    )
+
+
+def test_callers_invoke_the_live_alias_only_with_provisioned_concurrency():
+    stack = core.Stack(core.App(), "Profiles")
+    profiles = resolve_profiles({"Provisioned": {"provisionedConcurrency": 3, "autoScaling": {"maxCapacity": 6}}})
+    plain = lambda_function(stack, "Plain")
+    provisioned = lambda_function(stack, "Provisioned")
+
+    assert invoke_target(profiles, plain) is plain
+    alias = invoke_target(profiles, provisioned)
+
+    assert alias.alias_name == "live"
+    template = assertions.Template.from_stack(stack)
+    template.resource_count_is("AWS::Lambda::Alias", 1)
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalableTarget", {
+        "MinCapacity": 3,
+        "MaxCapacity": 6
+    })
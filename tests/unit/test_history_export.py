@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+
+import boto3
+import pytest
+
+import history_export
+from history_export import EXPORT_BUCKET, start_export_job
+
+
+@pytest.fixture
+def exports(aws, monkeypatch):
+    """Jobs run in process; returns a function reading an export object back."""
+    monkeypatch.setattr(history_export, 'EXPORT_FUNCTION_NAME', 'local')
+    s3 = boto3.client('s3')
+
+    def read(key):
+        return s3.get_object(Bucket=EXPORT_BUCKET, Key=key)['Body'].read().decode('utf-8')
+    return read
+
+
+def seed(aws, users=('alice', 'bob'), count=5):
+    with aws.table('HISTORY_TABLE').batch_writer() as batch:
+        for user in users:
+            for index in range(count):
+                batch.put_item(Item={
+                    'userId': user,
+                    'timestamp': f'2024-01-0{index + 1}T00:00:00',
+                    'operand1': index, 'operand2': 2, 'operation': 'add', 'result': index + 2,
+                    'role_used': 'ASrole'
+                })
+
+
+def test_ndjson_export_holds_every_row(aws, exports):
+    seed(aws)
+
+    job = start_export_job({})
+
+    assert (job['status'], job['rows'], job['parts']) == ('complete', 10, 0)
+    rows = [json.loads(line) for line in exports(job['key']).splitlines()]
+    assert len(rows) == 10
+    assert {row['userId'] for row in rows} == {'alice', 'bob'}
+    assert history_export.get_export_job(job['jobId'])['url']
+
+
+def test_csv_export_applies_user_and_time_filters(aws, exports):
+    seed(aws)
+
+    job = start_export_job({'format': 'csv', 'userId': 'alice', 'from': '2024-01-02', 'to': '2024-01-04'})
+
+    rows = list(csv.DictReader(io.StringIO(exports(job['key']))))
+    assert job['rows'] == len(rows) == 2
+    assert {row['userId'] for row in rows} == {'alice'}
+    assert [row['timestamp'] for row in rows] == ['2024-01-02T00:00:00', '2024-01-03T00:00:00']
+    assert list(rows[0]) == history_export.CSV_COLUMNS
+
+
+def test_time_range_without_a_user_scans_every_user(aws, exports):
+    seed(aws)
+
+    job = start_export_job({'from': '2024-01-05'})
+
+    assert job['rows'] == 2
+    assert len(exports(job['key']).splitlines()) == 2
+
+
+def test_large_exports_are_sent_in_parts(aws, exports, monkeypatch):
+    import moto.s3.models
+
+    monkeypatch.setattr(moto.s3.models, 'S3_UPLOAD_PART_MIN_SIZE', 1)
+    monkeypatch.setattr(history_export, 'EXPORT_PART_SIZE', 300)
+    monkeypatch.setattr(history_export, 'EXPORT_PAGE_SIZE', 2)
+    seed(aws, count=9)
+
+    job = start_export_job({})
+
+    assert job['status'] == 'complete'
+    assert job['parts'] > 1
+    body = exports(job['key'])
+    assert len(body.encode('utf-8')) == job['bytes']
+    assert len(body.splitlines()) == job['rows'] == 18
+
+
+def failing_pages(filters):
+    yield [{'userId': 'alice', 'timestamp': 't', 'operation': 'add', 'result': 1}]
+    raise RuntimeError('table went away')
+
+
+def test_failed_export_aborts_the_upload(aws, exports, monkeypatch):
+    monkeypatch.setattr(history_export, 'EXPORT_PART_SIZE', 1)
+    monkeypatch.setattr(history_export, 'history_pages', failing_pages)
+    aborted = []
+    abort = history_export.MultipartWriter.abort
+    monkeypatch.setattr(history_export.MultipartWriter, 'abort',
+                        lambda writer: aborted.append(writer.upload_id) or abort(writer))
+
+    job = start_export_job({})
+
+    assert (job['status'], job['error'], job['rows']) == ('failed', 'table went away', 1)
+    # A part had been uploaded, and the upload is gone
+    assert aborted and aborted[0] is not None
+    assert boto3.client('s3').list_multipart_uploads(Bucket=EXPORT_BUCKET).get('Uploads', []) == []
+    assert history_export.get_export_job(job['jobId'])['status'] == 'failed'
+
+
+def test_duplicate_async_delivery_runs_the_job_once(aws, exports, monkeypatch):
+    seed(aws)
+    monkeypatch.setattr(history_export, 'EXPORT_FUNCTION_NAME', 'ExportFunction')
+    invocations = []
+
+    class LambdaClient:
+        def invoke(self, **kwargs):
+            invocations.append(kwargs)
+    monkeypatch.setattr(history_export, 'lambda_client', LambdaClient())
+
+    job = start_export_job({})
+    event = json.loads(invocations[0]['Payload'])
+    assert job['status'] == 'queued'
+
+    assert history_export.handler(event, None)['status'] == 'complete'
+    monkeypatch.setattr(history_export, 'run_export', lambda job, context=None: pytest.fail('ran twice'))
+    assert history_export.handler(event, None)['status'] == 'complete'
+    assert history_export.handler({'jobId': 'missing'}, None) is None
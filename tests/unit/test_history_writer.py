@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+import calculate_handler
+import history_store
+import history_writer
+from tests.benchmarks.load import api_event
+
+CLAIMS = {'sub': 'user-1', 'cognito:groups': 'ASrole',
+          'role_permissions': json.dumps({'ASrole': ['add', 'subtract']})}
+
+
+@pytest.fixture
+def queue(aws, monkeypatch):
+    """Write-behind mode on the in-process queue."""
+    monkeypatch.setattr(history_store, 'HISTORY_WRITE_MODE', 'queue')
+    monkeypatch.setattr(history_store, 'HISTORY_QUEUE_URL', 'local')
+    monkeypatch.setattr(history_store, '_queue', None)
+    return history_store.get_history_queue()
+
+
+def calculate(operand1, operand2):
+    body = {'operand1': operand1, 'operand2': operand2, 'operation': 'add'}
+    result = calculate_handler.handler(api_event('/calculate', 'POST', CLAIMS, body), None)
+    assert result['statusCode'] == 200
+    return json.loads(result['body'])
+
+
+def recent(aws):
+    item = aws.table('RECENT_TABLE').get_item(Key={'userId': 'user-1'}).get('Item') or {}
+    return [entry['timestamp'] for entry in item.get('entries', [])]
+
+
+def test_enqueued_rows_land_in_the_table(aws, queue):
+    first = calculate(1, 2)
+    second = calculate(3, 4)
+
+    # Nothing is written until the queue is drained; the response still shows the new row
+    assert aws.table('HISTORY_TABLE').scan()['Items'] == []
+    assert second['history'][0]['result'] == '7'
+
+    event = queue.drain()
+    assert history_writer.handler(event, None) == {'batchItemFailures': []}
+
+    rows = aws.table('HISTORY_TABLE').scan()['Items']
+    assert sorted(str(row['result']) for row in rows) == ['3', '7']
+    assert recent(aws) == [second['history'][0]['timestamp'], first['history'][0]['timestamp']]
+
+
+def test_redelivered_messages_do_not_duplicate_recent_entries(aws, queue):
+    calculate(1, 2)
+    calculate(3, 4)
+    event = queue.drain()
+
+    history_writer.handler(event, None)
+    before = recent(aws)
+    # SQS delivers at least once: the same records again, alone and with a new row
+    history_writer.handler(event, None)
+    calculate(5, 6)
+    history_writer.handler({'Records': event['Records'] + queue.drain()['Records']}, None)
+
+    assert len(aws.table('HISTORY_TABLE').scan()['Items']) == 3
+    after = recent(aws)
+    assert after[1:] == before
+    assert len(after) == len(set(after)) == 3
+
+
+def test_undecodable_messages_are_reported_for_redelivery(aws, queue):
+    calculate(1, 2)
+    event = queue.drain()
+    event['Records'].append({'messageId': 'broken', 'body': 'not json'})
+
+    assert history_writer.handler(event, None) == {'batchItemFailures': [{'itemIdentifier': 'broken'}]}
+    assert len(aws.table('HISTORY_TABLE').scan()['Items']) == 1
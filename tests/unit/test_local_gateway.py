@@ -0,0 +1,113 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+
+from tools.local_gateway import CORS_HEADERS, Gateway, TokenError, authorizer_claims, issue_token, verify_token
+
+SECRET = 'test-secret'
+CLAIMS = {'sub': 'u1', 'cognito:username': 'alice', 'cognito:groups': ['ASrole', 'DMrole']}
+
+
+def encode(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).rstrip(b'=').decode()
+
+
+def signed(header, payload, secret=SECRET):
+    signing_input = f'{encode(header)}.{encode(payload)}'
+    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{base64.urlsafe_b64encode(signature).rstrip(b'=').decode()}"
+
+
+def test_issued_tokens_verify_to_their_claims():
+    claims = verify_token(SECRET, issue_token(SECRET, CLAIMS))
+
+    assert {name: claims[name] for name in CLAIMS} == CLAIMS
+    assert claims['token_use'] == 'id'
+
+
+@pytest.mark.parametrize('token, error', [
+    (issue_token('other-secret', CLAIMS), 'Bad signature'),
+    (signed({'alg': 'none'}, dict(CLAIMS, token_use='id', exp=time.time() + 60)), 'Unsupported algorithm'),
+    (issue_token(SECRET, CLAIMS, ttl=-1), 'Token expired'),
+    (signed({'alg': 'HS256'}, dict(CLAIMS, token_use='access', exp=time.time() + 60)), 'Not an ID token'),
+    (signed({'alg': 'HS256'}, ['not', 'claims']), 'Malformed token'),
+    (signed([], {}), 'Unsupported algorithm'),
+    ('', 'Malformed token'),
+    ('a.b', 'Malformed token'),
+    ('not.base64!.json', 'Malformed token'),
+])
+def test_invalid_tokens_are_rejected(token, error):
+    with pytest.raises(TokenError, match=error):
+        verify_token(SECRET, token)
+
+
+def test_claims_reach_the_handler_as_strings():
+    assert authorizer_claims({'sub': 'u1', 'cognito:groups': ['ASrole', 'DMrole'], 'exp': 5, 'email_verified': True}) == \
+        {'sub': 'u1', 'cognito:groups': 'ASrole,DMrole', 'exp': '5', 'email_verified': 'true'}
+
+
+@pytest.fixture
+def gateway():
+    """A gateway whose calculate_handler records its events."""
+    events = []
+
+    def handler(event, context):
+        events.append(event)
+        return {'statusCode': 200, 'headers': {'X-Handler': context.function_name}, 'body': '{"ok": true}'}
+    gateway = Gateway(SECRET, workers=1)
+    gateway.handlers['calculate_handler'] = handler
+    gateway.events = events
+    yield gateway
+    gateway.executor.shutdown()
+
+
+def dispatch(gateway, method, target, headers=None, body=b''):
+    return asyncio.run(gateway.dispatch(method, target, headers or {}, body))
+
+
+def test_requests_become_proxy_events(gateway):
+    token = issue_token(SECRET, CLAIMS)
+
+    status, headers, body = dispatch(gateway, 'POST', '/calculate/?includeHistory=false&x=',
+                                     {'authorization': token}, b'{"operation": "add"}')
+
+    assert (status, headers, json.loads(body)) == (200, {'X-Handler': 'calculate_handler'}, {'ok': True})
+    event, = gateway.events
+    assert {key: event[key] for key in ('resource', 'path', 'httpMethod', 'queryStringParameters', 'body')} == {
+        'resource': '/calculate',
+        'path': '/calculate',
+        'httpMethod': 'POST',
+        'queryStringParameters': {'includeHistory': 'false', 'x': ''},
+        'body': '{"operation": "add"}'
+    }
+    context = event['requestContext']
+    assert (context['resourcePath'], context['httpMethod']) == ('/calculate', 'POST')
+    assert context['authorizer']['claims']['cognito:groups'] == 'ASrole,DMrole'
+
+
+@pytest.mark.parametrize('method, target', [('GET', '/calculate'), ('POST', '/unknown')])
+def test_unknown_routes_and_methods_are_forbidden(gateway, method, target):
+    status, _, body = dispatch(gateway, method, target, {'authorization': issue_token(SECRET, CLAIMS)})
+
+    assert (status, json.loads(body)) == (403, {'message': 'Missing Authentication Token'})
+    assert gateway.events == []
+
+
+@pytest.mark.parametrize('headers', [{}, {'authorization': 'Bearer nonsense'},
+                                     {'authorization': issue_token('other-secret', CLAIMS)}])
+def test_requests_without_a_valid_token_are_unauthorized(gateway, headers):
+    status, _, body = dispatch(gateway, 'POST', '/calculate', headers)
+
+    assert (status, json.loads(body)) == (401, {'message': 'Unauthorized'})
+    assert gateway.events == []
+
+
+def test_preflight_is_answered_without_a_token(gateway):
+    assert dispatch(gateway, 'OPTIONS', '/admin/users') == (204, CORS_HEADERS, b'')
+    # Only for known paths
+    assert dispatch(gateway, 'OPTIONS', '/unknown')[0] == 403
@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+import metrics
+from metrics import MemorySink, instrument, phase, set_dimension
+
+
+@pytest.fixture
+def sink():
+    memory = MemorySink()
+    previous = metrics.set_sink(memory)
+    yield memory
+    metrics.set_sink(previous)
+
+
+def test_invocation_is_emitted_as_one_emf_record(sink):
+    @instrument('calculate_handler', enabled=True)
+    def handler(event, context):
+        set_dimension('Operation', 'add')
+        with phase('compute'):
+            pass
+        with phase('compute'):
+            pass
+        return 'ok'
+
+    assert handler({'httpMethod': 'POST', 'resource': '/calculate'}, None) == 'ok'
+    handler({'triggerSource': 'TokenGeneration_Authentication'}, None)
+
+    first, second = sink.records
+    emf = first['_aws']['CloudWatchMetrics'][0]
+    assert emf['Namespace'] == 'CalculatorApp'
+    assert emf['Dimensions'] == metrics.DIMENSION_SETS
+    assert [metric['Name'] for metric in emf['Metrics']] == ['compute', 'total']
+    assert {key: first[key] for key in ('Function', 'Route', 'Operation')} == \
+        {'Function': 'calculate_handler', 'Route': 'POST /calculate', 'Operation': 'add'}
+    assert 0 <= first['compute'] <= first['total']
+    assert (second['Route'], second['Start']) == ('TokenGeneration_Authentication', 'warm')
+
+
+def test_record_is_emitted_when_the_handler_raises(sink):
+    @instrument('admin_handler', enabled=True)
+    def handler(event, context):
+        with phase('scan'):
+            raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        handler({}, None)
+
+    record, = sink.records
+    assert 'scan' in record and 'total' in record
+    assert phase('outside') is metrics._NOOP
+
+
+def test_concurrent_invocations_keep_their_own_phases(sink):
+    barrier = threading.Barrier(4)
+
+    @instrument('calculate_handler', enabled=True)
+    def handler(event, context):
+        set_dimension('Operation', event['name'])
+        # All four invocations are in flight at once
+        barrier.wait()
+        with phase(event['name']):
+            barrier.wait()
+        return event['name']
+
+    threads = [threading.Thread(target=handler, args=({'name': f'op{index}'}, None)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(sink.records) == 4
+    for record in sink.records:
+        phases = [metric['Name'] for metric in record['_aws']['CloudWatchMetrics'][0]['Metrics']]
+        assert phases == [record['Operation'], 'total']
@@ -1,7 +1,23 @@
+import pytest
+
 import aws_cdk as core
 import aws_cdk.assertions as assertions
 
+from my_cdk_app.lambda_bundles import module_closure
 from my_cdk_app.my_cdk_app_stack import MyCdkAppStack
+from my_cdk_app.routes import API_ROUTES
+
+
+def synth(context=None):
+    app = core.App(context=context)
+    return assertions.Template.from_stack(MyCdkAppStack(app, "my-cdk-app"))
+
+
+@pytest.fixture(scope="module")
+def template():
+    """The stack with default context, synthesized once for the module."""
+    return synth()
+
 
 # example tests. To run these tests, uncomment this file along with the example
 # resource in my_cdk_app/my_cdk_app_stack.py
@@ -13,3 +29,310 @@ def test_sqs_queue_created():
 #     template.has_resource_properties("AWS::SQS::Queue", {
 #         "VisibilityTimeout": 300
 #     })
+
+
+def test_calculate_lambda_caches_role_permissions(template):
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "calculate_handler.handler",
+        "Environment": {
+            "Variables": assertions.Match.object_like({
+                "ROLES_CACHE_TTL_SECONDS": "60"
+            })
+        }
+    })
+
+
+def test_user_pool_resolves_permissions_at_token_generation(template):
+    template.has_resource_properties("AWS::Cognito::UserPool", {
+        "LambdaConfig": assertions.Match.object_like({
+            "PreTokenGeneration": assertions.Match.any_value()
+        })
+    })
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "pre_token_generation.handler"
+    })
+
+
+def test_calculate_batch_route_exists(template):
+    template.has_resource_properties("AWS::ApiGateway::Resource", {
+        "PathPart": "batch"
+    })
+
+
+def test_history_route_exists(template):
+    template.has_resource_properties("AWS::ApiGateway::Resource", {
+        "PathPart": "history"
+    })
+
+
+def test_calculate_lambda_maintains_recent_history(template):
+    template.resource_count_is("AWS::DynamoDB::Table", 6)
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "calculate_handler.handler",
+        "Environment": {
+            "Variables": assertions.Match.object_like({
+                "RECENT_TABLE": assertions.Match.any_value()
+            })
+        }
+    })
+
+
+def test_history_write_behind_is_opt_in(template):
+    # Only the usage stats DLQ and the OTP queue and its DLQ
+    template.resource_count_is("AWS::SQS::Queue", 3)
+
+
+def test_history_write_behind_queue_and_consumer():
+    template = synth({"historyWriteMode": "queue"})
+
+    # Write-behind queue and its DLQ, plus the usage stats and OTP queues
+    template.resource_count_is("AWS::SQS::Queue", 5)
+    template.has_resource_properties("AWS::Lambda::EventSourceMapping", {
+        "FunctionResponseTypes": ["ReportBatchItemFailures"]
+    })
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "calculate_handler.handler",
+        "Environment": {
+            "Variables": assertions.Match.object_like({
+                "HISTORY_WRITE_MODE": "queue"
+            })
+        }
+    })
+
+
+def test_each_function_gets_its_own_bundle(template):
+    functions = template.find_resources("AWS::Lambda::Function", {
+        "Properties": {"Code": {"S3Key": assertions.Match.any_value()}}
+    })
+    handlers = {props["Properties"]["Handler"] for props in functions.values()}
+    assets = {props["Properties"]["Code"]["S3Key"] for props in functions.values()}
+    assert len(assets) == len(handlers)
+
+    assert module_closure("define_auth_challenge") == {"define_auth_challenge", "metrics", "structured_log"}
+    assert {"api_response", "expression", "aws_clients"} <= module_closure("calculate_handler")
+    assert "expression" not in module_closure("admin_handler")
+
+
+def test_users_directory_table_and_reconcile_schedule(template):
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "KeySchema": [{"AttributeName": "username", "KeyType": "HASH"}]
+    })
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "admin_handler.handler",
+        "Environment": {
+            "Variables": assertions.Match.object_like({
+                "USERS_TABLE": assertions.Match.any_value()
+            })
+        }
+    })
+    template.has_resource_properties("AWS::Events::Rule", {
+        "ScheduleExpression": "rate(6 hours)"
+    })
+
+
+def test_admin_bulk_users_route_exists(template):
+    template.has_resource_properties("AWS::ApiGateway::Resource", {
+        "PathPart": "bulk"
+    })
+
+
+def test_api_methods_come_from_route_table(template):
+    methods = template.find_resources("AWS::ApiGateway::Method", {
+        "Properties": {"AuthorizationType": "COGNITO_USER_POOLS"}
+    })
+    assert len(methods) == len(API_ROUTES)
+
+
+def test_handlers_emit_phase_metrics(template):
+    for handler in ["calculate_handler.handler", "admin_handler.handler", "create_auth_challenge.handler"]:
+        template.has_resource_properties("AWS::Lambda::Function", {
+            "Handler": handler,
+            "Environment": {
+                "Variables": assertions.Match.object_like({
+                    "METRICS_ENABLED": "true"
+                })
+            }
+        })
+
+
+def test_cognito_triggers_fail_fast_on_slow_aws_calls(template):
+    functions = template.find_resources("AWS::Lambda::Function")
+    variables = {
+        function["Properties"]["Handler"]: function["Properties"].get("Environment", {}).get("Variables", {})
+        for function in functions.values()
+    }
+    for trigger in ["post_confirmation_handler", "define_auth_challenge", "create_auth_challenge",
+                    "verify_auth_challenge", "pre_token_generation"]:
+        assert variables[f"{trigger}.handler"]["AWS_MAX_ATTEMPTS"] == "2"
+        assert float(variables[f"{trigger}.handler"]["AWS_CONNECT_TIMEOUT"]) < 1
+        assert float(variables[f"{trigger}.handler"]["AWS_READ_TIMEOUT"]) < 2
+    # The API handlers' worst case (every attempt timing out, plus the standard
+    # backoff of up to 2^n seconds between attempts) stays under API Gateway's 29s
+    for handler in ["calculate_handler.handler", "admin_handler.handler"]:
+        attempts = int(variables[handler]["AWS_MAX_ATTEMPTS"])
+        per_attempt = float(variables[handler]["AWS_CONNECT_TIMEOUT"]) + float(variables[handler]["AWS_READ_TIMEOUT"])
+        assert attempts * per_attempt + sum(2 ** n for n in range(attempts - 1)) < 29
+
+
+def test_log_level_can_be_set_per_function():
+    template = synth({"logLevels": {"AdminLambda": "DEBUG"}})
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "admin_handler.handler",
+        "Environment": {
+            "Variables": assertions.Match.object_like({"LOG_LEVEL": "DEBUG"})
+        }
+    })
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "verify_auth_challenge.handler",
+        "Environment": {
+            "Variables": assertions.Match.object_like({"LOG_LEVEL": "INFO"})
+        }
+    })
+
+
+def test_history_export_bucket_and_job_lambda(template):
+    template.resource_count_is("AWS::S3::Bucket", 1)
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "history_export.handler",
+        "Timeout": 900
+    })
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "admin_handler.handler",
+        "Environment": {
+            "Variables": assertions.Match.object_like({
+                "EXPORT_BUCKET": assertions.Match.any_value(),
+                "EXPORT_FUNCTION_NAME": assertions.Match.any_value()
+            })
+        }
+    })
+    template.has_resource_properties("AWS::ApiGateway::Resource", {
+        "PathPart": "export"
+    })
+
+
+def test_usage_stats_consume_history_stream(template):
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "StreamSpecification": {"StreamViewType": "NEW_IMAGE"}
+    })
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "KeySchema": [
+            {"AttributeName": "bucket", "KeyType": "HASH"},
+            {"AttributeName": "scope", "KeyType": "RANGE"}
+        ],
+        "TimeToLiveSpecification": {"AttributeName": "expiresAt", "Enabled": True}
+    })
+    template.has_resource_properties("AWS::Lambda::EventSourceMapping", {
+        "StartingPosition": "TRIM_HORIZON",
+        "FilterCriteria": {"Filters": [{"Pattern": '{"eventName":["INSERT"]}'}]}
+    })
+    template.has_resource_properties("AWS::ApiGateway::Resource", {
+        "PathPart": "stats"
+    })
+
+
+def test_history_indexes_by_operation_and_role(template):
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "GlobalSecondaryIndexes": [
+            assertions.Match.object_like({
+                "IndexName": "ByOperation",
+                "KeySchema": [
+                    {"AttributeName": "operation", "KeyType": "HASH"},
+                    {"AttributeName": "timestamp", "KeyType": "RANGE"}
+                ]
+            }),
+            assertions.Match.object_like({
+                "IndexName": "ByRole",
+                "KeySchema": [
+                    {"AttributeName": "role_used", "KeyType": "HASH"},
+                    {"AttributeName": "timestamp", "KeyType": "RANGE"}
+                ]
+            })
+        ]
+    })
+
+
+def test_otp_delivery_queue_and_rate_limit(template):
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "create_auth_challenge.handler",
+        "Environment": {
+            "Variables": assertions.Match.object_like({
+                "OTP_QUEUE_URL": assertions.Match.any_value(),
+                "OTP_RATE_TABLE": assertions.Match.any_value()
+            })
+        }
+    })
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "otp_sender.handler"
+    })
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "KeySchema": [{"AttributeName": "key", "KeyType": "HASH"}],
+        "TimeToLiveSpecification": {"AttributeName": "expiresAt", "Enabled": True}
+    })
+    template.has_resource_properties("AWS::SQS::Queue", {
+        "MessageRetentionPeriod": 600,
+        "SqsManagedSseEnabled": True
+    })
+
+
+def test_function_profiles_default_to_arm64_with_per_function_memory(template):
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "calculate_handler.handler",
+        "Architectures": ["arm64"],
+        "MemorySize": 1024
+    })
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "define_auth_challenge.handler",
+        "Architectures": ["arm64"],
+        "MemorySize": 256
+    })
+    template.resource_count_is("AWS::Lambda::Alias", 0)
+
+
+def test_function_profiles_from_context():
+    template = synth({"functionProfiles": {
+        "CalculateLambda": {
+            "memorySize": 2048,
+            "reservedConcurrency": 20,
+            "provisionedConcurrency": 2,
+            "autoScaling": {
+                "maxCapacity": 10,
+                "utilization": 0.7,
+                "schedules": [{"name": "BusinessHours", "schedule": "cron(0 8 ? * MON-FRI *)", "minCapacity": 5}]
+            }
+        },
+        "VerifyAuthChallengeLambda": {"architecture": "x86_64", "provisionedConcurrency": 1}
+    }})
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "calculate_handler.handler",
+        "MemorySize": 2048,
+        "ReservedConcurrentExecutions": 20
+    })
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "verify_auth_challenge.handler",
+        "Architectures": ["x86_64"]
+    })
+    template.resource_count_is("AWS::Lambda::Alias", 2)
+    template.has_resource_properties("AWS::Lambda::Alias", {
+        "Name": "live",
+        "ProvisionedConcurrencyConfig": {"ProvisionedConcurrentExecutions": 2}
+    })
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalableTarget", {
+        "MinCapacity": 2,
+        "MaxCapacity": 10,
+        "ScheduledActions": [assertions.Match.object_like({
+            "Schedule": "cron(0 8 ? * MON-FRI *)",
+            "ScalableTargetAction": {"MinCapacity": 5}
+        })]
+    })
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalingPolicy", {
+        "TargetTrackingScalingPolicyConfiguration": assertions.Match.object_like({"TargetValue": 0.7})
+    })
+
+
+def test_function_profiles_reject_invalid_settings():
+    with pytest.raises(ValueError):
+        synth({"functionProfiles": {
+            "CalculateLambda": {"provisionedConcurrency": 5, "reservedConcurrency": 2}
+        }})
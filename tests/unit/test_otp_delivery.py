@@ -0,0 +1,112 @@
+import json
+from types import SimpleNamespace
+
+import boto3
+import pytest
+
+import create_auth_challenge
+import otp_delivery
+import otp_sender
+import verify_auth_challenge
+from otp_delivery import OTP_RATE_LIMIT, OTP_RATE_WINDOW_SECONDS, OtpRateLimited, check_send_rate
+
+PHONE = '+15550100123'
+
+
+@pytest.fixture
+def otp(aws, monkeypatch):
+    """Rate limit table on moto, local queue and outbox; returns (queue, sender)."""
+    boto3.client('dynamodb').create_table(
+        TableName='OtpRateLimitTable',
+        KeySchema=[{'AttributeName': 'key', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'key', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    monkeypatch.setattr(otp_delivery, 'OTP_RATE_TABLE', 'OtpRateLimitTable')
+    monkeypatch.setattr(otp_delivery, 'OTP_QUEUE_URL', 'local')
+    monkeypatch.setattr(otp_delivery, 'OTP_SMS_MODE', 'local')
+    monkeypatch.setattr(otp_delivery, '_queue', None)
+    monkeypatch.setattr(otp_delivery, '_sender', None)
+    sender = otp_delivery.get_sms_sender()
+    monkeypatch.setattr(otp_sender, 'sender', sender)
+    return otp_delivery.get_otp_queue(), sender
+
+
+def challenge_event(phone=PHONE):
+    return {
+        'userName': 'alice',
+        'request': {'challengeName': 'CUSTOM_CHALLENGE', 'userAttributes': {'phone_number': phone}},
+        'response': {}
+    }
+
+
+def verify_event(answer, challenge_answer):
+    return {
+        'userName': 'alice',
+        'request': {'privateChallengeParameters': {'answer': answer}, 'challengeAnswer': challenge_answer},
+        'response': {}
+    }
+
+
+def test_resends_are_limited_per_phone_and_window(otp):
+    window = 1_700_000_100 - 1_700_000_100 % OTP_RATE_WINDOW_SECONDS
+
+    for _ in range(OTP_RATE_LIMIT):
+        check_send_rate(PHONE, now=window)
+    with pytest.raises(OtpRateLimited):
+        check_send_rate(PHONE, now=window + OTP_RATE_WINDOW_SECONDS - 1)
+
+    # Other numbers have their own count, and the next window starts over
+    check_send_rate('+15550100999', now=window)
+    check_send_rate(PHONE, now=window + OTP_RATE_WINDOW_SECONDS)
+
+
+def test_limited_sign_in_fails_without_sending(otp, monkeypatch):
+    queue, _ = otp
+    # Every attempt in the same window
+    monkeypatch.setattr(otp_delivery, 'time', SimpleNamespace(time=lambda: 1_700_000_100))
+    for _ in range(OTP_RATE_LIMIT):
+        create_auth_challenge.handler(challenge_event(), None)
+
+    with pytest.raises(OtpRateLimited):
+        create_auth_challenge.handler(challenge_event(), None)
+
+    assert len(queue.messages) == OTP_RATE_LIMIT
+
+
+def test_code_is_queued_sent_and_verified(otp):
+    queue, sender = otp
+
+    event = create_auth_challenge.handler(challenge_event(), None)
+    answer = event['response']['privateChallengeParameters']['answer']
+
+    assert event['response']['publicChallengeParameters'] == {'phone': PHONE[-4:]}
+    # Nothing goes out until the sender drains the queue
+    assert sender.sent == []
+    assert otp_sender.handler(queue.drain(), None) == {'batchItemFailures': []}
+    assert sender.sent == [{'phone_number': PHONE, 'message': otp_delivery.otp_message(answer)}]
+
+    assert verify_auth_challenge.handler(verify_event(answer, answer), None)['response']['answerCorrect'] is True
+
+
+@pytest.mark.parametrize('answer, challenge_answer', [
+    ('123456', '654321'), ('123456', '12345'), ('', ''),
+    # Full-width digits: not the code, and not an error either
+    ('123456', '１２３４５６')
+])
+def test_wrong_code_is_rejected(answer, challenge_answer):
+    result = verify_auth_challenge.handler(verify_event(answer, challenge_answer), None)
+
+    assert result['response']['answerCorrect'] is False
+
+
+def test_expired_and_broken_messages(otp):
+    queue, sender = otp
+    queue.send(json.dumps({'phone_number': PHONE, 'otp': '123456', 'expires_at': 0}))
+    queue.send('not json')
+    event = queue.drain()
+
+    result = otp_sender.handler(event, None)
+
+    assert sender.sent == []
+    assert result == {'batchItemFailures': [{'itemIdentifier': event['Records'][1]['messageId']}]}
@@ -0,0 +1,26 @@
+import boto3
+import pytest
+
+import post_confirmation_handler
+
+
+def confirm(aws, username, role):
+    cognito = boto3.client('cognito-idp')
+    cognito.admin_create_user(UserPoolId=aws.user_pool_id, Username=username)
+    event = {
+        'userPoolId': aws.user_pool_id,
+        'userName': username,
+        'request': {'userAttributes': {'email': f'{username}@example.com', 'custom:role': role}}
+    }
+    assert post_confirmation_handler.handler(event, None) == event
+    groups = cognito.admin_list_groups_for_user(UserPoolId=aws.user_pool_id, Username=username)['Groups']
+    item = aws.table('USERS_TABLE').get_item(Key={'username': username})['Item']
+    return [group['GroupName'] for group in groups], item
+
+
+@pytest.mark.parametrize('requested, assigned', [('DMrole', 'DMrole'), ('AdminRole', 'ASrole'), ('', 'ASrole')])
+def test_directory_records_the_assigned_role(aws, requested, assigned):
+    groups, item = confirm(aws, 'alice', requested)
+
+    assert groups == [assigned]
+    assert (item['role'], item['groups'], item['email']) == (assigned, [assigned], 'alice@example.com')
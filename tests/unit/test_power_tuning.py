@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from my_cdk_app.function_profiles import DEFAULT_PROFILES
+from tools import power_tuning
+from tools.power_tuning import (
+    FUNCTION_IDS, GB_SECOND_PRICE, REQUEST_PRICE_PER_MILLION, cost_per_million, estimate, recommend, split_time,
+    sweep
+)
+
+
+def call(cpu_ms, wall_ms):
+    return {'cpu_ms': cpu_ms, 'wall_ms': wall_ms}
+
+
+def measurement(cpu_ms=50.0, io_ms=20.0, rss_mb=100.0):
+    return {'init': call(300.0, 400.0), 'calls': [call(cpu_ms, cpu_ms + io_ms)] * 3, 'rss_mb': rss_mb}
+
+
+def test_every_tuned_handler_has_a_profile():
+    assert set(FUNCTION_IDS.values()) <= set(DEFAULT_PROFILES)
+
+
+def test_time_is_split_into_median_cpu_and_io():
+    assert split_time([call(10, 15), call(20, 30), call(30, 70)]) == (20, 10)
+    # Wall time below CPU time (several threads) is no I/O, not negative
+    assert split_time([call(10, 8)]) == (10, 0.0)
+
+
+def test_cpu_time_shrinks_with_memory_up_to_a_full_vcpu():
+    assert estimate(10, 5, 1769, 1.0) == 15
+    assert estimate(10, 5, 3008, 1.0) == 15
+    assert estimate(10, 5, 1769 / 2, 1.0) == 25
+    assert estimate(10, 5, 1769, 2.0) == 25
+
+
+def test_cost_is_billed_per_started_millisecond():
+    one_ms = 1 / 1000 * GB_SECOND_PRICE['arm64'] * 1_000_000 + REQUEST_PRICE_PER_MILLION
+
+    assert cost_per_million(0.2, 1024, 'arm64') == pytest.approx(one_ms)
+    assert cost_per_million(1.0, 1024, 'arm64') == pytest.approx(one_ms)
+    assert cost_per_million(1.01, 1024, 'arm64') > one_ms
+    assert cost_per_million(1.0, 1024, 'x86_64') > one_ms
+
+
+def test_sweep_skips_sizes_below_the_peak_rss():
+    rows = sweep(measurement(rss_mb=300), [128, 256, 512, 1769, 3008], 'arm64', 1.0)
+
+    # 300 MB plus headroom
+    assert [row['memory_mb'] for row in rows] == [512, 1769, 3008]
+    durations = [row['duration_ms'] for row in rows]
+    assert durations[0] > durations[1] == durations[2]
+    assert rows[1]['cost'] < rows[2]['cost']
+
+
+ROWS = [
+    {'memory_mb': 256, 'duration_ms': 400.0, 'cost': 2.0},
+    {'memory_mb': 512, 'duration_ms': 200.0, 'cost': 1.9},
+    {'memory_mb': 1024, 'duration_ms': 110.0, 'cost': 2.5},
+    {'memory_mb': 1769, 'duration_ms': 100.4, 'cost': 3.1},
+    {'memory_mb': 3008, 'duration_ms': 100.2, 'cost': 5.0},
+]
+
+
+@pytest.mark.parametrize('strategy, tolerance, memory_mb', [
+    ('cost', 0.2, 512),
+    # 100.4 and 100.2 ms both bill as 101 ms: the cheaper one wins
+    ('speed', 0.2, 1769),
+    ('balanced', 0.2, 1024),
+    ('balanced', 0.0, 1769),
+])
+def test_recommendation_per_strategy(strategy, tolerance, memory_mb):
+    assert recommend(ROWS, strategy, tolerance)['memory_mb'] == memory_mb
+
+
+def test_nothing_is_recommended_when_no_size_fits():
+    assert recommend([], 'balanced', 0.2) is None
+
+
+def test_main_prints_profiles_for_the_recommended_sizes(monkeypatch, capsys):
+    measurements = {
+        'calculate_handler': measurement(cpu_ms=200.0, io_ms=5.0),
+        'verify_auth_challenge': measurement(rss_mb=4000)
+    }
+    monkeypatch.setattr(power_tuning, 'run', lambda handlers, invocations: {name: measurements[name] for name in handlers})
+
+    assert power_tuning.main(['--handlers', 'calculate_handler', 'verify_auth_challenge',
+                              '--strategy', 'speed', '--sizes', '512,1769,3008']) == 0
+
+    out = capsys.readouterr().out
+    assert 'no size fits' in out
+    snippet = out.split('Recommended functionProfiles (cdk.json context):')[1]
+    assert json.loads(snippet) == {'CalculateLambda': {'memorySize': 1769, 'architecture': 'arm64'}}
@@ -0,0 +1,70 @@
+from recent_history import RECENT_HISTORY_SIZE, history_entry, push_recent_history
+
+
+def row(index, user_id='user-1'):
+    return {
+        'userId': user_id,
+        'timestamp': f'2024-01-01T00:{index // 60:02d}:{index % 60:02d}',
+        'operand1': 1, 'operand2': index, 'operation': 'add', 'result': 1 + index
+    }
+
+
+def entries(*indexes):
+    """Recent-list entries for the given row indexes, newest first."""
+    return [history_entry(row(index)) for index in sorted(indexes, reverse=True)]
+
+
+def stored(aws, user_id='user-1'):
+    return aws.table('RECENT_TABLE').get_item(Key={'userId': user_id})['Item']['entries']
+
+
+def timestamps(recent):
+    return [entry['timestamp'] for entry in recent]
+
+
+def test_first_write_backfills_older_history(aws):
+    with aws.table('HISTORY_TABLE').batch_writer() as batch:
+        for index in range(3):
+            batch.put_item(Item=row(index))
+
+    recent = push_recent_history('user-1', entries(5))
+
+    assert timestamps(recent) == timestamps(entries(5, 2, 1, 0))
+    assert stored(aws) == recent
+
+
+def test_an_emptied_list_is_not_backfilled_again(aws):
+    aws.table('HISTORY_TABLE').put_item(Item=row(0))
+    aws.table('RECENT_TABLE').put_item(Item={'userId': 'user-1', 'entries': []})
+
+    assert timestamps(push_recent_history('user-1', entries(5))) == timestamps(entries(5))
+
+
+def test_redelivered_entries_are_not_appended_twice(aws):
+    push_recent_history('user-1', entries(1, 2))
+    push_recent_history('user-1', entries(3))
+
+    recent = push_recent_history('user-1', entries(2, 3))
+
+    assert timestamps(recent) == timestamps(entries(1, 2, 3))
+    assert timestamps(stored(aws)) == timestamps(entries(1, 2, 3))
+
+
+def test_out_of_order_entries_are_merged_by_timestamp(aws):
+    push_recent_history('user-1', entries(1, 4))
+
+    recent = push_recent_history('user-1', entries(2, 5))
+
+    assert timestamps(recent) == timestamps(entries(1, 2, 4, 5))
+
+
+def test_list_is_trimmed_once_it_doubles(aws):
+    for index in range(2 * RECENT_HISTORY_SIZE - 1):
+        recent = push_recent_history('user-1', entries(index))
+        assert len(recent) == min(index + 1, RECENT_HISTORY_SIZE)
+    assert len(stored(aws)) == 2 * RECENT_HISTORY_SIZE - 1
+
+    recent = push_recent_history('user-1', entries(2 * RECENT_HISTORY_SIZE))
+
+    assert timestamps(stored(aws)) == timestamps(recent)
+    assert len(recent) == RECENT_HISTORY_SIZE
@@ -0,0 +1,92 @@
+import role_permissions
+from role_permissions import (
+    DEFAULT_ROLE_PERMISSIONS, ROLES_VERSION_KEY, RoleIndex, bump_roles_version,
+    get_role_index, get_role_permissions
+)
+
+
+def put_role(aws, name, permissions):
+    aws.table('ROLES_TABLE').put_item(Item={'roleName': name, 'permissions': permissions, 'isDefault': False})
+
+
+def expire_cache():
+    role_permissions._cache['expires_at'] = 0.0
+
+
+def bump_elsewhere(aws):
+    """A version bump made by another container: the local cache only expires."""
+    aws.table('ROLES_TABLE').update_item(
+        Key={'roleName': ROLES_VERSION_KEY},
+        UpdateExpression='ADD #version :one',
+        ExpressionAttributeNames={'#version': 'version'},
+        ExpressionAttributeValues={':one': 1}
+    )
+    expire_cache()
+
+
+def test_custom_roles_are_merged_with_the_defaults(aws):
+    put_role(aws, 'Adder', ['add'])
+
+    permissions = get_role_permissions()
+
+    assert permissions['Adder'] == ['add']
+    assert permissions['ASrole'] == DEFAULT_ROLE_PERMISSIONS['ASrole']
+    assert ROLES_VERSION_KEY not in permissions
+
+
+def test_cache_is_served_until_it_expires(aws):
+    get_role_permissions()
+    put_role(aws, 'Adder', ['add'])
+    aws.table('ROLES_TABLE').put_item(Item={'roleName': ROLES_VERSION_KEY, 'version': 1})
+
+    assert 'Adder' not in get_role_permissions()
+
+    expire_cache()
+    assert get_role_permissions()['Adder'] == ['add']
+
+
+def test_refresh_skips_the_scan_while_the_version_is_unchanged(aws):
+    get_role_permissions()
+    # Written without bumping the version
+    put_role(aws, 'Adder', ['add'])
+
+    expire_cache()
+    assert 'Adder' not in get_role_permissions()
+
+    # Another container's bump is seen on the next refresh
+    bump_elsewhere(aws)
+    assert get_role_permissions()['Adder'] == ['add']
+
+
+def test_index_is_compiled_once_per_load(aws):
+    first = get_role_index()
+    assert get_role_index() is first
+
+    bump_elsewhere(aws)
+    assert get_role_index() is not first
+
+
+def test_bump_drops_the_local_cache(aws):
+    get_role_permissions()
+    put_role(aws, 'Adder', ['add'])
+
+    bump_roles_version(aws.table('ROLES_TABLE'))
+
+    assert get_role_permissions()['Adder'] == ['add']
+
+
+def test_defaults_are_used_when_roles_table_is_unreadable(aws, monkeypatch):
+    monkeypatch.setattr(role_permissions, 'ROLES_TABLE', 'MissingTable')
+
+    assert get_role_permissions() == DEFAULT_ROLE_PERMISSIONS
+
+
+def test_role_index_lookups():
+    index = RoleIndex({'ASrole': ['add', 'subtract'], 'DMrole': ['multiply', 'divide'], 'Adder': ['add']})
+
+    assert index.granting_role(['DMrole', 'Adder'], 'add') == 'Adder'
+    assert index.granting_role(['DMrole'], 'add') is None
+    assert index.covering_role(['Adder', 'ASrole'], frozenset({'add', 'subtract'})) == 'ASrole'
+    assert index.covering_role(['Adder'], frozenset({'add', 'subtract'})) is None
+    assert index.roles_for('add') == ['ASrole', 'Adder']
+    assert index.roles_for('modulo') == []
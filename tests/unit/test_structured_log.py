@@ -0,0 +1,50 @@
+import json
+
+from structured_log import LEVELS, REDACTED, Logger
+
+
+def emitted(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_fields_are_redacted_at_any_depth(capsys):
+    Logger('test').info('Challenge', response={
+        'privateChallengeParameters': {'answer': '123456'},
+        'challengeMetadata': 'OTP_CHALLENGE',
+        'users': [{'email': 'a@example.com', 'username': 'alice'}]
+    })
+
+    record, = emitted(capsys)
+    assert record['response'] == {
+        'privateChallengeParameters': REDACTED,
+        'challengeMetadata': 'OTP_CHALLENGE',
+        'users': [{'email': REDACTED, 'username': 'alice'}]
+    }
+
+
+def test_format_args_are_redacted_before_formatting(capsys):
+    Logger('test').info('Queued %s for %s', {'otp': '123456', 'phone_number': '+15550100'}, 'alice')
+
+    record, = emitted(capsys)
+    assert '123456' not in record['message'] and '+15550100' not in record['message']
+    assert record['message'] == f"Queued {{'otp': '{REDACTED}', 'phone_number': '{REDACTED}'}} for alice"
+
+
+def test_error_codes_stay_visible(capsys):
+    Logger('test').error('Call failed', error={'code': 'ThrottlingException'}, challengeAnswer='123456')
+
+    record, = emitted(capsys)
+    assert record['error'] == {'code': 'ThrottlingException'}
+    assert record['challengeAnswer'] == REDACTED
+
+
+def test_messages_below_the_level_are_not_formatted(capsys):
+    class Exploding:
+        def __str__(self):
+            raise AssertionError('formatted a disabled message')
+
+    logger = Logger('test', level=LEVELS['WARNING'])
+    logger.info('Value %s', Exploding())
+    logger.event({'password': 'hunter2'})
+
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,40 @@
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+from throttling import TokenBucket, error_code, is_throttling_error
+
+
+def client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'Operation')
+
+
+@pytest.mark.parametrize('code', [
+    'TooManyRequestsException', 'ThrottlingException', 'Throttling',
+    'ProvisionedThroughputExceededException', 'RequestLimitExceeded'
+])
+def test_throttling_codes_are_recognized(code):
+    assert is_throttling_error(client_error(code))
+
+
+def test_other_errors_are_not_throttling():
+    class HttpError(Exception):
+        """Like requests' HTTPError: `response` is not a dict."""
+        response = object()
+
+    assert not is_throttling_error(client_error('ConditionalCheckFailedException'))
+    assert error_code(HttpError()) is None
+    assert error_code(ValueError('no response')) is None
+    assert error_code(client_error('UserNotFoundException')) == 'UserNotFoundException'
+
+
+def test_token_bucket_paces_after_the_burst():
+    bucket = TokenBucket(rate=50, burst=2)
+
+    started = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+
+    # Two tokens up front, then one every 20 ms
+    assert time.monotonic() - started >= 0.035
@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+
+import usage_stats
+from usage_stats import read_stats
+
+
+def stream_event(rows, event_name='INSERT'):
+    serializer = TypeSerializer()
+    return {'Records': [{
+        'eventName': event_name,
+        'dynamodb': {'NewImage': {key: serializer.serialize(value) for key, value in row.items()}}
+    } for row in rows]}
+
+
+def row(user, timestamp, operation, role='ASrole'):
+    return {'userId': user, 'timestamp': timestamp, 'operation': operation, 'role_used': role,
+            'result': Decimal('1')}
+
+
+ROWS = [
+    row('alice', '2024-03-01T09:15:00', 'add'),
+    row('alice', '2024-03-01T09:45:00', 'add'),
+    row('bob', '2024-03-01T10:05:00', 'multiply', 'DMrole'),
+    row('bob', '2024-03-02T08:00:00', 'expression', 'ASrole,DMrole'),
+]
+
+
+def test_a_batch_is_folded_into_one_update_per_bucket_and_scope(aws):
+    result = usage_stats.handler(stream_event(ROWS), None)
+
+    # 12 hourly items (3 hours x 4 scopes) and 11 daily ones (7 + 4): rows
+    # sharing a bucket and scope add up in one update
+    assert (result['rows'], result['items']) == (4, 23)
+    item = aws.table('USAGE_STATS_TABLE').get_item(Key={'bucket': 'hour#2024-03-01T09', 'scope': 'user#alice'})['Item']
+    assert (item['calculations'], item['op_add']) == (2, 2)
+    assert 'expiresAt' in item
+    daily = aws.table('USAGE_STATS_TABLE').get_item(Key={'bucket': 'day#2024-03-01', 'scope': 'all#'})['Item']
+    assert 'expiresAt' not in daily
+
+
+def test_stats_are_read_per_bucket_with_totals(aws):
+    usage_stats.handler(stream_event(ROWS), None)
+    # Only new rows count
+    usage_stats.handler(stream_event(ROWS[:1], event_name='MODIFY'), None)
+
+    stats = read_stats('day', '2024-03-01', '2024-03-03')
+
+    assert [bucket['bucket'] for bucket in stats['buckets']] == ['2024-03-01', '2024-03-02', '2024-03-03']
+    assert stats['buckets'][0]['counts'] == {'all': {'calculations': 3, 'operations': {'add': 2, 'multiply': 1}}}
+    assert stats['buckets'][2]['counts'] == {}
+    assert stats['totals']['all']['calculations'] == 4
+
+    by_role = read_stats('day', '2024-03-01', '2024-03-02', dimension='role')
+    assert {name: total['calculations'] for name, total in by_role['totals'].items()} == \
+        {'ASrole': 2, 'DMrole': 1, 'ASrole,DMrole': 1}
+
+    bob = read_stats('hour', '2024-03-01T09', '2024-03-01T10', dimension='user', key='bob')
+    assert [bucket['counts'] for bucket in bob['buckets']] == \
+        [{}, {'bob': {'calculations': 1, 'operations': {'multiply': 1}}}]
+
+
+def test_redelivered_batches_count_again(aws):
+    usage_stats.handler(stream_event(ROWS[:1]), None)
+    usage_stats.handler(stream_event(ROWS[:1]), None)
+
+    # At-least-once, as documented
+    assert read_stats('day', '2024-03-01', '2024-03-01')['totals']['all']['calculations'] == 2
+
+
+def test_invalid_ranges_are_rejected(aws):
+    with pytest.raises(ValueError, match='from must not be after to'):
+        read_stats('day', '2024-03-02', '2024-03-01')
+    with pytest.raises(ValueError, match='At most 744 hour buckets'):
+        read_stats('hour', '2024-01-01T00', '2024-03-01T00')
+    with pytest.raises(ValueError, match='granularity must be one of'):
+        read_stats('week')
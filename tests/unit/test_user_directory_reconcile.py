@@ -0,0 +1,48 @@
+import boto3
+import pytest
+
+import user_directory_reconcile
+from user_directory import directory_entry
+from user_directory_reconcile import remove_stale_entries
+
+
+@pytest.fixture
+def pool(aws, monkeypatch):
+    monkeypatch.setattr(user_directory_reconcile, 'USER_POOL_ID', aws.user_pool_id)
+    return aws
+
+
+def put_entry(aws, username, created):
+    aws.table('USERS_TABLE').put_item(Item=directory_entry(
+        username, {}, [], True, 'CONFIRMED', created))
+
+
+def usernames(aws):
+    return sorted(item['username'] for item in aws.table('USERS_TABLE').scan()['Items'])
+
+
+def test_only_entries_older_than_the_run_are_removed(aws):
+    put_entry(aws, 'alice', '2024-01-01T00:00:00+00:00')
+    put_entry(aws, 'bob', '2024-01-01T00:00:00+00:00')
+    # Signed up while the run was listing Cognito
+    put_entry(aws, 'carol', '2024-01-02T00:00:01+00:00')
+
+    removed = remove_stale_entries({'alice'}, '2024-01-02T00:00:00+00:00')
+
+    assert removed == 1
+    assert usernames(aws) == ['alice', 'carol']
+
+
+def test_reconcile_rebuilds_the_directory_from_cognito(pool):
+    cognito = boto3.client('cognito-idp')
+    for username, groups in (('alice', ['ASrole']), ('bob', ['AdminRole', 'DMrole'])):
+        cognito.admin_create_user(UserPoolId=pool.user_pool_id, Username=username)
+        for group in groups:
+            cognito.admin_add_user_to_group(UserPoolId=pool.user_pool_id, Username=username, GroupName=group)
+    put_entry(pool, 'gone', '2024-01-01T00:00:00+00:00')
+
+    assert user_directory_reconcile.handler({}, None) == {'users': 2, 'removed': 1}
+
+    assert usernames(pool) == ['alice', 'bob']
+    bob = pool.table('USERS_TABLE').get_item(Key={'username': 'bob'})['Item']
+    assert (sorted(bob['groups']), bob['enabled']) == (['AdminRole', 'DMrole'], True)
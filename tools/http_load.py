@@ -0,0 +1,132 @@
+"""
+HTTP load generator for the local gateway (or the deployed API).
+
+Opens --concurrency keep-alive connections, each sending requests back to
+back for --duration seconds, and reports throughput and p50/p95/p99 latency.
+Give several concurrency levels to sweep them:
+
+    TOKEN=$(python -m tools.local_gateway token --groups ASrole,DMrole)
+    python -m tools.http_load http://127.0.0.1:8787/calculate --token "$TOKEN" \\
+        --body '{"operand1": 6, "operand2": 7, "operation": "add"}' --concurrency 1,4,16,64
+
+Plain HTTP only; the standard library is enough.
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[max(1, math.ceil(fraction * len(sorted_values))) - 1]
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, keep_alive)."""
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    keep_alive = True
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection':
+            keep_alive = value.strip().lower() != 'close'
+    if length:
+        await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def worker(url, request, deadline, latencies, statuses):
+    reader = writer = None
+    try:
+        while time.perf_counter() < deadline:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def run_level(url, request, concurrency, duration):
+    latencies, statuses = [], {}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(worker(url, request, deadline, latencies, statuses) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50), 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95), 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99), 2) if latencies else None,
+        'statuses': statuses
+    }
+
+
+def build_request(url, method, token, body):
+    target = url.path + (f'?{url.query}' if url.query else '')
+    payload = body.encode() if body else b''
+    headers = [
+        f'{method} {target or "/"} HTTP/1.1',
+        f'Host: {url.netloc}',
+        'Connection: keep-alive',
+        f'Content-Length: {len(payload)}'
+    ]
+    if payload:
+        headers.append('Content-Type: application/json')
+    if token:
+        headers.append(f'Authorization: {token}')
+    return ('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + payload
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('url', help='e.g. http://127.0.0.1:8787/calculate')
+    parser.add_argument('--method', default=None, help='default POST with --body, else GET')
+    parser.add_argument('--token', default=None, help='ID token for the Authorization header')
+    parser.add_argument('--body', default=None, help='JSON request body')
+    parser.add_argument('--concurrency', default='1,8,32', help='comma-separated connection counts to sweep')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per concurrency level')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args(argv)
+
+    url = urlsplit(args.url)
+    if url.scheme != 'http':
+        parser.error('only http:// URLs are supported')
+    method = args.method or ('POST' if args.body else 'GET')
+    request = build_request(url, method, args.token, args.body)
+
+    results = [asyncio.run(run_level(url, request, int(level), args.duration))
+               for level in args.concurrency.split(',')]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f"{'conns':>6}{'requests':>10}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    for result in results:
+        print(f"{result['concurrency']:>6}{result['requests']:>10}{result['throughput_rps']:>10}"
+              f"{result['p50_ms']:>9}{result['p95_ms']:>9}{result['p99_ms']:>9}  {result['statuses']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
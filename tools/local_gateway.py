@@ -0,0 +1,313 @@
+"""
+Local stand-in for the Calculator REST API.
+
+An asyncio HTTP/1.1 server (keep-alive, Content-Length bodies) that serves the
+routes in my_cdk_app/routes.py. Each request is turned into the API Gateway
+proxy event the deployed API would send, and calculate_handler /
+admin_handler run on a thread pool the size of --workers, like concurrent
+Lambda environments sharing one process.
+
+The Cognito authorizer is replaced by HS256 JWTs signed with a local secret.
+Tokens carry the same claims as a Cognito ID token and reach the handler as
+requestContext.authorizer.claims. Mint one with the `token` command:
+
+    python -m tools.local_gateway token --secret dev --sub u1 --groups ASrole
+    python -m tools.local_gateway serve --secret dev --moto --port 8787
+
+With --moto the handlers run against in-process moto with the stack's tables,
+export bucket, user pool and groups, so no AWS account is needed (history
+exports then run in process). Without it they use
+whatever AWS_* environment is set, e.g. AWS_ENDPOINT_URL for a moto server;
+the table names and USER_POOL_ID then come from the environment as well.
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import hashlib
+import hmac
+import importlib
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+ROOT = Path(__file__).resolve().parents[1]
+LAMBDA_DIR = ROOT / 'lambda'
+sys.path.insert(0, str(ROOT))
+
+from my_cdk_app.routes import route_methods  # noqa: E402
+
+# Matches the stack's CORS preflight options and the handler response headers
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+    'Access-Control-Allow-Methods': 'OPTIONS,GET,PUT,POST,DELETE,PATCH,HEAD'
+}
+MAX_BODY_BYTES = 10 * 1024 * 1024  # API Gateway payload limit
+HANDLER_TIMEOUT_SECONDS = 30
+TOKEN_TTL_SECONDS = 3600
+
+
+class TokenError(Exception):
+    pass
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def issue_token(secret, claims, ttl=TOKEN_TTL_SECONDS):
+    """HS256 JWT with `claims` plus iat/exp and token_use=id."""
+    now = int(time.time())
+    payload = {'token_use': 'id', 'iat': now, 'exp': now + ttl, **claims}
+    signing_input = f"{_b64encode(json.dumps({'alg': 'HS256', 'typ': 'JWT'}).encode())}." \
+                    f"{_b64encode(json.dumps(payload).encode())}"
+    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f'{signing_input}.{_b64encode(signature)}'
+
+
+def verify_token(secret, token):
+    """Claims of a valid, unexpired local ID token; raises TokenError otherwise."""
+    try:
+        header, payload, signature = token.split('.')
+        header_fields = json.loads(_b64decode(header))
+        if not isinstance(header_fields, dict) or header_fields.get('alg') != 'HS256':
+            raise TokenError('Unsupported algorithm')
+        expected = hmac.new(secret.encode(), f'{header}.{payload}'.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            raise TokenError('Bad signature')
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise TokenError(f'Malformed token: {e}')
+    if not isinstance(claims, dict):
+        raise TokenError('Malformed token: claims are not an object')
+    if claims.get('token_use') != 'id':
+        raise TokenError('Not an ID token')
+    if claims.get('exp', 0) < time.time():
+        raise TokenError('Token expired')
+    return claims
+
+
+def authorizer_claims(claims):
+    """Claims the way the REST API Cognito authorizer passes them: every value a string."""
+    out = {}
+    for name, value in claims.items():
+        if name == 'cognito:groups' and isinstance(value, list):
+            out[name] = ','.join(value)
+        elif isinstance(value, str):
+            out[name] = value
+        else:
+            out[name] = json.dumps(value)
+    return out
+
+
+class LambdaContext:
+    """The parts of the Lambda context object the handlers use."""
+
+    def __init__(self, function_name, timeout=HANDLER_TIMEOUT_SECONDS):
+        self.function_name = function_name
+        self.aws_request_id = str(uuid.uuid4())
+        self.memory_limit_in_mb = 128
+        self._deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+class Gateway:
+    """Routes HTTP requests to the handler functions."""
+
+    def __init__(self, secret, workers=16):
+        self.secret = secret
+        self.routes = route_methods()
+        self.handlers = {}
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='lambda')
+
+    def handler(self, module_name):
+        if module_name not in self.handlers:
+            self.handlers[module_name] = importlib.import_module(module_name).handler
+        return self.handlers[module_name]
+
+    async def dispatch(self, method, target, headers, body):
+        """Return (status, headers, body bytes) for one request."""
+        url = urlsplit(target)
+        path = url.path.rstrip('/') or '/'
+        methods = self.routes.get(path)
+        if method == 'OPTIONS' and methods:
+            return 204, dict(CORS_HEADERS), b''
+        if not methods or method not in methods:
+            # What API Gateway answers for an unknown resource or method
+            return 403, {}, json.dumps({'message': 'Missing Authentication Token'}).encode()
+
+        try:
+            claims = verify_token(self.secret, headers.get('authorization', ''))
+        except TokenError:
+            return 401, {}, json.dumps({'message': 'Unauthorized'}).encode()
+
+        query = dict(parse_qsl(url.query, keep_blank_values=True))
+        event = {
+            'resource': path,
+            'path': path,
+            'httpMethod': method,
+            'headers': headers,
+            'queryStringParameters': query or None,
+            'pathParameters': None,
+            'body': body.decode('utf-8') if body else None,
+            'isBase64Encoded': False,
+            'requestContext': {
+                'resourcePath': path,
+                'httpMethod': method,
+                'stage': 'local',
+                'requestId': str(uuid.uuid4()),
+                'requestTimeEpoch': int(time.time() * 1000),
+                'authorizer': {'claims': authorizer_claims(claims)}
+            }
+        }
+        module_name = methods[method]
+        handler = self.handler(module_name)
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.executor, handler, event, LambdaContext(module_name))
+
+        response_body = result.get('body') or ''
+        if result.get('isBase64Encoded'):
+            payload = base64.b64decode(response_body)
+        else:
+            payload = response_body.encode('utf-8')
+        return result.get('statusCode', 200), dict(result.get('headers') or {}), payload
+
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                if 'chunked' in headers.get('transfer-encoding', ''):
+                    await self.write(writer, 411, {}, b'', keep_alive=False)
+                    break
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_BYTES:
+                    await self.write(writer, 413, {}, b'', keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                try:
+                    status, response_headers, payload = await self.dispatch(method, target, headers, body)
+                except Exception as e:
+                    # An uncaught handler exception is a 502 from API Gateway too
+                    print(f'{method} {target} failed: {e!r}', file=sys.stderr)
+                    status, response_headers, payload = 502, {}, b'{"message": "Internal server error"}'
+                await self.write(writer, status, response_headers, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def write(self, writer, status, headers, payload, keep_alive):
+        headers.setdefault('Content-Type', 'application/json')
+        headers['Content-Length'] = str(len(payload))
+        headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+        try:
+            reason = HTTPStatus(status).phrase
+        except ValueError:
+            reason = ''
+        head = f'HTTP/1.1 {status} {reason}\r\n' + ''.join(f'{k}: {v}\r\n' for k, v in headers.items())
+        writer.write(head.encode('latin-1') + b'\r\n' + payload)
+        await writer.drain()
+
+
+def use_moto():
+    """Start in-process moto with the stack's tables, buckets and user pool; returns the mock."""
+    import boto3
+    from moto import mock_aws
+
+    from tests.benchmarks.aws_fixtures import create_buckets, create_tables, create_user_pool
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.update(AWS_ACCESS_KEY_ID='testing', AWS_SECRET_ACCESS_KEY='testing')
+    os.environ.pop('AWS_ENDPOINT_URL', None)
+    mock = mock_aws()
+    mock.start()
+    env = {'EXPORT_FUNCTION_NAME': 'local'}
+    create_tables(boto3.client('dynamodb'), env)
+    create_buckets(boto3.client('s3'), env)
+    create_user_pool(boto3.client('cognito-idp'), env)
+    os.environ.update(env)
+    return mock
+
+
+async def serve(args):
+    gateway = Gateway(args.secret, args.workers)
+    server = await asyncio.start_server(gateway.serve_connection, args.host, args.port, backlog=1024)
+    print(f'Local gateway on http://{args.host}:{args.port}/ ({args.workers} workers)')
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help='run the gateway')
+    serve_parser.add_argument('--secret', default=os.environ.get('LOCAL_JWT_SECRET', 'local-dev-secret'))
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8787)
+    serve_parser.add_argument('--workers', type=int, default=16, help='handler threads')
+    serve_parser.add_argument('--moto', action='store_true', help='run against in-process moto')
+    serve_parser.add_argument('--log-level', default='WARNING', help="handlers' LOG_LEVEL")
+
+    token_parser = commands.add_parser('token', help='print a signed ID token')
+    token_parser.add_argument('--secret', default=os.environ.get('LOCAL_JWT_SECRET', 'local-dev-secret'))
+    token_parser.add_argument('--sub', default='local-user')
+    token_parser.add_argument('--username', default=None)
+    token_parser.add_argument('--groups', default='ASrole', help='comma-separated Cognito groups')
+    token_parser.add_argument('--ttl', type=int, default=TOKEN_TTL_SECONDS)
+    args = parser.parse_args(argv)
+
+    if args.command == 'token':
+        groups = [group for group in args.groups.split(',') if group]
+        print(issue_token(args.secret, {
+            'sub': args.sub,
+            'cognito:username': args.username or args.sub,
+            'cognito:groups': groups
+        }, args.ttl))
+        return 0
+
+    os.environ.setdefault('LOG_LEVEL', args.log_level)
+    sys.path.insert(0, str(LAMBDA_DIR))
+    mock = use_moto() if args.moto else None
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if mock is not None:
+            mock.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
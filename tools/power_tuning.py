@@ -0,0 +1,198 @@
+"""
+Memory power tuning for the Lambda handlers, estimated locally.
+
+Each handler is imported in a fresh interpreter and invoked --invocations
+times with its cold-start benchmark event (tests/benchmarks/cold_start.py)
+against a local moto server. The CPU time and the wall time of every call
+are recorded; the rest of the wall time is I/O (the AWS calls).
+
+Lambda allocates CPU in proportion to memory: a full vCPU at 1769 MB. The
+handlers are single-threaded Python for their CPU work, so for each memory
+size the estimate is
+
+    duration = cpu_ms * 1769 / min(memory, 1769) * --cpu-scale + io_ms
+
+and the cost per million invocations follows from the billed GB-seconds
+at the architecture's price plus the request charge. Sizes too small for
+the handler's peak RSS are skipped. The recommended size per --strategy is
+printed with a `functionProfiles` snippet for cdk.json (see
+my_cdk_app/function_profiles.py):
+
+    python -m tools.power_tuning
+    python -m tools.power_tuning --strategy speed --handlers calculate_handler admin_handler
+
+These are estimates: a laptop core is not a Lambda vCPU (--cpu-scale
+adjusts for that) and moto answers faster than AWS. Use them to pick the
+sizes worth trying, then compare p95 latency in the deployed stack.
+"""
+import argparse
+import json
+import logging
+import math
+import statistics
+import subprocess
+import sys
+
+from tests.benchmarks.cold_start import LAMBDA_DIR, base_env, free_port, handler_events, seed
+
+FULL_VCPU_MB = 1769
+DEFAULT_SIZES = [128, 256, 512, 768, 1024, 1536, 1769, 3008]
+# List prices per GB-second (us-east-1); other regions differ slightly but
+# the comparison between sizes holds
+GB_SECOND_PRICE = {'arm64': 0.0000133334, 'x86_64': 0.0000166667}
+REQUEST_PRICE_PER_MILLION = 0.20
+# Headroom over the locally measured peak RSS
+MEMORY_HEADROOM = 1.25
+
+# Handler module -> construct id in MyCdkAppStack
+FUNCTION_IDS = {
+    'calculate_handler': 'CalculateLambda',
+    'admin_handler': 'AdminLambda',
+    'define_auth_challenge': 'DefineAuthChallengeLambda',
+    'create_auth_challenge': 'CreateAuthChallengeLambda',
+    'verify_auth_challenge': 'VerifyAuthChallengeLambda',
+    'post_confirmation_handler': 'PostConfirmationLambda',
+    'pre_token_generation': 'PreTokenGenerationLambda',
+}
+
+# Runs in the fresh interpreter: CPU and wall time of the import and of each call
+CHILD = r'''
+import contextlib, copy, importlib, io, json, resource, sys, time
+name, event, invocations = sys.argv[1], json.loads(sys.argv[2]), int(sys.argv[3])
+
+def timed(call):
+    wall, cpu = time.perf_counter(), time.process_time()
+    call()
+    return {'wall_ms': (time.perf_counter() - wall) * 1000, 'cpu_ms': (time.process_time() - cpu) * 1000}
+
+with contextlib.redirect_stdout(io.StringIO()):
+    module = None
+    def load():
+        global module
+        module = importlib.import_module(name)
+    init = timed(load)
+    calls = [timed(lambda: module.handler(copy.deepcopy(event), None)) for _ in range(invocations)]
+rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({'init': init, 'calls': calls, 'rss_mb': rss_mb}))
+'''
+
+
+def profile_handler(name, event, env, invocations):
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD, name, json.dumps(event), str(invocations)],
+        env=env, cwd=str(LAMBDA_DIR), capture_output=True, text=True, check=False
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'{name} failed:\n{result.stderr}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def split_time(samples):
+    """Median CPU and I/O milliseconds of a list of timed calls."""
+    cpu_ms = statistics.median(sample['cpu_ms'] for sample in samples)
+    wall_ms = statistics.median(sample['wall_ms'] for sample in samples)
+    return cpu_ms, max(wall_ms - cpu_ms, 0.0)
+
+
+def estimate(cpu_ms, io_ms, memory_mb, cpu_scale):
+    return cpu_ms * FULL_VCPU_MB / min(memory_mb, FULL_VCPU_MB) * cpu_scale + io_ms
+
+
+def billed_ms(duration_ms):
+    """Lambda bills whole milliseconds, at least one."""
+    return max(1, math.ceil(duration_ms))
+
+
+def cost_per_million(duration_ms, memory_mb, architecture):
+    return (billed_ms(duration_ms) / 1000 * memory_mb / 1024 * GB_SECOND_PRICE[architecture] * 1_000_000
+            + REQUEST_PRICE_PER_MILLION)
+
+
+def sweep(measurement, sizes, architecture, cpu_scale):
+    """One row per memory size that fits the handler."""
+    cpu_ms, io_ms = split_time(measurement['calls'])
+    init_cpu_ms, init_io_ms = split_time([measurement['init']])
+    floor_mb = measurement['rss_mb'] * MEMORY_HEADROOM
+    rows = []
+    for memory_mb in sizes:
+        if memory_mb < floor_mb:
+            continue
+        duration_ms = estimate(cpu_ms, io_ms, memory_mb, cpu_scale)
+        rows.append({
+            'memory_mb': memory_mb,
+            'duration_ms': round(duration_ms, 2),
+            'init_ms': round(estimate(init_cpu_ms, init_io_ms, memory_mb, cpu_scale), 1),
+            'cost': round(cost_per_million(duration_ms, memory_mb, architecture), 4),
+        })
+    return rows
+
+
+def recommend(rows, strategy, tolerance):
+    """
+    'cost': cheapest; 'speed': fastest (the cheaper on ties); 'balanced': the
+    cheapest size within `tolerance` of the fastest duration. Durations are
+    compared as billed, so sub-millisecond differences don't buy memory.
+    """
+    if not rows:
+        return None
+    if strategy == 'cost':
+        return min(rows, key=lambda row: (row['cost'], row['duration_ms']))
+    if strategy == 'speed':
+        return min(rows, key=lambda row: (billed_ms(row['duration_ms']), row['cost']))
+    fastest = min(billed_ms(row['duration_ms']) for row in rows)
+    within = [row for row in rows if billed_ms(row['duration_ms']) <= fastest * (1 + tolerance)]
+    return min(within, key=lambda row: (row['cost'], row['duration_ms']))
+
+
+def run(handlers, invocations):
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    port = free_port()
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=port)
+    server.start()
+    try:
+        env = base_env(f'http://127.0.0.1:{port}')
+        events = handler_events(seed(env))
+        return {name: profile_handler(name, events[name], env, invocations) for name in handlers}
+    finally:
+        server.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--handlers', nargs='+', choices=sorted(FUNCTION_IDS), default=list(FUNCTION_IDS))
+    parser.add_argument('--sizes', type=lambda value: [int(size) for size in value.split(',')],
+                        default=DEFAULT_SIZES, help='comma-separated memory sizes in MB')
+    parser.add_argument('--invocations', type=int, default=20, help='warm calls per handler')
+    parser.add_argument('--strategy', choices=['cost', 'speed', 'balanced'], default='balanced')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="balanced: accepted slowdown over the fastest size (0.2 = 20%%)")
+    parser.add_argument('--architecture', choices=sorted(GB_SECOND_PRICE), default='arm64')
+    parser.add_argument('--cpu-scale', type=float, default=1.0,
+                        help='Lambda vCPU time per local CPU second')
+    args = parser.parse_args(argv)
+
+    measurements = run(args.handlers, args.invocations)
+
+    profiles = {}
+    for name, measurement in measurements.items():
+        rows = sweep(measurement, sorted(args.sizes), args.architecture, args.cpu_scale)
+        best = recommend(rows, args.strategy, args.tolerance)
+        print(f"\n{name} ({FUNCTION_IDS[name]}), peak RSS {measurement['rss_mb']:.0f} MB")
+        print(f"{'memory MB':>10}{'duration ms':>13}{'init ms':>10}{'$ / 1M calls':>14}")
+        for row in rows:
+            marker = '  <-' if row is best else ''
+            print(f"{row['memory_mb']:>10}{row['duration_ms']:>13}{row['init_ms']:>10}{row['cost']:>14}{marker}")
+        if best is None:
+            print('  no size fits; pass larger --sizes')
+            continue
+        profiles[FUNCTION_IDS[name]] = {'memorySize': best['memory_mb'], 'architecture': args.architecture}
+
+    print('\nRecommended functionProfiles (cdk.json context):')
+    print(json.dumps(profiles, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())